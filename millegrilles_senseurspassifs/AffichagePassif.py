@@ -17,42 +17,37 @@ from millegrilles_senseurspassifs.AppareilModule import AppareilHandler, Senseur
 
 class ModuleCollecteSenseurs(SenseurModuleConsumerAbstract):
 
+    recevoir_lectures = False  # Lectures lues dans AppareilHandler.etat_lectures
+
     def __init__(self, handler: AppareilHandler, etat_senseurspassifs: EtatSenseursPassifs, no_senseur: str):
         super().__init__(handler, etat_senseurspassifs, no_senseur)
         self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
         self.__uuid_senseurs = list()
-        self._etat_courant_senseurs = dict()
 
     async def appliquer_configuration(self, configuration_hub: dict):
         await super().appliquer_configuration(configuration_hub)
 
-        # Maj liste de senseurs utilise par ce consumer
+        # Maj liste de senseurs utilise par ce consumer, lectures conservees par AppareilHandler (etat partage)
         self.__uuid_senseurs = self.get_uuid_senseurs()
+        self._handler.etat_lectures.abonner(self, self.__uuid_senseurs, self._lectures_modifiees)
 
     async def traiter(self, message):
-        self.__logger.debug("ModuleAffichageLignes Traiter message %s" % message)
-
-        merge = False  # Pour lectures qui sont partielles (comme lectures interne, parfois senseurs sont separes)
+        self.__logger.debug("ModuleAffichageLignes Traiter message %s", message)
 
-        # Matcher message pour ce senseur
-        if message.get('interne') is True:
-            message_recu = message['message']
-            action = 'lecture'
-            merge = True
-        elif message.get('confirmation') is True:
+        if message.get('confirmation') is True:
             message_wrapper = message['message']
             routing_key = message_wrapper.routing_key
             action = routing_key.split('.').pop()
-            message_recu = message_wrapper.parsed
-        else:
-            return
+            if action == 'majNoeud':
+                message_recu = message_wrapper.parsed
+                self.__logger.debug("Remplacement configuration noeud avec %s", message_recu)
+                await self.appliquer_configuration(message_recu)
 
-        if action in ['lecture', 'lectureConfirmee']:
-            if message_recu.get('uuid_senseur') in self.__uuid_senseurs:
-                await self.maj_etat_interne(message_recu, merge)
-        elif action == 'majNoeud':
-            self.__logger.debug("Remplacement configuration noeud avec %s" % message_recu)
-            await self.appliquer_configuration(message_recu)
+    def _lectures_modifiees(self, uuid_senseur: str, senseurs: list[str]):
+        """
+        Notification de etat_lectures pour un appareil utilise par ce consumer. Override au besoin.
+        """
+        pass
 
     def routing_keys(self) -> list:
         return [
@@ -99,42 +94,18 @@ class ModuleCollecteSenseurs(SenseurModuleConsumerAbstract):
                             ConstantesSenseursPassifs.REQUETE_LISTE_SENSEURS_PAR_UUID, Constantes.SECURITE_PRIVE,
                             partition=instance_id)
                     except asyncio.TimeoutError:
-                        self.__logger.debug("Echec requete pour charger senseur %s (instance_id %s) - OK" % (self.__uuid_senseurs, instance_id))
+                        self.__logger.debug("Echec requete pour charger senseur %s (instance_id %s) - OK", self.__uuid_senseurs, instance_id)
                         continue
 
                     senseurs = senseurs_wrapper.parsed['senseurs']
                     for senseur in senseurs:
-                        # Emettre message senseur comme message interne
-                        uuid_senseur = senseur['uuid_senseur']
-                        lectures_senseurs = senseur['senseurs']
-                        await self._handler.traiter_lecture_interne(uuid_senseur, lectures_senseurs)
-
-                pass
+                        self._handler.etat_lectures.maj(senseur['uuid_senseur'], senseur['senseurs'])
 
             except TimeoutError:
                 self.__logger.warning("rafraichir Timeout producer - Echec requete configuration hub")
             except Exception:
                 self.__logger.exception("rafraichir Erreur traitement")
 
-    async def maj_etat_interne(self, message: dict, merge=False):
-        uuid_senseur = message['uuid_senseur']
-        senseurs = message['senseurs']
-        self.__logger.info("ModuleAffichageLignes recu lecture %s = %s" % (uuid_senseur, senseurs))
-
-        if merge is True:
-            try:
-                etat_courant = self._etat_courant_senseurs[uuid_senseur]
-                senseurs = etat_courant['senseurs'].copy()
-                senseurs.update(message['senseurs'])
-                nouvel_etat = message.copy()
-                nouvel_etat['senseurs'] = senseurs
-            except KeyError:
-                nouvel_etat = message
-        else:
-            nouvel_etat = message
-
-        self._etat_courant_senseurs[uuid_senseur] = nouvel_etat
-
 
 class ModuleAfficheLignes(ModuleCollecteSenseurs):
     """
@@ -153,6 +124,8 @@ class ModuleAfficheLignes(ModuleCollecteSenseurs):
         self._rafraichissement_horloge = 1.0
 
         self._lignes_affichage = list()
+        self.__lignes_affichees = 0  # Lignes de la passe courante deja affichees
+        self.__lectures_modifiees = False
 
         if timezone_horloge is not None:
             self._timezone_horloge = pytz.timezone(timezone_horloge)
@@ -223,20 +196,34 @@ class ModuleAfficheLignes(ModuleCollecteSenseurs):
         :param page:
         :return:
         """
-        self.__logger.debug("Lignes a afficher pour la page:\n%s" % '\n'.join(page))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Lignes a afficher pour la page:\n%s", '\n'.join(page))
+
+    def _lectures_modifiees(self, uuid_senseur: str, senseurs: list[str]):
+        # Les lignes restantes de la passe courante sont regenerees avec les nouvelles lectures
+        self.__lectures_modifiees = True
 
     async def _get_page(self) -> Optional[list]:
         if self._lignes_affichage is None:
             self._lignes_affichage = await self._generer_page()
+            self.__lignes_affichees = 0
+            self.__lectures_modifiees = False
         elif len(self._lignes_affichage) == 0:
             self._lignes_affichage = None
             return None
+        elif self.__lectures_modifiees:
+            self.__lectures_modifiees = False
+            self._lignes_affichage = (await self._generer_page())[self.__lignes_affichees:]
+            if len(self._lignes_affichage) == 0:
+                self._lignes_affichage = None
+                return None
 
         # Recuperer lignes
         lignes = self._lignes_affichage[0:self.__lignes_par_page]
 
         # Retirer lignes consommees
         self._lignes_affichage = self._lignes_affichage[self.__lignes_par_page:]
+        self.__lignes_affichees += len(lignes)
 
         return lignes
 
@@ -254,7 +241,7 @@ class ModuleAfficheLignes(ModuleCollecteSenseurs):
             timestring = now.strftime('%H:%M:%S')
 
             lignes_affichage = [datestring, timestring]
-            logging.debug("Horloge: %s" % str(lignes_affichage))
+            logging.debug("Horloge: %s", lignes_affichage)
             await self._afficher_page(lignes_affichage)
 
             try:
@@ -292,7 +279,7 @@ class ModuleAfficheLignes(ModuleCollecteSenseurs):
         try:
             formattage = self._configuration_hub['lcd_affichage']
             for ligne in formattage:
-                self.__logger.debug("Formatter ligne %s" % str(ligne))
+                self.__logger.debug("Formatter ligne %s", ligne)
                 lignes.append(self.formatter_ligne(instance_id, ligne))
 
             return lignes
@@ -311,28 +298,24 @@ class ModuleAfficheLignes(ModuleCollecteSenseurs):
         if uuid_senseur is not None and uuid_senseur != '' and \
                 cle_appareil is not None and cle_appareil != '':
 
-            flag = ''
-            try:
-                doc_senseur = self._etat_courant_senseurs[cle_senseur]
-                doc_appareil = doc_senseur['senseurs'][cle_appareil]
-                try:
-                    ts_app = doc_appareil['timestamp']
-                    date_courante = datetime.datetime.utcnow()
-                    date_lecture = datetime.datetime.utcfromtimestamp(ts_app)
-                    exp_1 = datetime.timedelta(minutes=5)
-                    exp_2 = datetime.timedelta(minutes=30)
-                    if date_lecture + exp_2 < date_courante:
-                        flag = '!'
-                    elif date_lecture + exp_1 < date_courante:
-                        flag = '?'
-                except KeyError:
-                    pass
-                valeur = doc_appareil['valeur']
-            except KeyError:
+            lecture = self._handler.etat_lectures.get(cle_senseur, cle_appareil)
+            if lecture is None:
                 # Noeud/senseur/appareil inconnu
                 self.__logger.warning("Noeud %s, senseur %s, appareil %s inconnu" % (noeud_id, uuid_senseur, cle_appareil))
                 return 'N/A'
 
+            flag = ''
+            if lecture.timestamp is not None:
+                date_courante = datetime.datetime.utcnow()
+                date_lecture = datetime.datetime.utcfromtimestamp(lecture.timestamp)
+                exp_1 = datetime.timedelta(minutes=5)
+                exp_2 = datetime.timedelta(minutes=30)
+                if date_lecture + exp_2 < date_courante:
+                    flag = '!'
+                elif date_lecture + exp_1 < date_courante:
+                    flag = '?'
+            valeur = lecture.valeur
+
             try:
                 return format.format(valeur,) + flag
             except KeyError:
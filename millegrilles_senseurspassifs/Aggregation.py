@@ -0,0 +1,119 @@
+# Agregation des lectures par fenetre de temps (min/max/avg/last) avant la transmission sur MQ
+import math
+
+from array import array
+from typing import Optional
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # Calcul en python (builtins sur memoryview)
+
+CAPACITE_DEFAUT = 600  # Echantillons conserves par senseur dans une fenetre (1/seconde pendant 10 minutes)
+DECIMALES_MOYENNE = 3
+
+
+class TamponCirculaire:
+    """
+    Valeurs numeriques d'un senseur pour la fenetre courante, array('d') de taille fixe. Au dela de la capacite,
+    les plus vieilles valeurs de la fenetre sont remplacees.
+    """
+
+    __slots__ = ('valeurs', 'position', 'nombre', 'derniere', 'timestamp', 'type')
+
+    def __init__(self, capacite: int):
+        self.valeurs = array('d', bytes(8 * capacite))
+        self.position = 0
+        self.nombre = 0
+        self.derniere = None  # Derniere lecture (valeur telle que recue, incluant les valeurs non numeriques)
+        self.timestamp = None
+        self.type = None
+
+    def ajouter(self, lecture: dict):
+        valeur = lecture.get('valeur')
+        self.derniere = valeur
+        self.timestamp = lecture.get('timestamp')
+        self.type = lecture.get('type')
+
+        if isinstance(valeur, (int, float)) and not isinstance(valeur, bool) and math.isfinite(valeur):
+            self.valeurs[self.position] = valeur
+            self.position = (self.position + 1) % len(self.valeurs)
+            self.nombre = min(self.nombre + 1, len(self.valeurs))
+
+    def vider(self) -> Optional[dict]:
+        """
+        :return: Lecture agregee de la fenetre (None si aucune lecture) et debut d'une nouvelle fenetre
+        """
+        if self.timestamp is None and self.derniere is None:
+            return None
+
+        lecture = {'valeur': self.derniere, 'timestamp': self.timestamp, 'type': self.type}
+        if self.nombre > 0:
+            minimum, maximum, moyenne = _calculer(self.valeurs, self.nombre)
+            lecture['valeur_min'] = minimum
+            lecture['valeur_max'] = maximum
+            lecture['valeur_avg'] = round(moyenne, DECIMALES_MOYENNE)
+            lecture['nombre'] = self.nombre
+
+        self.position = 0
+        self.nombre = 0
+        self.derniere = None
+        self.timestamp = None
+        return lecture
+
+
+def _calculer(valeurs: array, nombre: int) -> tuple[float, float, float]:
+    if numpy is not None:
+        vue = numpy.frombuffer(valeurs, dtype=numpy.float64, count=nombre)
+        return float(vue.min()), float(vue.max()), float(vue.mean())
+    vue = memoryview(valeurs)[:nombre]
+    return min(vue), max(vue), math.fsum(vue) / nombre
+
+
+class AggregateurLectures:
+    """
+    Conserve les echantillons de chaque senseur (uuid_senseur, senseur) pour la fenetre courante. vider() produit
+    un message de lectures par appareil avec la derniere valeur (valeur, timestamp) et min/max/avg/nombre pour les
+    valeurs numeriques.
+    """
+
+    def __init__(self, capacite: int = CAPACITE_DEFAUT):
+        self.__capacite = capacite
+        self.__tampons: dict[str, dict[str, TamponCirculaire]] = dict()  # uuid_senseur: {senseur: tampon}
+        self.__instances: dict[str, str] = dict()  # uuid_senseur: instance_id
+
+    def ajouter(self, message_lectures: dict):
+        uuid_senseur = message_lectures['uuid_senseur']
+        self.__instances[uuid_senseur] = message_lectures['instance_id']
+        try:
+            tampons = self.__tampons[uuid_senseur]
+        except KeyError:
+            tampons = dict()
+            self.__tampons[uuid_senseur] = tampons
+
+        for senseur_id, lecture in message_lectures['senseurs'].items():
+            try:
+                tampon = tampons[senseur_id]
+            except KeyError:
+                tampon = TamponCirculaire(self.__capacite)
+                tampons[senseur_id] = tampon
+            tampon.ajouter(lecture)
+
+    def vider(self) -> list[dict]:
+        """
+        :return: Messages de lectures agregees (format de traiter_lecture_interne), un par appareil
+        """
+        messages = list()
+        for uuid_senseur, tampons in self.__tampons.items():
+            senseurs = dict()
+            for senseur_id, tampon in tampons.items():
+                lecture = tampon.vider()
+                if lecture is not None:
+                    senseurs[senseur_id] = lecture
+            if len(senseurs) > 0:
+                messages.append({
+                    'instance_id': self.__instances[uuid_senseur],
+                    'uuid_senseur': uuid_senseur,
+                    'senseurs': senseurs,
+                })
+        return messages
@@ -7,6 +7,7 @@ import logging
 import multibase
 import os
 import random
+import time
 
 from asyncio import Event, TimeoutError
 from typing import Optional
@@ -17,9 +18,20 @@ from millegrilles_messages.messages.CleCertificat import CleCertificat
 from millegrilles_messages.messages.FormatteurMessages import SignateurTransactionSimple, FormatteurMessageMilleGrilles
 from millegrilles_messages.messages.MessagesModule import MessageWrapper, MessageProducerFormatteur
 from millegrilles_messages.certificats.Generes import CleCsrGenere
+from millegrilles_senseurspassifs.Aggregation import AggregateurLectures
+from millegrilles_senseurspassifs.EtatLectures import EtatLectures
 from millegrilles_senseurspassifs.EtatSenseursPassifs import EtatSenseursPassifs
+from millegrilles_senseurspassifs.FileDistribution import FileDistribution, POLITIQUE_BLOQUER, POLITIQUE_RETIRER_ANCIEN
+from millegrilles_senseurspassifs.FiltreLectures import FiltreLectures, parse_deadbands
+from millegrilles_senseurspassifs.JournalLectures import JournalLectures
+from millegrilles_senseurspassifs.LogBinaire import EcrivainLogBinaire
+from millegrilles_senseurspassifs.RoutageTopics import TableRoutage
 from millegrilles_senseurspassifs import Constantes as ConstantesSenseursPassifs
 
+TAILLE_LOT_REJEU = 50  # Lectures du journal lues a la fois pour le rejeu
+ATTENTE_REJEU = 5  # Secondes avant de reessayer le rejeu du journal
+TAILLE_FILE_MQ = 1000  # Lectures en attente de transmission (le journal prend le relais si MQ est hors ligne)
+
 
 class AppareilHandler:
     """
@@ -40,11 +52,46 @@ class AppareilHandler:
         self._modules_producer = list()
 
         self.__sink_fichier: Optional[io.TextIOBase] = None
+        self.__sink_binaire: Optional[EcrivainLogBinaire] = None
         self.__q_lectures: Optional[asyncio.queues.Queue] = None
+        self.__file_mq: Optional[FileDistribution] = None
+        self.__files_consumers: list[tuple[FileDistribution, 'SenseurModuleConsumerAbstract']] = list()
+        self.__journal: Optional[JournalLectures] = None
+        self.__aggregateur: Optional[AggregateurLectures] = None
+        self.__filtre_lectures: Optional[FiltreLectures] = None
+        self.__lot: Optional[dict] = None  # Lectures en attente de transmission (mode lot)
+        self.__etat_lectures = EtatLectures(etat_senseurspassifs.metrics)  # Derniere lecture de chaque senseur
+
+        # Derniere transmission de la chaine de certificats (producer, formatteur, temps)
+        self.__chaine_transmise: Optional[tuple[object, object, float]] = None
 
     async def preparer_modules(self, args: argparse.Namespace):
         self.__q_lectures = asyncio.queues.Queue(maxsize=20)
 
+        # Journal des lectures qui ne peuvent pas etre transmises (MQ hors ligne), rejoue au retour de MQ
+        configuration = self._etat_senseurspassifs.configuration
+        if configuration.journal_taille_max > 0:
+            self.__journal = JournalLectures(self._etat_senseurspassifs.metrics,
+                                             path.join(configuration.lecture_log_directory, 'journal'),
+                                             configuration.journal_taille_max)
+            self.__journal.ouvrir()
+
+        if configuration.etat_lectures_intervalle > 0:
+            # Dernieres lectures disponibles pour les affichages avant la connexion a MQ
+            self.__etat_lectures.charger(self.__path_etat_lectures)
+
+        if configuration.agregation_fenetre > 0:
+            # Les lectures brutes vont au log local et aux consumers, MQ recoit les agregats de chaque fenetre
+            self.__logger.info("Agregation des lectures par fenetre de %s secondes", configuration.agregation_fenetre)
+            self.__aggregateur = AggregateurLectures(configuration.agregation_capacite)
+
+        if configuration.filtre_deadbands:
+            # Lectures transmises sur MQ seulement si elles changent (deadband) ou au heartbeat. Le log local,
+            # etat_lectures, les consumers et l'agregation recoivent toutes les lectures.
+            self.__filtre_lectures = FiltreLectures(self._etat_senseurspassifs.metrics,
+                                                    parse_deadbands(configuration.filtre_deadbands),
+                                                    configuration.filtre_heartbeat)
+
         if args.dummysenseurs is True:
             self.__logger.info("Activer dummy senseurs")
             self._modules_producer.append(DummyProducer(self, self._etat_senseurspassifs, 'dummy_1', self.traiter_lecture_interne))
@@ -57,12 +104,13 @@ class AppareilHandler:
         path_logs = self._etat_senseurspassifs.configuration.lecture_log_directory
         makedirs(path_logs, exist_ok=True)
 
-        # path_fichier_log = path.join(path_logs, 'senseurs.jsonl')
-
-        # if self.__sink_fichier is not None:
-        #     self.__sink_fichier.close()
-        # sink = open(path_fichier_log, 'a')
-        # self.__sink_fichier = sink
+        # Log local des lectures, converti en transactions a la rotation (SenseursLogHandler)
+        self.__fermer_sink()
+        format_log = self._etat_senseurspassifs.configuration.lecture_log_format
+        if format_log == ConstantesSenseursPassifs.LOG_FORMAT_BIN:
+            self.__sink_binaire = EcrivainLogBinaire(path.join(path_logs, 'senseurs.bin'))
+        elif format_log == ConstantesSenseursPassifs.LOG_FORMAT_JSONL:
+            self.__sink_fichier = open(path.join(path_logs, 'senseurs.jsonl'), 'a')
 
         if self.__cle_certificat_appareil is None:
             await self.preparer_certificat_appareil()
@@ -197,18 +245,42 @@ class AppareilHandler:
                 pass  # Ok
 
     async def run(self):
+        # Une file et une task par destination, un consumer lent ne bloque pas la transmission MQ
+        metrics = self._etat_senseurspassifs.metrics
+        self.__file_mq = FileDistribution(metrics, 'mq', TAILLE_FILE_MQ, POLITIQUE_BLOQUER)
+        self.__files_consumers = [
+            (FileDistribution(metrics, 'consumer.%s' % consumer.nom_file, consumer.taille_file, consumer.politique_file),
+             consumer)
+            for consumer in self._modules_consumer
+        ]
+
         # Creer une liste de tasks pour executer tous les modules
         tasks = [
             asyncio.create_task(self.traitement_lectures(), name="traitement_lectures"),
+            asyncio.create_task(self.__file_mq.run(self.traiter_lecture_mq), name="file_mq"),
             asyncio.create_task(self.entretien(), name="entretien"),
         ]
 
+        if self.__journal is not None:
+            tasks.append(asyncio.create_task(self.rejouer_journal(), name="rejouer_journal"))
+            tasks.append(asyncio.create_task(self.__journal.run(self._etat_senseurspassifs.stop_event), name="journal"))
+
+        if self.__aggregateur is not None:
+            tasks.append(asyncio.create_task(self.transmettre_agregats(), name="transmettre_agregats"))
+        if self._etat_senseurspassifs.configuration.lot_fenetre > 0:
+            tasks.append(asyncio.create_task(self.transmettre_lots(), name="transmettre_lots"))
+        if self._etat_senseurspassifs.configuration.etat_lectures_intervalle > 0:
+            tasks.append(asyncio.create_task(self.sauvegarder_etat_lectures(), name="sauvegarder_etat_lectures"))
+
         if len(self._modules_consumer) == 0 and len(self._modules_producer) == 0:
             raise ValueError('Aucuns modules configure')
 
         for module in self._modules_consumer:
             tasks.append(asyncio.create_task(module.run()))
 
+        for file_consumer, consumer in self.__files_consumers:
+            tasks.append(asyncio.create_task(file_consumer.run(consumer.traiter), name=file_consumer.nom))
+
         for module in self._modules_producer:
             tasks.append(asyncio.create_task(module.run()))
 
@@ -223,6 +295,15 @@ class AppareilHandler:
         self.__logger.info("Fin SenseurModuleHandler")
 
     async def fermer(self):
+        if self.__journal is not None:
+            if self.__lot is not None:
+                self.__journal.ajouter(self.__lot)  # Lot en attente, transmis au redemarrage
+                self.__lot = None
+            self.__journal.fermer()
+        self.__fermer_sink()
+        if self._etat_senseurspassifs.configuration.etat_lectures_intervalle > 0:
+            self.__sauvegarder_etat_lectures()
+
         for producer in self._modules_producer:
             try:
                 await producer.fermer()
@@ -236,43 +317,182 @@ class AppareilHandler:
                 self.__logger.exception("Erreur fermeture consumer")
 
     async def traitement_lectures(self):
+        """
+        Distribue chaque message vers la file MQ (lectures internes) et la file de chaque consumer.
+        Les lectures sont conservees dans etat_lectures, seuls les consumers avec recevoir_lectures les recoivent.
+        """
         while True:
             message = await self.__q_lectures.get()
-            self.__logger.debug("traitement_lectures %s" % message)
+            self.__logger.debug("traitement_lectures %s", message)
 
-            # if message.get('interne') is True and self.__sink_fichier is not None:
+            consumers = None
             if message.get('interne') is True:
                 # Sauvegarder lecture
                 message_lectures = message['message']
-                # senseurs = message_lectures['senseurs']
+                self.__ecrire_log(message_lectures)
+                self.__etat_lectures.maj(message_lectures['uuid_senseur'], message_lectures['senseurs'])
+                await self.__file_mq.soumettre(message_lectures)
+                lecture = True
 
-                # json.dump(message_lectures, self.__sink_fichier)
-                # self.__sink_fichier.write('\n')  # Terminer la ligne
-                # self.__sink_fichier.flush()
+            elif message.get('confirmation') is True:
+                lecture = self.__maj_etat_confirmation(message['message'])
+                consumers = message.get('consumers')  # Consumers qui ont enregistre la routing key
 
-                # Transmettre sur MQ
-                if self.__formatteur_message_appareil is not None:
-                    await self.transmettre_lecture(message_lectures)
-                else:
-                    self.__logger.info("Formatteur message pas pret, DROP message")
+            else:
+                lecture = False
 
-            elif message.get('confirmation') is True:
-                pass  # Rien a faire
+            for file_consumer, consumer in self.__files_consumers:
+                if consumers is not None and consumer not in consumers:
+                    continue
+                if lecture is True and consumer.recevoir_lectures is False:
+                    continue
+                await file_consumer.soumettre(message)
+
+    def __maj_etat_confirmation(self, message: MessageWrapper) -> bool:
+        """
+        :return: True si le message est une confirmation de lecture
+        """
+        if message.routing_key.split('.').pop() != ConstantesSenseursPassifs.EVENEMENT_LECTURE_CONFIRMEE:
+            return False
+        try:
+            message_lectures = message.parsed
+            self.__etat_lectures.maj(message_lectures['uuid_senseur'], message_lectures['senseurs'])
+        except (TypeError, KeyError):
+            self.__logger.warning("Confirmation de lecture sans uuid_senseur/senseurs, ignoree")
+        return True
+
+    async def traiter_lecture_mq(self, message_lectures: dict):
+        if self.__aggregateur is not None:
+            self.__aggregateur.ajouter(message_lectures)  # Transmis a la fin de la fenetre
+        else:
+            await self.soumettre_lecture(message_lectures)
+
+    async def transmettre_ou_journaliser(self, message_lectures: dict):
+        # Transmettre sur MQ. Conserver dans le journal si MQ n'est pas disponible ou si des lectures
+        # plus anciennes sont en attente de rejeu (conserver l'ordre). Le formatteur (certificat de l'appareil) pas
+        # encore pret est traite comme MQ hors ligne, le rejeu attend qu'il soit disponible.
+        if self.__journal is None:
+            await self.transmettre_lecture(message_lectures)  # Journal desactive (JOURNAL_MAX_BYTES=0)
+            return
+        if self.__journal.backlog > 0 or await self.transmettre_lecture(message_lectures) is False:
+            self.__journal.ajouter(message_lectures)
+
+    async def transmettre_agregats(self):
+        stop_event = self._etat_senseurspassifs.stop_event
+        fenetre = self._etat_senseurspassifs.configuration.agregation_fenetre
+        while stop_event.is_set() is False:
+            try:
+                await asyncio.wait_for(stop_event.wait(), fenetre)
+            except TimeoutError:
+                pass
+            for message_lectures in self.__aggregateur.vider():
+                await self.soumettre_lecture(message_lectures)
+            await self.vider_lot()
+
+    async def sauvegarder_etat_lectures(self):
+        stop_event = self._etat_senseurspassifs.stop_event
+        intervalle = self._etat_senseurspassifs.configuration.etat_lectures_intervalle
+        while stop_event.is_set() is False:
+            try:
+                await asyncio.wait_for(stop_event.wait(), intervalle)
+            except TimeoutError:
+                pass
+            self.__sauvegarder_etat_lectures()
+
+    def __sauvegarder_etat_lectures(self):
+        try:
+            self.__etat_lectures.sauvegarder(self.__path_etat_lectures)
+        except OSError:
+            self.__logger.exception("Erreur sauvegarde de l'etat des lectures")
+
+    @property
+    def __path_etat_lectures(self) -> str:
+        return path.join(self._etat_senseurspassifs.configuration.lecture_log_directory, 'etat_lectures.json')
+
+    async def soumettre_lecture(self, message_lectures: dict):
+        """
+        Transmet la lecture ou l'ajoute au lot courant (READINGS_BATCH_WINDOW). Un senseur deja present dans le lot
+        declenche la transmission du lot pour ne pas ecraser sa lecture precedente.
+        Le filtre (deadband) est applique ici, apres le log local et l'agregation.
+        """
+        if self.__filtre_lectures is not None:
+            senseurs = self.__filtre_lectures.filtrer(message_lectures['uuid_senseur'], message_lectures['senseurs'])
+            if len(senseurs) == 0 and not message_lectures.get('notifications'):
+                return  # Aucun changement depuis la derniere lecture transmise
+            message_lectures = dict(message_lectures)  # Le message original est partage avec les consumers
+            message_lectures['senseurs'] = senseurs
+
+        if self._etat_senseurspassifs.configuration.lot_fenetre <= 0:
+            await self.transmettre_ou_journaliser(message_lectures)
+            return
 
-            for consumer in self._modules_consumer:
-                await consumer.traiter(message)
+        lot = self.__lot
+        if lot is not None and (lot['instance_id'] != message_lectures['instance_id'] or
+                                lot['senseurs'].keys() & message_lectures['senseurs'].keys()):
+            await self.vider_lot()
+            lot = None
+
+        if lot is None:
+            lot = {
+                'instance_id': message_lectures['instance_id'],
+                'uuid_senseur': message_lectures['uuid_senseur'],
+                'senseurs': dict(),
+            }
+            self.__lot = lot
+
+        lot['senseurs'].update(message_lectures['senseurs'])
+        notifications = message_lectures.get('notifications')
+        if notifications:
+            lot.setdefault('notifications', list()).extend(notifications)
+
+    async def vider_lot(self):
+        lot = self.__lot
+        self.__lot = None
+        if lot is not None:
+            await self.transmettre_ou_journaliser(lot)
+
+    async def transmettre_lots(self):
+        stop_event = self._etat_senseurspassifs.stop_event
+        fenetre = self._etat_senseurspassifs.configuration.lot_fenetre
+        while stop_event.is_set() is False:
+            try:
+                await asyncio.wait_for(stop_event.wait(), fenetre)
+            except TimeoutError:
+                pass
+            await self.vider_lot()
 
-    async def recevoir_confirmation_lecture(self, message: MessageWrapper):
+    def __ecrire_log(self, message_lectures: dict):
+        try:
+            if self.__sink_binaire is not None:
+                self.__sink_binaire.ajouter(message_lectures['uuid_senseur'], message_lectures['senseurs'])
+            elif self.__sink_fichier is not None:
+                json.dump(message_lectures, self.__sink_fichier)
+                self.__sink_fichier.write('\n')  # Terminer la ligne
+                self.__sink_fichier.flush()
+        except (OSError, ValueError):
+            self.__logger.exception("Erreur ecriture log des lectures")
+
+    def __fermer_sink(self):
+        if self.__sink_binaire is not None:
+            self.__sink_binaire.fermer()  # Ajoute la table de chaines et l'index
+            self.__sink_binaire = None
+        if self.__sink_fichier is not None:
+            self.__sink_fichier.close()
+            self.__sink_fichier = None
+
+    async def recevoir_confirmation_lecture(self, message: MessageWrapper, consumers: Optional[list] = None):
         """
         Recoit tous les evenements de confirmation de lectures
         :param message:
+        :param consumers: Consumers qui ont enregistre la routing key du message (None : tous les consumers)
         :return:
         """
-        self.__logger.debug("recevoir_message Traiter dans chaque consumer %s" % message)
+        self.__logger.debug("recevoir_message Traiter dans chaque consumer %s", message)
 
         message_interne = {
             'confirmation': True,
             'message': message,
+            'consumers': consumers,
         }
 
         await self.__q_lectures.put(message_interne)
@@ -295,17 +515,54 @@ class AppareilHandler:
         # Sink vers fichier buffer interne
         await self.__q_lectures.put(message_interne)
 
-    async def transmettre_lecture(self, message: dict):
+    async def rejouer_journal(self):
+        """
+        Transmet les lectures du journal en ordre. Le journal est confirme une fois par lot (derniere lecture
+        transmise), un lot peut etre retransmis apres un crash (at-least-once).
+        """
+        stop_event = self._etat_senseurspassifs.stop_event
+        while stop_event.is_set() is False:
+            await self.__journal.disponible.wait()
+
+            lot = await self.__journal.lire_lot(TAILLE_LOT_REJEU)
+            derniere_sequence = None
+            for sequence, message in lot:
+                if await self.transmettre_lecture(message) is False:
+                    break
+                derniere_sequence = sequence
+
+            if derniere_sequence is not None:
+                self.__journal.confirmer(derniere_sequence)
+                if self.__journal.backlog == 0:
+                    self.__logger.info("Journal des lectures rejoue au complet")
+
+            if derniere_sequence is None or derniere_sequence != lot[-1][0]:
+                # Echec de transmission, MQ n'est pas disponible
+                try:
+                    await asyncio.wait_for(stop_event.wait(), ATTENTE_REJEU)
+                except TimeoutError:
+                    pass
+
+    async def transmettre_lecture(self, message: dict) -> bool:
+        """
+        :return: False si la lecture n'a pas ete transmise (formatteur ou MQ pas prets, erreur)
+        """
+        if self.__formatteur_message_appareil is None:
+            self.__logger.debug("Formatteur message pas pret, lecture n'est pas transmise")
+            return False
+
         if self.producer is None:
             self.__logger.debug("Producer n'est pas pret, lecture n'est pas transmise")
-            return
+            return False
 
-        event_producer = self.producer.producer_pret()
+        producer = self.producer
+        event_producer = producer.producer_pret()
+        reconnexion = event_producer.is_set() is False
         try:
             await asyncio.wait_for(event_producer.wait(), 1)
         except TimeoutError:
             self.__logger.debug("Producer MQ pas pret, abort transmission")
-            return
+            return False
 
         uuid_appareil = self.uuid_appareil
         message_reformatte = {
@@ -317,12 +574,14 @@ class AppareilHandler:
         except KeyError:
             pass
 
-        message_signe, _ = self.__formatteur_message_appareil.signer_message(
+        formatteur = self.__formatteur_message_appareil
+        ajouter_chaine_certs = self.__ajouter_chaine_certs(producer, formatteur, reconnexion)
+        message_signe, _ = formatteur.signer_message(
             Constantes.KIND_EVENEMENT,
             message_reformatte,
             domaine=ConstantesSenseursPassifs.DOMAINE_SENSEURSPASSIFS,
             action=ConstantesSenseursPassifs.EVENEMENT_ETAT_APPAREIL,
-            ajouter_chaine_certs=True
+            ajouter_chaine_certs=ajouter_chaine_certs
         )
 
         message_enveloppe = {
@@ -330,17 +589,51 @@ class AppareilHandler:
             'lecture': message_signe,
         }
 
-        await self.producer.emettre_evenement(
-            message_enveloppe,
-            ConstantesSenseursPassifs.ROLE_SENSEURSPASSIFS_RELAI,
-            ConstantesSenseursPassifs.EVENEMENT_DOMAINE_LECTURE,
-            exchanges=[Constantes.SECURITE_PRIVE]
-        )
+        try:
+            await producer.emettre_evenement(
+                message_enveloppe,
+                ConstantesSenseursPassifs.ROLE_SENSEURSPASSIFS_RELAI,
+                ConstantesSenseursPassifs.EVENEMENT_DOMAINE_LECTURE,
+                exchanges=[Constantes.SECURITE_PRIVE]
+            )
+        except Exception as e:
+            self.__logger.warning("Erreur transmission lecture, conservee dans le journal : %s", e)
+            self.__chaine_transmise = None  # Retransmettre la chaine avec le prochain message
+            return False
+
+        metrics = self._etat_senseurspassifs.metrics
+        metrics.increment('transmit.events')
+        metrics.increment('transmit.readings', len(message['senseurs']))
+        if ajouter_chaine_certs:
+            self.__chaine_transmise = (producer, formatteur, time.monotonic())
+        else:
+            metrics.increment('transmit.chain_elided')
+
+        return True
+
+    def __ajouter_chaine_certs(self, producer, formatteur: FormatteurMessageMilleGrilles, reconnexion: bool) -> bool:
+        """
+        La chaine de certificats est ajoutee au premier message apres une connexion a MQ ou un renouvellement du
+        certificat d'appareil, puis a chaque READINGS_CERT_CHAIN_INTERVAL. Les autres messages sont valides avec le
+        certificat deja recu (pubkey, cache des certificats).
+        Approximation basee sur le temps, rien n'est negocie avec le backend : si le backend perd le certificat de
+        son cache sans deconnexion MQ, les messages sans chaine sont rejetes jusqu'a la fin de l'intervalle.
+        """
+        intervalle = self._etat_senseurspassifs.configuration.chaine_certs_intervalle
+        if intervalle <= 0 or reconnexion or self.__chaine_transmise is None:
+            return True
+        producer_chaine, formatteur_chaine, temps_chaine = self.__chaine_transmise
+        return producer is not producer_chaine or formatteur is not formatteur_chaine or \
+            time.monotonic() - temps_chaine >= intervalle
 
     @property
     def producer(self):
         return self._etat_senseurspassifs.producer
 
+    @property
+    def etat_lectures(self) -> EtatLectures:
+        return self.__etat_lectures
+
     def get_routing_key_consumers(self) -> list:
         # Creer liste de routing keys (dedupe avec set)
         routing_keys = set()
@@ -349,6 +642,17 @@ class AppareilHandler:
 
         return list(routing_keys)
 
+    def get_table_routage(self) -> TableRoutage:
+        """
+        :return: Table des routing keys (patterns) vers les consumers qui les ont enregistrees
+        """
+        table = TableRoutage()
+        for consumer in self._modules_consumer:
+            for routing_key in consumer.routing_keys():
+                table.ajouter(routing_key, consumer)
+
+        return table
+
 
 class SenseurModuleProducerAbstract:
     """
@@ -378,6 +682,7 @@ class SenseurModuleProducerAbstract:
         """
         if no_senseur is None:
             no_senseur = self._no_senseur
+
         await self.__lecture_callback(no_senseur, senseurs)
 
     async def fermer(self):
@@ -389,6 +694,13 @@ class SenseurModuleConsumerAbstract:
     Module de reception de lectures (e.g. affichage LCD)
     """
 
+    # File de messages du consumer (override au besoin). Un affichage a seulement besoin des dernieres lectures.
+    taille_file = 20
+    politique_file = POLITIQUE_RETIRER_ANCIEN
+
+    # False si le consumer utilise seulement handler.etat_lectures (les lectures ne sont pas mises dans sa file)
+    recevoir_lectures = True
+
     def __init__(self, handler: AppareilHandler, etat_senseurspassifs: EtatSenseursPassifs, no_senseur: str):
         self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
         self._handler = handler
@@ -398,6 +710,10 @@ class SenseurModuleConsumerAbstract:
 
         self.__event_attente: Optional[Event] = None
 
+    @property
+    def nom_file(self) -> str:
+        return '%s.%s' % (self.__class__.__name__, self._no_senseur)
+
     async def run(self):
         self.__event_attente = Event()
 
@@ -429,9 +745,9 @@ class SenseurModuleConsumerAbstract:
                 if hasattr(self, 'rafraichir'):
                     await self.rafraichir()
         except FileNotFoundError:
-            self.__logger.debug("Fichier %s n'est pas preset" % path_config)
+            self.__logger.debug("Fichier %s n'est pas preset", path_config)
         except json.decoder.JSONDecodeError:
-            self.__logger.debug("Fichier %s est corrompu" % path_config)
+            self.__logger.debug("Fichier %s est corrompu", path_config)
 
     async def appliquer_configuration(self, configuration_hub: dict):
         self._configuration_hub = configuration_hub
@@ -501,7 +817,7 @@ class DummyProducer(SenseurModuleProducerAbstract):
             }
         }
 
-        self.__logger.debug("Produire lecture dummy %s" % dict_message)
+        self.__logger.debug("Produire lecture dummy %s", dict_message)
 
         await self.lecture(dict_message)
 
@@ -524,7 +840,7 @@ class DummyConsumer(SenseurModuleConsumerAbstract):
         self.__uuid_senseurs = self.get_uuid_senseurs()
 
     async def traiter(self, message):
-        self.__logger.debug("DummyConsumer Traiter message %s" % message)
+        self.__logger.debug("DummyConsumer Traiter message %s", message)
         # Matcher message pour ce senseur
         if message.get('interne') is True:
             message_recu = message['message']
@@ -540,9 +856,9 @@ class DummyConsumer(SenseurModuleConsumerAbstract):
         if action in ['lecture', 'lectureConfirmee']:
             if message_recu.get('uuid_senseur') in self.__uuid_senseurs:
                 senseurs = message_recu['senseurs']
-                self.__logger.info("DummyConsumer recu lecture %s" % senseurs)
+                self.__logger.info("DummyConsumer recu lecture %s", senseurs)
         elif action == 'majNoeud':
-            self.__logger.debug("Remplacement configuration noeud avec %s" % message_recu)
+            self.__logger.debug("Remplacement configuration noeud avec %s", message_recu)
             await self.appliquer_configuration(message_recu)
 
     def routing_keys(self) -> list:
@@ -1,14 +1,19 @@
 import argparse
 import asyncio
 import datetime
+import json
 import logging
+import os
 
 from asyncio import Event, AbstractEventLoop, TimeoutError
 from typing import Optional
 
 from millegrilles_messages.docker_obsolete.Entretien import TacheEntretien
 from millegrilles_senseurspassifs.Configuration import ConfigurationSenseursPassifs
+from millegrilles_senseurspassifs.EventLoop import ajouter_argument_event_loop
 from millegrilles_senseurspassifs.EtatSenseursPassifs import EtatSenseursPassifs
+from millegrilles_senseurspassifs.LoopMonitor import LoopLagMonitor
+from millegrilles_senseurspassifs.Profiler import ProfilerSurDemande
 from millegrilles_senseurspassifs.RabbitMQDao import RabbitMQDao
 from millegrilles_senseurspassifs.ModulesBase import AppareilHandlerBase
 from millegrilles_senseurspassifs.SenseursLogHandler import SenseursLogHandler
@@ -40,6 +45,7 @@ class ApplicationInstance:
         taches = list()
         taches.append(TacheEntretien(datetime.timedelta(minutes=30), self.rotation_logs))
         taches.append(TacheEntretien(datetime.timedelta(minutes=5), self.verifier_expirations))
+        taches.append(TacheEntretien(datetime.timedelta(minutes=1), self.exporter_metriques))
         return taches
 
     def parse(self):
@@ -77,6 +83,7 @@ class ApplicationInstance:
             '--affichagelog', action="store_true", required=False,
             help="Initialise un affichage senseurs dans logging (debug)"
         )
+        ajouter_argument_event_loop(parser)  # Utilise au demarrage par EventLoop.run()
 
     async def charger_configuration(self, args: argparse.Namespace):
         """
@@ -115,6 +122,15 @@ class ApplicationInstance:
     async def rotation_logs(self):
         await self.__senseurs_log_handler.rotation_logs()
 
+    async def exporter_metriques(self):
+        """ Ecrit les metriques (retard event loop, etc.) dans senseurspassifs_path/metrics.json """
+        metriques = self._etat_senseurspassifs.metrics.export()
+        path_fichier = os.path.join(self._etat_senseurspassifs.configuration.senseurspassifs_path, 'metrics.json')
+        try:
+            await asyncio.to_thread(ecrire_json_atomique, path_fichier, metriques)
+        except OSError as e:
+            self.__logger.warning("Erreur sauvegarde metriques %s : %s", path_fichier, e)
+
     async def verifier_expirations(self):
         """ Verifie l'expiration de la configuration, reload au besoin """
         reload = False
@@ -193,8 +209,16 @@ class ApplicationInstance:
         :return:
         """
 
+        configuration = self._etat_senseurspassifs.configuration
+        loop_monitor = LoopLagMonitor(self._etat_senseurspassifs.metrics,
+                                      configuration.loop_monitor_intervalle, configuration.loop_monitor_seuil)
+        profiler = ProfilerSurDemande(configuration.lecture_log_directory, configuration.profiler_duree,
+                                      configuration.profiler_au_demarrage)
+
         tasks = [
             asyncio.create_task(self.entretien(), name="entretien"),
+            asyncio.create_task(loop_monitor.run(self._stop_event), name="loop_monitor"),
+            asyncio.create_task(profiler.run(self._stop_event), name="profiler"),
             asyncio.create_task(self.__rabbitmq_dao.run(), name="mq"),
             asyncio.create_task(self._senseur_modules_handler.run(), name="senseur_modules"),
             asyncio.create_task(self.__attendre_fermer())
@@ -205,3 +229,10 @@ class ApplicationInstance:
             await asyncio.tasks.wait(tasks, return_when=asyncio.tasks.FIRST_COMPLETED)
         finally:
             await self.fermer()
+
+
+def ecrire_json_atomique(path_fichier: str, contenu: dict):
+    path_tmp = path_fichier + '.tmp'
+    with open(path_tmp, 'w') as fichier:
+        json.dump(contenu, fichier)
+    os.replace(path_tmp, path_fichier)
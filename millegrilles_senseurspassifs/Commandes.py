@@ -19,7 +19,7 @@ class CommandHandler:
         self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
         self._etat_instance = etat_senseurspassifs
         self._modules_handler = modules_handler
-        self.__routing_keys_modules = modules_handler.get_routing_key_consumers()
+        self.__table_routage = modules_handler.get_table_routage()
 
     async def executer_commande(self, producer: MessageProducerFormatteur, message: MessageWrapper):
         reponse = None
@@ -56,23 +56,9 @@ class CommandHandler:
             #     if Constantes.ROLE_CORE in roles:
             #         if action == ConstantesInstance.EVENEMENT_TOPOLOGIE_FICHEPUBLIQUE:
             #             return await self.sauvegarder_fiche_publique(message)
-            rks = list()
-            for rk in self.__routing_keys_modules:
-                if isinstance(rk, str):
-                    rks.append(rk)
-                elif isinstance(rk, tuple):
-                    securite, rk_str = rk
-                    rks.append(rk_str)
-
-            if routing_key in rks:
-                return await self._modules_handler.recevoir_confirmation_lecture(message)
-            else:
-                routing_key_generic = routing_key.split('.')
-                if len(routing_key_generic) == 4:
-                    routing_key_generic[2] = '*'
-                    routing_key_generic = '.'.join(routing_key_generic)
-                    if routing_key_generic in rks:
-                        return await self._modules_handler.recevoir_confirmation_lecture(message)
+            consumers = self.__table_routage.trouver(routing_key)
+            if len(consumers) > 0:
+                return await self._modules_handler.recevoir_confirmation_lecture(message, consumers)
 
             if reponse is None:
                 reponse = {'ok': False, 'err': 'Commande inconnue ou acces refuse'}
@@ -11,6 +11,19 @@ CONST_SENSEURSPASSIFS_PARAMS = [
     Constantes.ENV_CA_PEM,
     Constantes.ENV_MQ_HOSTNAME,
     Constantes.ENV_MQ_PORT,
+    ConstantesSenseursPassifs.ENV_LOOP_MONITOR_INTERVAL_MS,
+    ConstantesSenseursPassifs.ENV_LOOP_MONITOR_THRESHOLD_MS,
+    ConstantesSenseursPassifs.ENV_PROFILER_DURATION,
+    ConstantesSenseursPassifs.ENV_PROFILER_ON_START,
+    ConstantesSenseursPassifs.ENV_JOURNAL_MAX_BYTES,
+    ConstantesSenseursPassifs.ENV_READINGS_LOG_FORMAT,
+    ConstantesSenseursPassifs.ENV_AGGREGATION_WINDOW,
+    ConstantesSenseursPassifs.ENV_AGGREGATION_BUFFER,
+    ConstantesSenseursPassifs.ENV_READINGS_DEADBAND,
+    ConstantesSenseursPassifs.ENV_READINGS_HEARTBEAT,
+    ConstantesSenseursPassifs.ENV_READINGS_BATCH_WINDOW,
+    ConstantesSenseursPassifs.ENV_READINGS_CERT_CHAIN_INTERVAL,
+    ConstantesSenseursPassifs.ENV_READINGS_SNAPSHOT_INTERVAL,
 ]
 
 
@@ -32,6 +45,20 @@ class ConfigurationSenseursPassifs:
         self.mq_host: Optional[str] = None
         self.mq_port: Optional[int] = None
 
+        self.loop_monitor_intervalle = 0.0  # Secondes (e.g. 0.1), 0 pour desactiver le moniteur de l'event loop
+        self.loop_monitor_seuil = 0.25  # Secondes de blocage avant de logger la task courante
+        self.profiler_duree = 30  # Secondes d'un profil (SIGUSR1 cpu, SIGUSR2 memoire)
+        self.profiler_au_demarrage: Optional[str] = None  # cpu ou memory
+        self.journal_taille_max = 50 * 1024 * 1024  # Octets du journal des lectures non transmises (MQ hors ligne), 0 = desactive
+        self.lecture_log_format: Optional[str] = None  # jsonl ou bin, log local des lectures desactive par defaut
+        self.agregation_fenetre = 0  # Secondes, lectures agregees (min/max/avg/last) avant transmission. 0 = desactive
+        self.agregation_capacite = 600  # Echantillons conserves par senseur dans une fenetre
+        self.filtre_deadbands: Optional[str] = None  # type:seuil[,type:seuil], ex. temperature:0.2,pression:0.1%,*:0
+        self.filtre_heartbeat = 240  # Secondes, lecture transmise meme sans changement (affichage : '?' a 5 minutes)
+        self.lot_fenetre = 0.0  # Secondes, lectures des producers regroupees dans un seul evenement signe. 0 = desactive
+        self.chaine_certs_intervalle = 0  # Secondes entre deux envois de la chaine de certificats (best effort). 0 = chaque message
+        self.etat_lectures_intervalle = 0  # Secondes entre deux sauvegardes des dernieres lectures (affichages). 0 = desactive
+
     def get_env(self) -> dict:
         """
         Extrait l'information pertinente pour pika de os.environ
@@ -67,3 +94,43 @@ class ConfigurationSenseursPassifs:
             self.mq_port = int(dict_params.get(Constantes.ENV_MQ_PORT) or self.mq_port)
         except TypeError:
             self.mq_port = None
+
+        loop_monitor_intervalle = dict_params.get(ConstantesSenseursPassifs.ENV_LOOP_MONITOR_INTERVAL_MS)
+        if loop_monitor_intervalle:
+            self.loop_monitor_intervalle = int(loop_monitor_intervalle) / 1000
+        loop_monitor_seuil = dict_params.get(ConstantesSenseursPassifs.ENV_LOOP_MONITOR_THRESHOLD_MS)
+        if loop_monitor_seuil:
+            self.loop_monitor_seuil = int(loop_monitor_seuil) / 1000
+
+        profiler_duree = dict_params.get(ConstantesSenseursPassifs.ENV_PROFILER_DURATION)
+        if profiler_duree:
+            self.profiler_duree = float(profiler_duree)
+        self.profiler_au_demarrage = dict_params.get(ConstantesSenseursPassifs.ENV_PROFILER_ON_START) or self.profiler_au_demarrage
+
+        journal_taille_max = dict_params.get(ConstantesSenseursPassifs.ENV_JOURNAL_MAX_BYTES)
+        if journal_taille_max:
+            self.journal_taille_max = int(journal_taille_max)
+        self.lecture_log_format = dict_params.get(ConstantesSenseursPassifs.ENV_READINGS_LOG_FORMAT) or self.lecture_log_format
+
+        agregation_fenetre = dict_params.get(ConstantesSenseursPassifs.ENV_AGGREGATION_WINDOW)
+        if agregation_fenetre:
+            self.agregation_fenetre = float(agregation_fenetre)
+        agregation_capacite = dict_params.get(ConstantesSenseursPassifs.ENV_AGGREGATION_BUFFER)
+        if agregation_capacite:
+            self.agregation_capacite = int(agregation_capacite)
+
+        self.filtre_deadbands = dict_params.get(ConstantesSenseursPassifs.ENV_READINGS_DEADBAND) or self.filtre_deadbands
+        filtre_heartbeat = dict_params.get(ConstantesSenseursPassifs.ENV_READINGS_HEARTBEAT)
+        if filtre_heartbeat:
+            self.filtre_heartbeat = float(filtre_heartbeat)
+
+        lot_fenetre = dict_params.get(ConstantesSenseursPassifs.ENV_READINGS_BATCH_WINDOW)
+        if lot_fenetre:
+            self.lot_fenetre = float(lot_fenetre)
+        chaine_certs_intervalle = dict_params.get(ConstantesSenseursPassifs.ENV_READINGS_CERT_CHAIN_INTERVAL)
+        if chaine_certs_intervalle:
+            self.chaine_certs_intervalle = float(chaine_certs_intervalle)
+
+        etat_lectures_intervalle = dict_params.get(ConstantesSenseursPassifs.ENV_READINGS_SNAPSHOT_INTERVAL)
+        if etat_lectures_intervalle:
+            self.etat_lectures_intervalle = float(etat_lectures_intervalle)
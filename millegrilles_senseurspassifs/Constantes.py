@@ -3,11 +3,28 @@ PARAM_MQ_URL = 'MQ_URL'
 PARAM_CERT_PATH = 'CERT_PATH'
 PARAM_KEY_PATH = 'KEY_PATH'
 PARAM_CA_PATH = 'CA_PATH'
+ENV_LOOP_MONITOR_INTERVAL_MS = 'LOOP_MONITOR_INTERVAL_MS'
+ENV_LOOP_MONITOR_THRESHOLD_MS = 'LOOP_MONITOR_THRESHOLD_MS'
+ENV_PROFILER_DURATION = 'PROFILER_DURATION'
+ENV_PROFILER_ON_START = 'PROFILER_ON_START'
+ENV_JOURNAL_MAX_BYTES = 'JOURNAL_MAX_BYTES'
+ENV_READINGS_LOG_FORMAT = 'READINGS_LOG_FORMAT'
+ENV_AGGREGATION_WINDOW = 'AGGREGATION_WINDOW'
+ENV_AGGREGATION_BUFFER = 'AGGREGATION_BUFFER'
+ENV_READINGS_DEADBAND = 'READINGS_DEADBAND'
+ENV_READINGS_HEARTBEAT = 'READINGS_HEARTBEAT'
+ENV_READINGS_BATCH_WINDOW = 'READINGS_BATCH_WINDOW'
+ENV_READINGS_CERT_CHAIN_INTERVAL = 'READINGS_CERT_CHAIN_INTERVAL'
+ENV_READINGS_SNAPSHOT_INTERVAL = 'READINGS_SNAPSHOT_INTERVAL'
+
+LOG_FORMAT_JSONL = 'jsonl'
+LOG_FORMAT_BIN = 'bin'
 
 DOMAINE_SENSEURSPASSIFS = 'SenseursPassifs'
 ROLE_SENSEURSPASSIFS_RELAI = 'senseurspassifs_relai'
 EVENEMENT_DOMAINE_LECTURE = 'lecture'
 EVENEMENT_ETAT_APPAREIL = 'etatAppareil'
+EVENEMENT_LECTURE_CONFIRMEE = 'lectureConfirmee'
 
 REQUETE_LISTE_NOEUDS = 'listeNoeuds'
 REQUETE_GET_NOEUD = 'getNoeud'
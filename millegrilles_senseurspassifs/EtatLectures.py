@@ -0,0 +1,153 @@
+# Etat courant des lectures (derniere valeur par senseur) partage entre les consumers du hub
+import json
+import logging
+import os
+
+from typing import Callable, Iterable, Optional
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+VERSION_SAUVEGARDE = 1
+
+
+class LectureCourante:
+
+    __slots__ = ('valeur', 'timestamp', 'type')
+
+    def __init__(self, valeur, timestamp: Optional[int], type_senseur: Optional[str]):
+        self.valeur = valeur
+        self.timestamp = timestamp
+        self.type = type_senseur
+
+
+class EtatLectures:
+    """
+    Derniere lecture de chaque senseur, cle (uuid_senseur, senseur). Maintenu par AppareilHandler a partir des
+    lectures internes et des confirmations recues de MQ. Seuls les appareils declares par les abonnes (e.g. lignes
+    d'un affichage) sont conserves. Les consumers lisent les LectureCourante directement (sans copie, ne pas
+    modifier) et peuvent etre notifies des changements de leurs appareils.
+    L'etat peut etre sauvegarde sur disque et recharge au demarrage : les affichages montrent les dernieres valeurs
+    (marquees '?' ou '!' selon leur age) avant la reponse de MQ, qui remplace seulement les valeurs plus recentes.
+    """
+
+    def __init__(self, metrics: MetricsRegistry):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__lectures: dict[tuple[str, str], LectureCourante] = dict()
+        self.__abonnes: dict[object, frozenset[str]] = dict()  # abonne: uuid_senseurs
+        self.__callbacks: dict[object, Callable[[str, list[str]], None]] = dict()  # abonne: callback
+        self.__uuid_senseurs: set[str] = set()  # Appareils conserves (union des abonnes)
+        self.__modifications = 0  # Mises a jour depuis la derniere sauvegarde
+
+        metrics.register_gauge('etat.lectures', lambda: len(self.__lectures))
+
+    def __len__(self):
+        return len(self.__lectures)
+
+    def get(self, uuid_senseur: str, senseur: str) -> Optional[LectureCourante]:
+        return self.__lectures.get((uuid_senseur, senseur))
+
+    def abonner(self, abonne, uuid_senseurs: Iterable[str],
+                callback: Optional[Callable[[str, list[str]], None]] = None):
+        """
+        Declare les appareils utilises par l'abonne (remplace sa declaration precedente). Les lectures des appareils
+        qui ne sont plus utilises par aucun abonne sont retirees.
+        :param callback: Appele avec (uuid_senseur, senseurs modifies) apres chaque mise a jour d'un appareil
+                         declare par l'abonne
+        """
+        self.__abonnes[abonne] = frozenset(uuid_senseurs)
+        if callback is not None:
+            self.__callbacks[abonne] = callback
+        else:
+            self.__callbacks.pop(abonne, None)
+        self.__uuid_senseurs = set().union(*self.__abonnes.values())
+
+        retirees = [cle for cle in self.__lectures.keys() if cle[0] not in self.__uuid_senseurs]
+        for cle in retirees:
+            del self.__lectures[cle]
+        if len(retirees) > 0:
+            self.__modifications += 1
+
+    def maj(self, uuid_senseur: str, senseurs: dict) -> list[str]:
+        """
+        Conserve les lectures plus recentes que l'etat courant (une lecture sans timestamp remplace toujours).
+        Les lectures des appareils qui ne sont pas declares par un abonne sont ignorees.
+        :return: Senseurs modifies
+        """
+        if uuid_senseur not in self.__uuid_senseurs:
+            return list()
+        return self.__maj(uuid_senseur, senseurs)
+
+    def __maj(self, uuid_senseur: str, senseurs: dict) -> list[str]:
+        modifies = list()
+        for senseur_id, lecture in senseurs.items():
+            try:
+                valeur = lecture['valeur']
+            except (TypeError, KeyError):
+                continue  # Pas une lecture (e.g. senseur sans valeur)
+            timestamp = lecture.get('timestamp')
+
+            cle = (uuid_senseur, senseur_id)
+            courante = self.__lectures.get(cle)
+            if courante is None:
+                self.__lectures[cle] = LectureCourante(valeur, timestamp, lecture.get('type'))
+            elif timestamp is not None and courante.timestamp is not None and timestamp < courante.timestamp:
+                continue  # Lecture plus vieille que l'etat courant
+            else:
+                courante.valeur = valeur
+                courante.timestamp = timestamp
+                courante.type = lecture.get('type')
+            modifies.append(senseur_id)
+
+        if len(modifies) > 0:
+            self.__modifications += 1
+            for abonne, callback in self.__callbacks.items():
+                if uuid_senseur in self.__abonnes[abonne]:
+                    try:
+                        callback(uuid_senseur, modifies)
+                    except Exception:
+                        self.__logger.exception("Erreur notification abonne etat lectures")
+
+        return modifies
+
+    def sauvegarder(self, path_fichier: str) -> bool:
+        """
+        Ecrit l'etat courant (remplacement atomique du fichier). Rien a faire si aucune mise a jour.
+        :return: True si le fichier a ete ecrit
+        """
+        if self.__modifications == 0:
+            return False
+
+        lectures = [[uuid_senseur, senseur_id, lecture.valeur, lecture.timestamp, lecture.type]
+                    for (uuid_senseur, senseur_id), lecture in self.__lectures.items()]
+        self.__modifications = 0
+
+        path_tmp = path_fichier + '.tmp'
+        with open(path_tmp, 'w') as fichier:
+            json.dump({'version': VERSION_SAUVEGARDE, 'lectures': lectures}, fichier)
+        os.replace(path_tmp, path_fichier)
+        return True
+
+    def charger(self, path_fichier: str):
+        """
+        Charge l'etat sauvegarde. Les lectures deja presentes et plus recentes sont conservees.
+        Les abonnes ne sont pas encore configures au demarrage : toutes les lectures sauvegardees (deja filtrees lors
+        de la sauvegarde) sont chargees, les appareils non utilises sont retires au prochain abonner().
+        """
+        try:
+            with open(path_fichier, 'r') as fichier:
+                sauvegarde = json.load(fichier)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            self.__logger.warning("Sauvegarde des lectures %s illisible, ignoree", path_fichier)
+            return
+
+        if sauvegarde.get('version') != VERSION_SAUVEGARDE:
+            self.__logger.warning("Version de sauvegarde des lectures non supportee : %s", sauvegarde.get('version'))
+            return
+
+        for uuid_senseur, senseur_id, valeur, timestamp, type_senseur in sauvegarde['lectures']:
+            self.__maj(uuid_senseur, {senseur_id: {'valeur': valeur, 'timestamp': timestamp, 'type': type_senseur}})
+        self.__modifications = 0
+
+        self.__logger.info("Chargement de %d lectures sauvegardees", len(sauvegarde['lectures']))
@@ -9,6 +9,7 @@ from millegrilles_messages.messages.EnveloppeCertificat import EnveloppeCertific
 from millegrilles_messages.messages.FormatteurMessages import SignateurTransactionSimple, FormatteurMessageMilleGrilles
 from millegrilles_messages.messages.ValidateurCertificats import ValidateurCertificatCache
 from millegrilles_senseurspassifs.Configuration import ConfigurationSenseursPassifs
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
 from millegrilles_messages.messages.MessagesModule import MessageProducerFormatteur
 from millegrilles_senseurspassifs.ValidateurMessageControleur import ValidateurMessageControleur
 
@@ -40,6 +41,8 @@ class EtatSenseursPassifs:
 
         self.__fiche_publique: Optional[dict] = None
 
+        self.__metrics = MetricsRegistry()
+
     async def reload_configuration(self):
         self.__logger.info("Reload configuration sur disque ou dans docker")
 
@@ -103,6 +106,10 @@ class EtatSenseursPassifs:
     async def valider_certificat(self, certificat: list[str]):
         return await self.__validateur_certificats.valider(certificat)
 
+    @property
+    def metrics(self) -> MetricsRegistry:
+        return self.__metrics
+
     @property
     def configuration(self):
         return self.__configuration
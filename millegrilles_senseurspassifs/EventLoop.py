@@ -0,0 +1,62 @@
+# Selection de l'event loop (asyncio par defaut, uvloop optionnel)
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from typing import Callable, Coroutine, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+LOGGER = logging.getLogger(__name__)
+
+ENV_EVENT_LOOP = 'EVENT_LOOP'
+EVENT_LOOP_ASYNCIO = 'asyncio'
+EVENT_LOOP_UVLOOP = 'uvloop'
+EVENT_LOOPS = [EVENT_LOOP_ASYNCIO, EVENT_LOOP_UVLOOP]
+
+
+def ajouter_argument_event_loop(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        '--event-loop', type=str, choices=EVENT_LOOPS, required=False, dest='event_loop',
+        help="Event loop (defaut: variable %s ou asyncio). uvloop doit etre installe." % ENV_EVENT_LOOP
+    )
+
+
+def event_loop_demandee(argv: Optional[list[str]] = None) -> str:
+    """
+    :return: Event loop demandee avec --event-loop, sinon avec la variable d'environnement EVENT_LOOP, sinon asyncio.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    ajouter_argument_event_loop(parser)
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    nom = args.event_loop or os.environ.get(ENV_EVENT_LOOP) or EVENT_LOOP_ASYNCIO
+    if nom not in EVENT_LOOPS:
+        raise ValueError('%s invalide : %s' % (ENV_EVENT_LOOP, nom))
+    return nom
+
+
+def loop_factory(nom: str) -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """
+    :return: Loop factory pour asyncio.Runner, None pour la loop asyncio par defaut.
+    """
+    if nom == EVENT_LOOP_UVLOOP:
+        if uvloop is None:
+            LOGGER.warning("uvloop n'est pas installe, utilisation de l'event loop asyncio")
+            return None
+        return uvloop.new_event_loop
+    return None
+
+
+def run(coro: Coroutine, nom: Optional[str] = None):
+    """
+    Remplacement de asyncio.run() qui utilise l'event loop demandee (--event-loop ou EVENT_LOOP).
+    """
+    if nom is None:
+        nom = event_loop_demandee()
+    with asyncio.Runner(loop_factory=loop_factory(nom)) as runner:
+        return runner.run(coro)
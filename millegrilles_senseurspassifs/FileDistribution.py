@@ -0,0 +1,64 @@
+# Files bornees par destination (transmission MQ, consumers) avec politique de debordement
+import asyncio
+import logging
+
+from typing import Awaitable, Callable
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+POLITIQUE_BLOQUER = 'block'  # Le distributeur attend une place (back-pressure vers les producers)
+POLITIQUE_RETIRER_ANCIEN = 'drop_oldest'  # Le plus vieux message est retire (affichages : derniere valeur)
+POLITIQUE_RETIRER_NOUVEAU = 'drop_newest'  # Le nouveau message est ignore
+
+POLITIQUES = (POLITIQUE_BLOQUER, POLITIQUE_RETIRER_ANCIEN, POLITIQUE_RETIRER_NOUVEAU)
+
+
+class FileDistribution:
+    """
+    File d'une destination avec sa propre task de traitement. Une destination lente remplit seulement sa file.
+    Metriques : queue.<nom>.depth (gauge), queue.<nom>.dropped (compteur).
+    """
+
+    def __init__(self, metrics: MetricsRegistry, nom: str, taille: int, politique: str = POLITIQUE_RETIRER_ANCIEN):
+        if politique not in POLITIQUES:
+            raise ValueError('Politique de file inconnue : %s' % politique)
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__metrics = metrics
+        self.__nom = nom
+        self.__politique = politique
+        self.__file: asyncio.Queue = asyncio.Queue(maxsize=taille)
+
+        metrics.register_gauge('queue.%s.depth' % nom, self.__file.qsize)
+
+    @property
+    def nom(self) -> str:
+        return self.__nom
+
+    async def soumettre(self, message):
+        if self.__politique == POLITIQUE_BLOQUER:
+            await self.__file.put(message)
+            return
+
+        try:
+            self.__file.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        self.__metrics.increment('queue.%s.dropped' % self.__nom)
+        if self.__politique == POLITIQUE_RETIRER_ANCIEN:
+            self.__file.get_nowait()
+            self.__file.task_done()
+            self.__file.put_nowait(message)
+
+    async def run(self, traiter: Callable[[object], Awaitable]):
+        while True:
+            message = await self.__file.get()
+            try:
+                await traiter(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.__logger.exception("Erreur traitement message file %s", self.__nom)
+            finally:
+                self.__file.task_done()
@@ -0,0 +1,93 @@
+# Filtre des lectures transmises sur MQ : deadband par type de senseur et heartbeat
+import time
+
+from typing import Optional
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+TYPE_DEFAUT = '*'
+
+
+class Deadband:
+
+    __slots__ = ('absolu', 'relatif')
+
+    def __init__(self, absolu: float = 0.0, relatif: float = 0.0):
+        self.absolu = absolu
+        self.relatif = relatif
+
+    def depasse(self, valeur: float, precedente: float) -> bool:
+        ecart = abs(valeur - precedente)
+        if self.relatif > 0:
+            return ecart > self.relatif * abs(precedente)
+        return ecart > self.absolu
+
+
+def parse_deadbands(valeur: str) -> dict[str, Deadband]:
+    """
+    Format : type:seuil[,type:seuil], seuil absolu (0.2) ou relatif (1%). Le type * s'applique aux autres types.
+    Exemple : temperature:0.2,humidite:1,pression:0.1%,*:0
+    """
+    deadbands = dict()
+    for element in valeur.split(','):
+        element = element.strip()
+        if element == '':
+            continue
+        type_senseur, seuil = element.split(':')
+        seuil = seuil.strip()
+        if seuil.endswith('%'):
+            deadbands[type_senseur.strip()] = Deadband(relatif=float(seuil[:-1]) / 100)
+        else:
+            deadbands[type_senseur.strip()] = Deadband(absolu=float(seuil))
+    return deadbands
+
+
+class FiltreLectures:
+    """
+    Transmet une lecture seulement si sa valeur sort du deadband de son type depuis la derniere lecture transmise,
+    ou si le heartbeat est expire. Les types sans deadband (et sans type *) ne sont pas filtres.
+    Les valeurs non numeriques sont transmises lorsqu'elles changent.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, deadbands: dict[str, Deadband], heartbeat: float):
+        self.__metrics = metrics
+        self.__deadbands = deadbands
+        self.__heartbeat = heartbeat
+        self.__transmises: dict[tuple[str, str], tuple[object, float]] = dict()  # (no_senseur, senseur): (valeur, temps)
+
+    def filtrer(self, no_senseur: str, senseurs: dict) -> dict:
+        """
+        :return: Lectures a transmettre (dict vide si toutes sont filtrees)
+        """
+        maintenant = time.monotonic()
+        resultat = dict()
+        for senseur_id, lecture in senseurs.items():
+            valeur = lecture.get('valeur')
+            type_senseur = lecture.get('type')
+            cle = (no_senseur, senseur_id)
+            if self.__transmettre(cle, type_senseur, valeur, maintenant):
+                self.__transmises[cle] = (valeur, maintenant)
+                resultat[senseur_id] = lecture
+            else:
+                self.__metrics.increment('filter.suppressed')
+                self.__metrics.increment('filter.suppressed.%s' % type_senseur)
+
+        return resultat
+
+    def __transmettre(self, cle: tuple[str, str], type_senseur: Optional[str], valeur, maintenant: float) -> bool:
+        deadband = self.__deadbands.get(type_senseur) or self.__deadbands.get(TYPE_DEFAUT)
+        if deadband is None:
+            return True  # Type non filtre
+
+        try:
+            precedente, temps = self.__transmises[cle]
+        except KeyError:
+            return True  # Premiere lecture
+
+        if maintenant - temps >= self.__heartbeat:
+            return True
+
+        numerique = isinstance(valeur, (int, float)) and not isinstance(valeur, bool)
+        if numerique and isinstance(precedente, (int, float)) and not isinstance(precedente, bool):
+            return deadband.depasse(valeur, precedente)
+        return valeur != precedente
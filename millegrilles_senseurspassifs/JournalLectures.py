@@ -0,0 +1,231 @@
+# Journal sur disque des lectures non transmises (MQ non disponible), rejoue en ordre au retour du producer
+import asyncio
+import json
+import logging
+import os
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+TAILLE_SEGMENT = 1024 * 1024  # Octets par fichier de segment
+TAILLE_MAX_DEFAUT = 50 * 1024 * 1024  # Octets pour l'ensemble des segments
+INTERVALLE_FSYNC = 1.0  # Secondes
+LOT_FSYNC = 100  # Lectures ajoutees avant un fsync immediat
+
+FICHIER_ACK = 'ack'
+EXTENSION_SEGMENT = '.jsonl'
+
+
+class JournalLectures:
+    """
+    Journal des lectures en ajout seulement, divise en segments nommes selon la sequence de leur premier record.
+
+    Les records sont flushes a l'ajout et fsync par lots (INTERVALLE_FSYNC, LOT_FSYNC). Le fichier ack contient la
+    sequence de la derniere lecture transmise a MQ et les segments transmis au complet sont retires. Quand le journal
+    depasse taille_max, les plus vieux segments sont retires (compteur journal.dropped).
+
+    Livraison au moins une fois : le rejeu confirme une fois par lot, les lectures d'un lot transmis juste avant un
+    crash (ack pas encore ecrit) sont transmises a nouveau au redemarrage.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, repertoire: str, taille_max: int = TAILLE_MAX_DEFAUT,
+                 taille_segment: int = TAILLE_SEGMENT):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__metrics = metrics
+        self.__repertoire = repertoire
+        self.__taille_max = taille_max
+        self.__taille_segment = taille_segment
+
+        self.__segments: list[int] = list()  # Sequence du premier record de chaque segment
+        self.__tailles: dict[int, int] = dict()
+        self.__prochaine_sequence = 0
+        self.__ack = -1
+        self.__fichier = None
+        self.__non_synchronises = 0
+        self.__sync_requis = asyncio.Event()
+        self.__disponible = asyncio.Event()
+
+        metrics.register_gauge('journal.backlog', lambda: self.backlog)
+        metrics.register_gauge('journal.bytes', lambda: sum(self.__tailles.values()))
+
+    @property
+    def backlog(self) -> int:
+        """ Lectures du journal pas encore transmises """
+        return self.__prochaine_sequence - 1 - self.__ack
+
+    @property
+    def disponible(self) -> asyncio.Event:
+        """ Set tant que le backlog n'est pas vide """
+        return self.__disponible
+
+    def ouvrir(self):
+        os.makedirs(self.__repertoire, exist_ok=True)
+        self.__segments = sorted(int(f[:-len(EXTENSION_SEGMENT)]) for f in os.listdir(self.__repertoire)
+                                 if f.endswith(EXTENSION_SEGMENT))
+        self.__tailles = {s: os.stat(self.__path_segment(s)).st_size for s in self.__segments}
+
+        try:
+            with open(os.path.join(self.__repertoire, FICHIER_ACK)) as fichier:
+                self.__ack = int(fichier.read())
+        except (FileNotFoundError, ValueError):
+            self.__ack = self.__segments[0] - 1 if len(self.__segments) > 0 else -1
+
+        if len(self.__segments) > 0:
+            dernier = self.__segments[-1]
+            self.__prochaine_sequence = dernier + self.__reparer_segment(dernier)
+            self.__ack = max(self.__ack, self.__segments[0] - 1)
+        else:
+            self.__prochaine_sequence = self.__ack + 1
+
+        self.__purger_confirmes()
+        if self.backlog > 0:
+            self.__logger.info("Journal : %d lectures a rejouer", self.backlog)
+            self.__disponible.set()
+
+    def fermer(self):
+        if self.__fichier is not None:
+            self.__synchroniser()
+            self.__fichier.close()
+            self.__fichier = None
+
+    def ajouter(self, message: dict):
+        ligne = (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+        if self.__fichier is None or self.__tailles[self.__segments[-1]] >= self.__taille_segment:
+            self.__ouvrir_segment()
+
+        self.__fichier.write(ligne)
+        self.__fichier.flush()
+        self.__tailles[self.__segments[-1]] += len(ligne)
+        self.__prochaine_sequence += 1
+
+        self.__non_synchronises += 1
+        if self.__non_synchronises >= LOT_FSYNC:
+            self.__sync_requis.set()
+
+        self.__appliquer_taille_max()
+        self.__disponible.set()
+
+    async def lire_lot(self, nombre: int) -> list[tuple[int, dict]]:
+        """
+        :return: Jusqu'a nombre lectures suivant la derniere confirmee, en ordre, avec leur sequence.
+        """
+        if self.backlog <= 0:
+            return list()
+        debut, fin = self.__ack + 1, min(self.__prochaine_sequence, self.__ack + 1 + nombre)
+        segments = [(s, self.__segment_suivant(s)) for s in self.__segments]
+        segments = [s for s, suivant in segments if suivant > debut and s < fin]
+        return await asyncio.to_thread(self.__lire, segments, debut, fin)
+
+    def confirmer(self, sequence: int):
+        """ Confirme la transmission de toutes les lectures jusqu'a sequence. """
+        if sequence <= self.__ack:
+            return
+        self.__metrics.increment('journal.replayed', sequence - self.__ack)
+        self.__ecrire_ack(sequence)
+        self.__purger_confirmes()
+
+    async def run(self, stop_event: asyncio.Event):
+        """ fsync par lots du segment courant. """
+        try:
+            while stop_event.is_set() is False:
+                try:
+                    await asyncio.wait_for(self.__sync_requis.wait(), INTERVALLE_FSYNC)
+                except asyncio.TimeoutError:
+                    pass
+                self.__sync_requis.clear()
+                if self.__fichier is not None and self.__non_synchronises > 0:
+                    self.__non_synchronises = 0
+                    await asyncio.to_thread(os.fsync, self.__fichier.fileno())
+        finally:
+            self.fermer()
+
+    def __path_segment(self, sequence: int) -> str:
+        return os.path.join(self.__repertoire, '%016d%s' % (sequence, EXTENSION_SEGMENT))
+
+    def __ouvrir_segment(self):
+        if self.__fichier is not None:
+            self.__synchroniser()
+            self.__fichier.close()
+        elif len(self.__segments) > 0 and self.__tailles[self.__segments[-1]] < self.__taille_segment:
+            # Reprise du dernier segment apres un redemarrage
+            self.__fichier = open(self.__path_segment(self.__segments[-1]), 'ab')
+            return
+
+        sequence = self.__prochaine_sequence
+        self.__segments.append(sequence)
+        self.__tailles[sequence] = 0
+        self.__fichier = open(self.__path_segment(sequence), 'ab')
+
+    def __synchroniser(self):
+        self.__fichier.flush()
+        os.fsync(self.__fichier.fileno())
+        self.__non_synchronises = 0
+
+    def __ecrire_ack(self, sequence: int):
+        self.__ack = sequence
+        path_ack = os.path.join(self.__repertoire, FICHIER_ACK)
+        with open(path_ack + '.tmp', 'w') as fichier:
+            fichier.write(str(sequence))
+        os.replace(path_ack + '.tmp', path_ack)
+        if self.backlog <= 0:
+            self.__disponible.clear()
+
+    def __reparer_segment(self, sequence: int) -> int:
+        """
+        Tronque un dernier record partiel (crash pendant une ecriture).
+        :return: Nombre de records dans le segment.
+        """
+        path_segment = self.__path_segment(sequence)
+        with open(path_segment, 'rb') as fichier:
+            contenu = fichier.read()
+        fin = contenu.rfind(b'\n') + 1
+        if fin != len(contenu):
+            self.__logger.warning("Journal : record partiel tronque dans %s", path_segment)
+            with open(path_segment, 'r+b') as fichier:
+                fichier.truncate(fin)
+            self.__tailles[sequence] = fin
+        return contenu.count(b'\n', 0, fin)
+
+    def __segment_suivant(self, sequence: int) -> int:
+        index = self.__segments.index(sequence)
+        try:
+            return self.__segments[index + 1]
+        except IndexError:
+            return self.__prochaine_sequence
+
+    def __purger_confirmes(self):
+        # Retirer les segments dont toutes les lectures sont confirmees, le segment courant est conserve
+        while len(self.__segments) > 1 and self.__segments[1] - 1 <= self.__ack:
+            self.__retirer_segment(self.__segments[0])
+
+    def __appliquer_taille_max(self):
+        while len(self.__segments) > 1 and sum(self.__tailles.values()) > self.__taille_max:
+            premier = self.__segments[0]
+            perdues = self.__segments[1] - max(premier, self.__ack + 1)
+            self.__retirer_segment(premier)
+            if perdues > 0:
+                self.__metrics.increment('journal.dropped', perdues)
+                self.__logger.warning("Journal depasse %d octets, %d plus vieilles lectures retirees", self.__taille_max, perdues)
+                self.__ecrire_ack(self.__segments[0] - 1)
+
+    def __retirer_segment(self, sequence: int):
+        self.__segments.remove(sequence)
+        del self.__tailles[sequence]
+        try:
+            os.unlink(self.__path_segment(sequence))
+        except FileNotFoundError:
+            pass
+
+    def __lire(self, segments: list[int], debut: int, fin: int) -> list[tuple[int, dict]]:
+        lectures = list()
+        for segment in segments:
+            try:
+                with open(self.__path_segment(segment), 'rb') as fichier:
+                    for sequence, ligne in enumerate(fichier, start=segment):
+                        if sequence >= fin or ligne.endswith(b'\n') is False:
+                            return lectures
+                        if sequence >= debut:
+                            lectures.append((sequence, json.loads(ligne)))
+            except FileNotFoundError:
+                pass  # Segment retire (taille max) pendant la lecture
+        return lectures
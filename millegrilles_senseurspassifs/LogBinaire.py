@@ -0,0 +1,407 @@
+# Log binaire des lectures (senseurs.bin) : records de taille fixe, table de chaines et index dans l'entete
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+
+from typing import Iterator, NamedTuple, Optional
+
+MAGIC = b'MGSL'
+VERSION = 1
+
+# magic, version, taille record, flags, slots, offset table, taille table, offset index, entrees index, t min, t max
+ENTETE = struct.Struct('<4sHHIQQQQIII')
+TAILLE_ENTETE = 64
+FLAG_FERME = 1  # Table de chaines et index ecrits a la fin du fichier
+
+# timestamp, appareil (uuid_senseur), senseur, type, genre, valeur (8 octets)
+RECORD = struct.Struct('<IHHHBx8s')
+TAILLE_RECORD = RECORD.size
+CHAINE = struct.Struct('<H')
+INDEX = struct.Struct('<HHIII')  # appareil, senseur, nombre, t min, t max
+
+VALEUR_FLOAT = struct.Struct('<d')
+VALEUR_INT = struct.Struct('<q')
+
+GENRE_NULL = 0
+GENRE_FLOAT = 1
+GENRE_INT = 2
+GENRE_BOOL = 3
+GENRE_TEXTE = 4  # Texte UTF-8 dans les slots suivants, valeur = longueur
+GENRE_JSON = 5  # Lecture json complete dans les slots suivants (format non standard), valeur = longueur
+GENRE_CHAINE = 6  # Definition de chaine (id dans appareil) dans les slots suivants, valeur = longueur
+
+RECORDS_PAR_BLOC = 65536  # Records decodes par bloc (iter_unpack) lors de la lecture
+
+ID_MAX = 0xFFFF
+TIMESTAMP_MAX = 0xFFFFFFFF
+
+
+class EntreeIndex(NamedTuple):
+    uuid_senseur: str
+    senseur: str
+    nombre: int
+    debut: int
+    fin: int
+
+
+def _slots_payload(taille: int) -> int:
+    return (taille + TAILLE_RECORD - 1) // TAILLE_RECORD
+
+
+def _fin_records(donnees, debut: int, fin: int) -> int:
+    """ :return: Position suivant le dernier record complet """
+    position = debut
+    while position + TAILLE_RECORD <= fin:
+        genre = donnees[position + 10]
+        suivant = position + TAILLE_RECORD
+        if genre >= GENRE_TEXTE:
+            longueur = VALEUR_INT.unpack_from(donnees, position + 12)[0]
+            suivant += _slots_payload(longueur) * TAILLE_RECORD
+            if suivant > fin:
+                break
+        position = suivant
+    return position
+
+
+class LecteurLogBinaire:
+    """
+    Lecture d'un log binaire avec mmap. Un fichier non ferme (crash, log courant) est lu jusqu'au dernier record
+    complet et son index est calcule en parcourant les records.
+    """
+
+    def __init__(self, path_fichier: str):
+        self.__path_fichier = path_fichier
+        self.__fichier = open(path_fichier, 'rb')
+        taille = os.fstat(self.__fichier.fileno()).st_size
+        if taille < TAILLE_ENTETE:
+            raise ValueError('Fichier %s trop court' % path_fichier)
+        self.__mmap = mmap.mmap(self.__fichier.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, taille_record, flags, slots, offset_table, taille_table, offset_index, entrees_index, \
+            self.__t_min, self.__t_max = ENTETE.unpack_from(self.__mmap, 0)
+        if magic != MAGIC or version != VERSION or taille_record != TAILLE_RECORD:
+            raise ValueError('Fichier %s n\'est pas un log binaire supporte' % path_fichier)
+
+        self.__ferme = flags & FLAG_FERME == FLAG_FERME
+        self.__chaines: list[str] = list()
+        self.__index: Optional[list[EntreeIndex]] = None
+        if self.__ferme:
+            self.__fin_records = TAILLE_ENTETE + slots * TAILLE_RECORD
+            self.__chaines = self.__lire_table(offset_table, taille_table)
+            self.__index = self.__lire_index(offset_index, entrees_index)
+        else:
+            self.__fin_records = _fin_records(self.__mmap, TAILLE_ENTETE, taille)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fermer()
+        return False
+
+    def fermer(self):
+        self.__mmap.close()
+        self.__fichier.close()
+
+    @property
+    def ferme(self) -> bool:
+        """ True si le fichier a ete ferme par l'ecrivain (table de chaines et index presents) """
+        return self.__ferme
+
+    @property
+    def chaines(self) -> list[str]:
+        return self.__chaines
+
+    @property
+    def periode(self) -> tuple[int, int]:
+        """ Plus vieux et plus recent timestamp (fichier ferme seulement) """
+        return self.__t_min, self.__t_max
+
+    @property
+    def fin_records(self) -> int:
+        return self.__fin_records
+
+    @property
+    def index(self) -> list[EntreeIndex]:
+        """ Nombre de lectures et intervalle de temps par senseur """
+        if self.__index is None:
+            cumul = dict()
+            for uuid_senseur, senseur, lecture in self:
+                timestamp = lecture.get('timestamp') or 0
+                try:
+                    nombre, debut, fin = cumul[(uuid_senseur, senseur)]
+                    cumul[(uuid_senseur, senseur)] = (nombre + 1, min(debut, timestamp), max(fin, timestamp))
+                except KeyError:
+                    cumul[(uuid_senseur, senseur)] = (1, timestamp, timestamp)
+            self.__index = [EntreeIndex(k[0], k[1], *v) for k, v in cumul.items()]
+        return self.__index
+
+    def __iter__(self) -> Iterator[tuple[str, str, dict]]:
+        """
+        :return: Iterateur (uuid_senseur, senseur, lecture) dans l'ordre d'ecriture
+        """
+        chaines = list() if self.__ferme is False else list(self.__chaines)
+        donnees = self.__mmap
+        unpack_float, unpack_int = VALEUR_FLOAT.unpack, VALEUR_INT.unpack
+        sauter = 0  # Slots de payload a sauter (peuvent deborder sur le bloc suivant)
+
+        taille_bloc = RECORDS_PAR_BLOC * TAILLE_RECORD
+        for debut_bloc in range(TAILLE_ENTETE, self.__fin_records, taille_bloc):
+            bloc = donnees[debut_bloc:min(debut_bloc + taille_bloc, self.__fin_records)]
+            for no, (timestamp, appareil, senseur, type_lecture, genre, valeur) in enumerate(RECORD.iter_unpack(bloc)):
+                if sauter > 0:
+                    sauter -= 1
+                    continue
+
+                if genre == GENRE_FLOAT:
+                    valeur = unpack_float(valeur)[0]
+                elif genre == GENRE_INT:
+                    valeur = unpack_int(valeur)[0]
+                elif genre == GENRE_NULL:
+                    valeur = None
+                elif genre == GENRE_BOOL:
+                    valeur = unpack_int(valeur)[0] != 0
+                else:
+                    longueur = unpack_int(valeur)[0]
+                    sauter = _slots_payload(longueur)
+                    position = debut_bloc + (no + 1) * TAILLE_RECORD
+                    payload = donnees[position:position + longueur]
+                    if genre == GENRE_CHAINE:
+                        if appareil == len(chaines):
+                            chaines.append(payload.decode('utf-8'))
+                        continue
+                    elif genre == GENRE_JSON:
+                        yield chaines[appareil], chaines[senseur], json.loads(payload)
+                        continue
+                    valeur = payload.decode('utf-8')
+
+                yield chaines[appareil], chaines[senseur], {
+                    'valeur': valeur, 'timestamp': timestamp, 'type': chaines[type_lecture]}
+
+        if self.__ferme is False:
+            self.__chaines = chaines
+
+    def __lire_table(self, offset: int, taille: int) -> list[str]:
+        chaines = list()
+        position, fin = offset, offset + taille
+        while position < fin:
+            longueur, = CHAINE.unpack_from(self.__mmap, position)
+            position += CHAINE.size
+            chaines.append(self.__mmap[position:position + longueur].decode('utf-8'))
+            position += longueur
+        return chaines
+
+    def __lire_index(self, offset: int, entrees: int) -> list[EntreeIndex]:
+        return [EntreeIndex(self.__chaines[a], self.__chaines[s], n, d, f)
+                for a, s, n, d, f in INDEX.iter_unpack(self.__mmap[offset:offset + entrees * INDEX.size])]
+
+
+class EcrivainLogBinaire:
+    """
+    Ajout de lectures a un log binaire. Les chaines (uuid, senseurs, types) sont definies dans le flux des records
+    a leur premiere utilisation (le fichier reste lisible apres un crash). La fermeture ajoute la table de chaines
+    et l'index par senseur a la fin du fichier et les reference dans l'entete.
+    Quand la table de chaines est pleine (ID_MAX), le fichier est ferme et renomme comme lors de la rotation des
+    logs (senseurs.DATE.bin) et un nouveau fichier est commence.
+    """
+
+    def __init__(self, path_fichier: str):
+        self.__path_fichier = path_fichier
+        self.__ids: dict[str, int] = dict()
+        self.__index: dict[tuple[int, int], list[int]] = dict()  # (appareil, senseur): [nombre, t min, t max]
+
+        if os.path.exists(path_fichier) and os.stat(path_fichier).st_size >= TAILLE_ENTETE:
+            fin_records = self.__reprendre()
+            self.__fichier = open(path_fichier, 'r+b')
+            self.__fichier.truncate(fin_records)
+            self.__fichier.seek(0)
+            self.__fichier.write(self.__entete(0, fin_records, 0, 0))
+            self.__fichier.seek(fin_records)
+            self.__fichier.flush()
+        else:
+            self.__creer()
+
+    def ajouter(self, uuid_senseur: str, senseurs: dict):
+        """
+        Ajoute les lectures d'un message (uuid_senseur, senseurs) en une seule ecriture.
+        """
+        if len(self.__ids) + self.__nouvelles_chaines(uuid_senseur, senseurs) > ID_MAX + 1:
+            self.rotation()
+
+        tampon = bytearray()
+        appareil = self.__id(uuid_senseur, tampon)
+        for senseur_id, lecture in senseurs.items():
+            senseur = self.__id(senseur_id, tampon)
+            tampon.extend(self.__record(appareil, senseur, lecture, tampon))
+        self.__fichier.write(tampon)
+        self.__fichier.flush()
+
+    def fermer(self):
+        fin_records = self.__fichier.seek(0, os.SEEK_END)
+
+        table = bytearray()
+        for chaine in self.__ids.keys():
+            valeur = chaine.encode('utf-8')
+            table.extend(CHAINE.pack(len(valeur)))
+            table.extend(valeur)
+        index = b''.join(INDEX.pack(a, s, *v) for (a, s), v in self.__index.items())
+
+        self.__fichier.write(table)
+        self.__fichier.write(index)
+        self.__fichier.seek(0)
+        self.__fichier.write(self.__entete(FLAG_FERME, fin_records, len(table), len(self.__index)))
+        self.__fichier.close()
+
+    def rotation(self) -> str:
+        """
+        Ferme le fichier courant, le renomme avec la date (senseurs.DATE.bin) et commence un nouveau fichier.
+        :return: Path du fichier renomme
+        """
+        self.fermer()
+
+        racine, extension = os.path.splitext(self.__path_fichier)
+        date_str = datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        path_rotation = '%s.%s%s' % (racine, date_str, extension)
+        compteur = 0
+        while os.path.exists(path_rotation):
+            compteur += 1
+            path_rotation = '%s.%s-%d%s' % (racine, date_str, compteur, extension)
+        os.rename(self.__path_fichier, path_rotation)
+
+        self.__ids = dict()
+        self.__index = dict()
+        self.__creer()
+        return path_rotation
+
+    def __creer(self):
+        self.__fichier = open(self.__path_fichier, 'wb')
+        self.__fichier.write(self.__entete(0, TAILLE_ENTETE, 0, 0))
+        self.__fichier.flush()
+
+    def __nouvelles_chaines(self, uuid_senseur: str, senseurs: dict) -> int:
+        """ :return: Nombre maximal de chaines ajoutees a la table par ce message """
+        chaines = {uuid_senseur}
+        for senseur_id, lecture in senseurs.items():
+            chaines.add(senseur_id)
+            type_lecture = lecture.get('type')
+            if isinstance(type_lecture, str):
+                chaines.add(type_lecture)
+        return len(chaines - self.__ids.keys())
+
+    def __entete(self, flags: int, fin_records: int, taille_table: int, entrees_index: int) -> bytes:
+        t_min = min((v[1] for v in self.__index.values()), default=0)
+        t_max = max((v[2] for v in self.__index.values()), default=0)
+        slots = (fin_records - TAILLE_ENTETE) // TAILLE_RECORD
+        entete = ENTETE.pack(MAGIC, VERSION, TAILLE_RECORD, flags, slots, fin_records, taille_table,
+                             fin_records + taille_table, entrees_index, t_min, t_max)
+        return entete.ljust(TAILLE_ENTETE, b'\x00')
+
+    def __reprendre(self) -> int:
+        """ Recharge les chaines et l'index d'un fichier existant (redemarrage). :return: Fin des records """
+        with LecteurLogBinaire(self.__path_fichier) as lecteur:
+            index = lecteur.index  # Parcours les records d'un fichier non ferme, charge les chaines
+            ids_chaines = {c: i for i, c in enumerate(lecteur.chaines)}
+            self.__ids = ids_chaines
+            for entree in index:
+                self.__index[(ids_chaines[entree.uuid_senseur], ids_chaines[entree.senseur])] = [
+                    entree.nombre, entree.debut, entree.fin]
+            return lecteur.fin_records
+
+    def __id(self, chaine: str, tampon: bytearray) -> int:
+        try:
+            return self.__ids[chaine]
+        except KeyError:
+            pass
+        id_chaine = len(self.__ids)
+        if id_chaine > ID_MAX:
+            raise ValueError('Table de chaines pleine (%d)' % ID_MAX)
+        self.__ids[chaine] = id_chaine
+        tampon.extend(self.__payload(GENRE_CHAINE, id_chaine, 0, 0, 0, chaine.encode('utf-8')))
+        return id_chaine
+
+    def __record(self, appareil: int, senseur: int, lecture: dict, tampon: bytearray) -> bytes:
+        timestamp = lecture.get('timestamp')
+        valeur = lecture.get('valeur')
+        type_lecture = lecture.get('type')
+
+        standard = len(lecture) == 3 and isinstance(timestamp, int) and 0 <= timestamp <= TIMESTAMP_MAX \
+            and isinstance(type_lecture, str)
+        if standard is False:
+            record = self.__payload(GENRE_JSON, appareil, senseur, 0, 0, json.dumps(lecture).encode('utf-8'))
+            self.__indexer(appareil, senseur, timestamp if isinstance(timestamp, int) else 0)
+            return record
+
+        type_id = self.__id(type_lecture, tampon)
+        self.__indexer(appareil, senseur, timestamp)
+        if valeur is None:
+            return RECORD.pack(timestamp, appareil, senseur, type_id, GENRE_NULL, bytes(8))
+        elif isinstance(valeur, bool):
+            return RECORD.pack(timestamp, appareil, senseur, type_id, GENRE_BOOL, VALEUR_INT.pack(int(valeur)))
+        elif isinstance(valeur, int) and -2**63 <= valeur < 2**63:
+            return RECORD.pack(timestamp, appareil, senseur, type_id, GENRE_INT, VALEUR_INT.pack(valeur))
+        elif isinstance(valeur, float):
+            return RECORD.pack(timestamp, appareil, senseur, type_id, GENRE_FLOAT, VALEUR_FLOAT.pack(valeur))
+        elif isinstance(valeur, str):
+            return self.__payload(GENRE_TEXTE, appareil, senseur, type_id, timestamp, valeur.encode('utf-8'))
+        return self.__payload(GENRE_JSON, appareil, senseur, 0, 0, json.dumps(lecture).encode('utf-8'))
+
+    @staticmethod
+    def __payload(genre: int, appareil: int, senseur: int, type_id: int, timestamp: int, payload: bytes) -> bytes:
+        record = RECORD.pack(timestamp, appareil, senseur, type_id, genre, VALEUR_INT.pack(len(payload)))
+        return record + payload.ljust(_slots_payload(len(payload)) * TAILLE_RECORD, b'\x00')
+
+    def __indexer(self, appareil: int, senseur: int, timestamp: int):
+        try:
+            entree = self.__index[(appareil, senseur)]
+            entree[0] += 1
+            entree[1] = min(entree[1], timestamp)
+            entree[2] = max(entree[2], timestamp)
+        except KeyError:
+            self.__index[(appareil, senseur)] = [1, timestamp, timestamp]
+
+
+def convertir_jsonl(path_jsonl: str, path_bin: str) -> int:
+    """
+    Converti un log senseurs.*.jsonl existant en log binaire.
+    :return: Nombre de messages convertis
+    """
+    messages = 0
+    ecrivain = EcrivainLogBinaire(path_bin)
+    try:
+        with open(path_jsonl, 'r') as fichier:
+            for ligne in fichier:
+                try:
+                    lecture = json.loads(ligne)
+                    ecrivain.ajouter(lecture['uuid_senseur'], lecture['senseurs'])
+                    messages += 1
+                except (json.JSONDecodeError, KeyError):
+                    continue  # Ligne corrompue, ignoree comme lors de la conversion en transactions
+    finally:
+        ecrivain.fermer()
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion des logs senseurs.*.jsonl en log binaire (.bin)")
+    parser.add_argument('--supprimer', action='store_true', help="Supprimer le fichier jsonl apres conversion")
+    parser.add_argument('fichiers', nargs='+', help="Fichiers senseurs.*.jsonl")
+    args = parser.parse_args()
+
+    for path_jsonl in args.fichiers:
+        racine, extension = os.path.splitext(path_jsonl)
+        if extension != '.jsonl':
+            print("%s ignore (pas un fichier .jsonl)" % path_jsonl)
+            continue
+        path_bin = racine + '.bin'
+        messages = convertir_jsonl(path_jsonl, path_bin)
+        print("%s : %d messages, %d -> %d octets" % (
+            path_bin, messages, os.stat(path_jsonl).st_size, os.stat(path_bin).st_size))
+        if args.supprimer:
+            os.unlink(path_jsonl)
+
+
+if __name__ == '__main__':
+    main()
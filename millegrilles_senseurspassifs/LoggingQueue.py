@@ -0,0 +1,66 @@
+# Logging non-bloquant : les handlers (stderr, fichiers) sont appeles par une thread QueueListener
+import atexit
+import logging
+import queue
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+TAILLE_QUEUE_LOGS = 10_000
+
+
+class QueueHandlerNonBloquant(QueueHandler):
+    """
+    QueueHandler qui ne bloque jamais l'event loop. Les records sont jetes (et comptes) quand la queue est pleine.
+    Le message est combine avec ses args dans la thread appelante (prepare) car les args peuvent etre modifies
+    plus tard, le formattage (format, date) est laisse a la thread du listener.
+    """
+
+    def __init__(self, queue_logs: queue.Queue):
+        super().__init__(queue_logs)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Handler du root logger, appele en dernier : le record peut etre modifie sans copie
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def demarrer_logging_queue(taille: int = TAILLE_QUEUE_LOGS) -> Optional[QueueHandlerNonBloquant]:
+    """
+    Deplace les handlers du root logger (e.g. de logging.basicConfig()) derriere un QueueHandler.
+    Appeler apres basicConfig. Le listener est arrete (queue videe) a la sortie.
+
+    :return: Le handler de la queue, None si le root logger n'a pas de handler.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, QueueHandlerNonBloquant):
+            return handler  # Deja demarre
+
+    handlers = root.handlers[:]
+    if len(handlers) == 0:
+        return None
+
+    queue_logs = queue.Queue(taille)
+    handler_queue = QueueHandlerNonBloquant(queue_logs)
+    listener = QueueListener(queue_logs, *handlers, respect_handler_level=True)
+
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(handler_queue)
+
+    listener.start()
+    atexit.register(listener.stop)
+
+    return handler_queue
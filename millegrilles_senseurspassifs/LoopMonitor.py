@@ -0,0 +1,92 @@
+# Mesure du retard de l'event loop et detection des callbacks bloquants (hub et relai)
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from typing import Optional
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+INTERVALLE_DEFAUT = 0.1  # Secondes entre les mesures
+SEUIL_DEFAUT = 0.25  # Secondes de blocage avant de capturer la task courante
+PROFONDEUR_STACK = 12
+
+
+class LoopLagMonitor:
+    """
+    Mesure le retard de l'event loop (depassement du sleep) dans le summary loop.lag_ms.
+
+    Une thread watchdog surveille le battement de la loop. Si la loop ne revient pas avant le seuil, la stack de
+    la thread de la loop est capturee (sys._current_frames) pendant que la loop est encore bloquee. La capture
+    est remise a la loop (call_soon_threadsafe) qui la log et met a jour les metriques une fois debloquee
+    (compteur loop.blocked, gauges loop.blocked_last_ms et loop.blocked_last_date) : MetricsRegistry et
+    asyncio sont utilises uniquement dans la thread de la loop.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, intervalle: float = INTERVALLE_DEFAUT, seuil: float = SEUIL_DEFAUT):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__metrics = metrics
+        self.__intervalle = intervalle
+        self.__seuil = seuil
+
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__thread_id: Optional[int] = None
+        self.__battement = time.monotonic()
+        self.__arret = threading.Event()
+
+    async def run(self, stop_event: asyncio.Event):
+        if self.__intervalle <= 0:
+            await stop_event.wait()  # Desactive
+            return
+
+        self.__loop = asyncio.get_running_loop()
+        self.__thread_id = threading.get_ident()
+        self.__battement = time.monotonic()
+        self.__arret.clear()
+
+        watchdog = threading.Thread(target=self.__watchdog, name='loop_monitor', daemon=True)
+        watchdog.start()
+        try:
+            while stop_event.is_set() is False:
+                debut = self.__loop.time()
+                try:
+                    await asyncio.wait_for(stop_event.wait(), self.__intervalle)
+                except asyncio.TimeoutError:
+                    pass
+                retard = max(0.0, self.__loop.time() - debut - self.__intervalle)
+                self.__battement = time.monotonic()
+                self.__metrics.observe('loop.lag_ms', retard * 1000)
+        finally:
+            self.__arret.set()
+
+    def __watchdog(self):
+        battement_signale = None
+        while self.__arret.wait(self.__intervalle) is False:
+            battement = self.__battement
+            bloque = time.monotonic() - battement
+            if bloque < self.__seuil or battement == battement_signale:
+                continue
+            battement_signale = battement  # Une capture par blocage
+            try:
+                self.__capturer(bloque)
+            except Exception:
+                self.__logger.exception("Erreur capture de la stack de la loop bloquee")
+
+    def __capturer(self, bloque: float):
+        # Thread du watchdog : capturer la stack pendant le blocage, le reste est fait dans l'event loop
+        frame = sys._current_frames().get(self.__thread_id)
+        stack = ''.join(traceback.format_stack(frame, PROFONDEUR_STACK)) if frame is not None else ''
+        date_blocage = int(time.time())
+        try:
+            self.__loop.call_soon_threadsafe(self.__signaler, bloque, date_blocage, stack)
+        except RuntimeError:
+            pass  # Event loop fermee
+
+    def __signaler(self, bloque: float, date_blocage: int, stack: str):
+        self.__metrics.increment('loop.blocked')
+        self.__metrics.set_gauge('loop.blocked_last_ms', int(bloque * 1000))
+        self.__metrics.set_gauge('loop.blocked_last_date', date_blocage)
+        self.__logger.warning("Event loop bloquee pendant plus de %d ms\n%s", bloque * 1000, stack)
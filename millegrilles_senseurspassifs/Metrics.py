@@ -0,0 +1,95 @@
+"""
+Registre de metriques en memoire (compteurs, jauges, distributions) pour le hub et le relai.
+
+Module partage : senseurspassifs_relai_web l'importe (comme Constantes, EventLoop, LoggingQueue, LoopMonitor et
+Profiler), les deux packages sont distribues ensemble par setup.py. Ne doit dependre que de la librairie standard
+(pas de millegrilles_messages ni de modules du hub).
+"""
+from collections import deque
+from typing import Callable, Union
+
+Nombre = Union[int, float]
+
+
+class MetricsRegistry:
+
+    def __init__(self, window=1024):
+        self.__window = window
+        self.__counters: dict[str, Nombre] = dict()
+        self.__gauges: dict[str, Union[Nombre, Callable[[], Nombre]]] = dict()
+        self.__summaries: dict[str, _Summary] = dict()
+
+    def increment(self, name: str, value: Nombre = 1):
+        self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: Nombre):
+        self.__gauges[name] = value
+
+    def register_gauge(self, name: str, callback: Callable[[], Nombre]):
+        """
+        Gauge evaluated on export, e.g. the length of a queue.
+        """
+        self.__gauges[name] = callback
+
+    def observe(self, name: str, value: Nombre):
+        try:
+            summary = self.__summaries[name]
+        except KeyError:
+            summary = _Summary(self.__window)
+            self.__summaries[name] = summary
+        summary.observe(value)
+
+    def export(self) -> dict:
+        gauges = dict()
+        for name, value in self.__gauges.items():
+            if callable(value):
+                try:
+                    value = value()
+                except Exception:
+                    continue
+            gauges[name] = value
+
+        return {
+            'counters': dict(self.__counters),
+            'gauges': gauges,
+            'summaries': {name: summary.export() for name, summary in self.__summaries.items()},
+        }
+
+
+class _Summary:
+    """
+    Cumulative count/sum with percentiles over the last observations.
+    """
+
+    __slots__ = ('count', 'total', 'max', 'values')
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.values = deque(maxlen=window)
+
+    def observe(self, value: Nombre):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.values.append(value)
+
+    def export(self) -> dict:
+        values = sorted(self.values)
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            'p50': percentile(values, 0.5),
+            'p90': percentile(values, 0.9),
+            'p99': percentile(values, 0.99),
+        }
+
+
+def percentile(sorted_values: list, ratio: float):
+    if len(sorted_values) == 0:
+        return None
+    index = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,137 @@
+# Profilage sur demande (signal ou variable d'environnement) sans redemarrer le process
+import asyncio
+import cProfile
+import datetime
+import io
+import logging
+import marshal
+import os
+import pstats
+import signal
+import tracemalloc
+
+from typing import Optional
+
+PROFIL_CPU = 'cpu'
+PROFIL_MEMOIRE = 'memory'
+
+DUREE_DEFAUT = 30  # Secondes
+DUREE_MAX = 300
+FONCTIONS_MAX = 80  # Lignes du rapport texte
+TAILLE_PROF_MAX = 4 * 1024 * 1024  # Le fichier .prof (pstats) n'est pas ecrit au-dela
+FICHIERS_MAX = 10  # Rapports conserves dans le repertoire
+FRAMES_TRACEMALLOC = 10
+
+
+class ProfilerSurDemande:
+    """
+    Profils du process en execution pour une duree limitee, ecrits dans un repertoire.
+
+    SIGUSR1 capture un cProfile de la thread de l'event loop, SIGUSR2 la memoire allouee pendant la capture
+    (difference de snapshots tracemalloc). Une capture peut aussi etre demarree avec PROFILER_ON_START. Une seule
+    capture de chaque type a la fois, la duree est limitee a DUREE_MAX et les plus vieux rapports sont retires
+    (FICHIERS_MAX).
+    """
+
+    def __init__(self, repertoire: str, duree: float = DUREE_DEFAUT, au_demarrage: Optional[str] = None):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__repertoire = os.path.join(repertoire, 'profils')
+        self.__duree = max(1.0, min(duree, DUREE_MAX))
+        self.__au_demarrage = au_demarrage
+        self.__en_cours: dict[str, asyncio.Task] = dict()
+
+    async def run(self, stop_event: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        signaux = {signal.SIGUSR1: PROFIL_CPU, signal.SIGUSR2: PROFIL_MEMOIRE}
+        for signum, profil in signaux.items():
+            loop.add_signal_handler(signum, self.demarrer, profil)
+
+        try:
+            if self.__au_demarrage:
+                self.demarrer(self.__au_demarrage)
+            await stop_event.wait()
+        finally:
+            for signum in signaux.keys():
+                loop.remove_signal_handler(signum)
+            for task in self.__en_cours.values():
+                task.cancel()
+
+    def demarrer(self, profil: str):
+        if profil not in (PROFIL_CPU, PROFIL_MEMOIRE):
+            self.__logger.warning("Profil inconnu %s", profil)
+            return
+        if profil in self.__en_cours:
+            self.__logger.warning("Profil %s deja en cours, ignore", profil)
+            return
+        self.__logger.info("Demarrage profil %s pour %d secondes", profil, self.__duree)
+        if profil == PROFIL_CPU:
+            task = asyncio.create_task(self.__profiler_cpu(), name='profiler_cpu')
+        else:
+            task = asyncio.create_task(self.__profiler_memoire(), name='profiler_memoire')
+        self.__en_cours[profil] = task
+        task.add_done_callback(lambda _t: self.__en_cours.pop(profil, None))
+
+    async def __profiler_cpu(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(self.__duree)
+        finally:
+            profile.disable()
+        await asyncio.to_thread(self.__ecrire_cpu, profile)
+
+    async def __profiler_memoire(self):
+        demarre = tracemalloc.is_tracing() is False
+        if demarre:
+            tracemalloc.start(FRAMES_TRACEMALLOC)
+        try:
+            debut = tracemalloc.take_snapshot()
+            await asyncio.sleep(self.__duree)
+            fin = tracemalloc.take_snapshot()
+            courant, pic = tracemalloc.get_traced_memory()
+        finally:
+            if demarre:
+                tracemalloc.stop()
+        await asyncio.to_thread(self.__ecrire_memoire, debut, fin, courant, pic)
+
+    def __ecrire_cpu(self, profile: cProfile.Profile):
+        sortie = io.StringIO()
+        stats = pstats.Stats(profile, stream=sortie)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(FONCTIONS_MAX)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(FONCTIONS_MAX)
+        path_rapport = self.__ecrire(PROFIL_CPU, 'txt', sortie.getvalue().encode('utf-8'))
+
+        donnees = marshal.dumps(stats.stats)
+        if len(donnees) <= TAILLE_PROF_MAX:
+            self.__ecrire(PROFIL_CPU, 'prof', donnees)  # Lisible avec pstats / snakeviz
+        self.__logger.info("Profil CPU ecrit dans %s", path_rapport)
+
+    def __ecrire_memoire(self, debut: tracemalloc.Snapshot, fin: tracemalloc.Snapshot, courant: int, pic: int):
+        filtres = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        debut, fin = debut.filter_traces(filtres), fin.filter_traces(filtres)
+
+        lignes = ['Memoire tracee : %d octets, pic %d octets, duree %d secondes' % (courant, pic, self.__duree), '',
+                  'Allocations pendant la capture (par ligne)']
+        lignes.extend(str(s) for s in fin.compare_to(debut, 'lineno')[:FONCTIONS_MAX])
+        lignes.extend(['', 'Allocations totales (par traceback)'])
+        for stat in fin.statistics('traceback')[:FONCTIONS_MAX // 4]:
+            lignes.append(str(stat))
+            lignes.extend('    ' + l for l in stat.traceback.format())
+
+        path_rapport = self.__ecrire(PROFIL_MEMOIRE, 'txt', '\n'.join(lignes).encode('utf-8'))
+        self.__logger.info("Profil memoire ecrit dans %s", path_rapport)
+
+    def __ecrire(self, profil: str, extension: str, contenu: bytes) -> str:
+        os.makedirs(self.__repertoire, exist_ok=True)
+        date_str = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        path_fichier = os.path.join(self.__repertoire, '%s.%s.%s' % (profil, date_str, extension))
+        with open(path_fichier, 'wb') as fichier:
+            fichier.write(contenu)
+
+        # Conserver les FICHIERS_MAX plus recents de ce type
+        prefixe, suffixe = profil + '.', '.' + extension
+        fichiers = sorted(f for f in os.listdir(self.__repertoire) if f.startswith(prefixe) and f.endswith(suffixe))
+        for fichier in fichiers[:-FICHIERS_MAX]:
+            os.unlink(os.path.join(self.__repertoire, fichier))
+
+        return path_fichier
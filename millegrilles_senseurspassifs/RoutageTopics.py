@@ -0,0 +1,67 @@
+# Table de routage des messages MQ vers les consumers selon les routing keys (patterns topic AMQP * et #)
+from typing import Union
+
+
+class NoeudRoutage:
+
+    __slots__ = ('enfants', 'destinations')
+
+    def __init__(self):
+        self.enfants: dict[str, NoeudRoutage] = dict()
+        self.destinations: list = list()
+
+
+class TableRoutage:
+    """
+    Trie des patterns de routing keys, compile une fois a partir des routing_keys() des consumers.
+    Semantique AMQP topic : les mots sont separes par '.', * remplace exactement un mot, # remplace zero ou
+    plusieurs mots.
+    """
+
+    def __init__(self):
+        self.__racine = NoeudRoutage()
+
+    def ajouter(self, pattern: Union[str, tuple[str, str]], destination):
+        """
+        :param pattern: Routing key (str) ou tuple (securite, routing key) comme retourne par routing_keys()
+        :param destination: Objet retourne par trouver() pour les routing keys qui correspondent au pattern
+        """
+        if isinstance(pattern, tuple):
+            _securite, pattern = pattern
+
+        noeud = self.__racine
+        for mot in pattern.split('.'):
+            try:
+                noeud = noeud.enfants[mot]
+            except KeyError:
+                enfant = NoeudRoutage()
+                noeud.enfants[mot] = enfant
+                noeud = enfant
+
+        if destination not in noeud.destinations:
+            noeud.destinations.append(destination)
+
+    def trouver(self, routing_key: str) -> list:
+        """
+        :return: Destinations des patterns qui correspondent a la routing key (sans doublons)
+        """
+        resultat = dict()  # Ensemble ordonne
+        self.__trouver(self.__racine, routing_key.split('.'), 0, resultat)
+        return list(resultat)
+
+    def __trouver(self, noeud: NoeudRoutage, mots: list[str], position: int, resultat: dict):
+        noeud_diese = noeud.enfants.get('#')
+        if noeud_diese is not None:
+            # # consomme de zero a tous les mots restants
+            for suivant in range(position, len(mots) + 1):
+                self.__trouver(noeud_diese, mots, suivant, resultat)
+
+        if position == len(mots):
+            for destination in noeud.destinations:
+                resultat[destination] = True
+            return
+
+        for cle in (mots[position], '*'):
+            enfant = noeud.enfants.get(cle)
+            if enfant is not None:
+                self.__trouver(enfant, mots, position + 1, resultat)
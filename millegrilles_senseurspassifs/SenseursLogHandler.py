@@ -3,13 +3,22 @@ import datetime
 import json
 import logging
 import lzma
+import os
 import string
+import tempfile
+import threading
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from os import path, rename, listdir, makedirs, unlink
+from typing import Optional
 
 from millegrilles_messages.messages import Constantes
 from millegrilles_senseurspassifs.EtatSenseursPassifs import EtatSenseursPassifs
 from millegrilles_senseurspassifs import Constantes as ConstantesSenseursPassifs
+from millegrilles_senseurspassifs.LogBinaire import LecteurLogBinaire
+
+TAILLE_TRANSACTION = 1000  # Lectures par fichier de transaction (par senseur)
+TAILLE_TAMPONS_MAX = 4 * 1024 * 1024  # Octets de lectures en memoire avant ecriture dans les fichiers temporaires
 
 
 class SenseursLogHandler:
@@ -24,20 +33,29 @@ class SenseursLogHandler:
         date_str = date_now.strftime('%Y%m%d%H%M%S')
 
         path_logs = self.__etat_senseurspassifs.configuration.lecture_log_directory
-        path_fichier_log = path.join(path_logs, 'senseurs.jsonl')
-        path_fichier_rotation = path.join(path_logs, 'senseurs.%s.jsonl' % date_str)
-        try:
-            rename(path_fichier_log, path_fichier_rotation)
-        except FileNotFoundError:
-            # Rien a faire, le fichier de lectures n'existe pas
-            return
+        rotation = False
+        for extension in ('jsonl', 'bin'):
+            path_fichier_log = path.join(path_logs, 'senseurs.%s' % extension)
+            path_fichier_rotation = path.join(path_logs, 'senseurs.%s.%s' % (date_str, extension))
+            try:
+                rename(path_fichier_log, path_fichier_rotation)
+                rotation = True
+            except FileNotFoundError:
+                pass  # Le fichier de lectures n'existe pas dans ce format
+
+        if rotation is False:
+            return  # Rien a faire
 
-        # Changer pointeur de sauvegarde de fichiers
+        # Changer pointeur de sauvegarde de fichiers (ferme le log binaire, ecrit son index)
         await self.__senseur_modules_handler.reload_configuration()
 
         # Generer fichiers de transactions par senseur pour conserver long-terme
         await asyncio.to_thread(self.generer_fichiers_transaction)
 
+    @property
+    def instance_id(self):
+        return self.__etat_senseurspassifs.instance_id
+
     @property
     def path_pending(self):
         path_logs = self.__etat_senseurspassifs.configuration.lecture_log_directory
@@ -48,9 +66,14 @@ class SenseursLogHandler:
         path_logs = self.__etat_senseurspassifs.configuration.lecture_log_directory
         return path.join(path_logs, 'archives')
 
-    def generer_fichiers_transaction(self):
+    def generer_fichiers_transaction(self, workers: Optional[int] = None):
         """
-        Converti tous les fichiers senseurs.DATE.jsonl en transactions sous un repertoire pour chaque senseur.
+        Converti tous les fichiers senseurs.DATE.jsonl (ou .bin) en transactions sous un repertoire pour chaque senseur.
+
+        Les fichiers sont lus ligne par ligne (mmap pour .bin). Les lectures de chaque senseur sont conservees dans des fichiers
+        temporaires (memoire bornee par TAILLE_TAMPONS_MAX) et chaque transaction complete est signee et compressee
+        dans un pool de threads (lzma libere le GIL).
+        :param workers: Threads de signature/compression, nombre de coeurs par defaut
         :return:
         """
         path_logs = self.__etat_senseurspassifs.configuration.lecture_log_directory
@@ -60,48 +83,43 @@ class SenseursLogHandler:
         makedirs(self.path_pending, exist_ok=True)
         makedirs(self.path_archives, exist_ok=True)
 
-        # Lire les evenements, generer les transactions par senseur
-        lectures_cumulees = dict()  # Key = uuid_senseur, value = [lectures]
-
-        for nom_fichier in fichiers:
-            path_fichier = path.join(path_logs, nom_fichier)
-            with open(path_fichier, 'r') as fichier:
-                for ligne in fichier:
-                    try:
-                        lecture = json.loads(ligne)
-                    except json.JSONDecodeError:
-                        self.__logger.exception("Erreur decodage fichier %s - corrompu" % path_fichier)
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        with tempfile.TemporaryDirectory(prefix='conversion.', dir=path_logs) as path_tmp:
+            with ThreadPoolExecutor(workers, thread_name_prefix='transactions') as executor:
+                conversion = ConversionLectures(self, path_tmp, executor, workers * 2)
+                # Lire les evenements, generer les transactions par senseur
+                for nom_fichier in fichiers:
+                    path_fichier = path.join(path_logs, nom_fichier)
+                    if nom_fichier.endswith('.bin'):
+                        with LecteurLogBinaire(path_fichier) as lecteur:
+                            for uuid_senseur, senseur_id, value in lecteur:
+                                conversion.ajouter(uuid_senseur, senseur_id, value)
                         continue
 
-                    try:
-                        uuid_senseur = lecture['uuid_senseur']
-                        senseurs_lectures = lecture['senseurs']  # Appareils
-                    except KeyError:
-                        continue
+                    with open(path_fichier, 'r') as fichier:
+                        for ligne in fichier:
+                            try:
+                                lecture = json.loads(ligne)
+                            except json.JSONDecodeError:
+                                self.__logger.exception("Erreur decodage fichier %s - corrompu", path_fichier)
+                                continue
+
+                            try:
+                                uuid_senseur = lecture['uuid_senseur']
+                                senseurs_lectures = lecture['senseurs']  # Appareils
+                            except KeyError:
+                                continue
 
-                    for senseur_id, value in senseurs_lectures.items():
-                        try:
-                            dict_lectures = lectures_cumulees[senseur_id]
-                            liste_lectures = dict_lectures['lectures']
-                        except KeyError:
-                            liste_lectures = list()
-                            dict_lectures = {
-                                'instance_id': self.__etat_senseurspassifs.instance_id,
-                                'uuid_senseur': uuid_senseur,
-                                'senseur': senseur_id,
-                                'lectures': liste_lectures
-                            }
-                            lectures_cumulees[senseur_id] = dict_lectures
-
-                        liste_lectures.append(value)
-
-                        if len(liste_lectures) >= 1000:
-                            # Flush une transaction pour ce senseur
-                            self.generer_fichier_transaction(dict_lectures)
-                            liste_lectures.clear()  # Reset liste du senseur
-
-        for senseur_id, dict_lectures in lectures_cumulees.items():
-            self.generer_fichier_transaction(dict_lectures)
+                            for senseur_id, value in senseurs_lectures.items():
+                                conversion.ajouter(uuid_senseur, senseur_id, value)
+
+                conversion.terminer()
+
+            if conversion.erreur is not None:
+                # Conserver les fichiers de log pour la prochaine conversion
+                raise conversion.erreur
 
         # Supprimer tous les fichiers de transaction
         for nom_fichier in fichiers:
@@ -120,13 +138,12 @@ class SenseursLogHandler:
         for fichier in fichiers_directory:
             fichier_split = fichier.split('.')
             try:
-                if fichier_split[0] == 'senseurs' and fichier_split[2] == 'jsonl':
-                    date_fichier = fichier_split[1]
-                    fichiers_log.append(date_fichier)
+                if fichier_split[0] == 'senseurs' and fichier_split[2] in ('jsonl', 'bin'):
+                    fichiers_log.append((fichier_split[1], fichier_split[2]))
             except IndexError:
                 pass
 
-        fichiers_log = ['senseurs.%s.jsonl' % f for f in sorted(fichiers_log)]
+        fichiers_log = ['senseurs.%s.%s' % f for f in sorted(fichiers_log)]
 
         return fichiers_log
 
@@ -153,8 +170,116 @@ class SenseursLogHandler:
 
         path_fichier = path.join(self.path_pending, nom_fichier_transaction)
 
-        with lzma.open(path_fichier, 'wt') as fichier_transaction:
-            json.dump(transaction, fichier_transaction, sort_keys=True)
+        # Serialiser et compresser en un seul appel (json C, lzma libere le GIL)
+        contenu = lzma.compress(json.dumps(transaction, sort_keys=True).encode('utf-8'))
+        with open(path_fichier, 'wb') as fichier_transaction:
+            fichier_transaction.write(contenu)
+
+
+class ConversionLectures:
+    """
+    Regroupe les lectures par senseur en transactions de TAILLE_TRANSACTION lectures.
+
+    Les lectures sont conservees en memoire (json) jusqu'a TAILLE_TAMPONS_MAX octets pour tous les senseurs, puis
+    ajoutees au fichier temporaire de la transaction en cours de chaque senseur. Les transactions completes sont
+    soumises a l'executor, au plus max_en_cours a la fois (la lecture des logs attend les workers).
+    """
+
+    def __init__(self, handler: SenseursLogHandler, path_tmp: str, executor: ThreadPoolExecutor, max_en_cours: int):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__handler = handler
+        self.__path_tmp = path_tmp
+        self.__executor = executor
+        self.__en_cours = threading.BoundedSemaphore(max_en_cours)
+
+        self.__senseurs = dict()  # Key = senseur_id, value = transaction en cours
+        self.__taille_tampons = 0
+        self.__erreur: Optional[BaseException] = None
+
+    @property
+    def erreur(self) -> Optional[BaseException]:
+        return self.__erreur
+
+    def ajouter(self, uuid_senseur: str, senseur_id: str, value):
+        try:
+            transaction = self.__senseurs[senseur_id]
+        except KeyError:
+            transaction = {
+                'index': len(self.__senseurs),
+                'uuid_senseur': uuid_senseur,
+                'no': 0,
+                'nombre': 0,
+                'tampon': list(),
+                'fichier': None,
+            }
+            self.__senseurs[senseur_id] = transaction
+
+        ligne = json.dumps(value)
+        transaction['tampon'].append(ligne)
+        transaction['nombre'] += 1
+        self.__taille_tampons += len(ligne)
+
+        if transaction['nombre'] >= TAILLE_TRANSACTION:
+            self.__soumettre(senseur_id, transaction)
+        elif self.__taille_tampons >= TAILLE_TAMPONS_MAX:
+            self.__vider_tampons()
+
+    def terminer(self):
+        """ Soumet les transactions incompletes de tous les senseurs. """
+        for senseur_id, transaction in self.__senseurs.items():
+            if transaction['nombre'] > 0:
+                self.__soumettre(senseur_id, transaction)
+
+    def __vider_tampons(self):
+        for transaction in self.__senseurs.values():
+            tampon = transaction['tampon']
+            if len(tampon) == 0:
+                continue
+            if transaction['fichier'] is None:
+                transaction['fichier'] = path.join(
+                    self.__path_tmp, '%d.%d.jsonl' % (transaction['index'], transaction['no']))
+            with open(transaction['fichier'], 'a') as fichier:
+                fichier.write('\n'.join(tampon))
+                fichier.write('\n')
+            tampon.clear()
+        self.__taille_tampons = 0
+
+    def __soumettre(self, senseur_id: str, transaction: dict):
+        tampon = transaction['tampon']
+        self.__taille_tampons -= sum(len(l) for l in tampon)
+
+        self.__en_cours.acquire()
+        future = self.__executor.submit(
+            self.__generer, senseur_id, transaction['uuid_senseur'], transaction['fichier'], list(tampon))
+        future.add_done_callback(self.__terminee)
+
+        tampon.clear()
+        transaction['no'] += 1
+        transaction['nombre'] = 0
+        transaction['fichier'] = None
+
+    def __terminee(self, future: Future):
+        self.__en_cours.release()
+        erreur = future.exception()
+        if erreur is not None:
+            self.__logger.error("Erreur generation transaction : %s", erreur)
+            self.__erreur = erreur
+
+    def __generer(self, senseur_id: str, uuid_senseur: str, path_fichier: Optional[str], tampon: list[str]):
+        lignes = list()
+        if path_fichier is not None:
+            with open(path_fichier, 'r') as fichier:
+                lignes.extend(fichier)
+            unlink(path_fichier)
+        lignes.extend(tampon)
+
+        dict_lectures = {
+            'instance_id': self.__handler.instance_id,
+            'uuid_senseur': uuid_senseur,
+            'senseur': senseur_id,
+            'lectures': [json.loads(l) for l in lignes],
+        }
+        self.__handler.generer_fichier_transaction(dict_lectures)
 
 
 def format_filename(s):
@@ -1,5 +1,4 @@
-import asyncio
-
+from millegrilles_senseurspassifs import EventLoop
 from millegrilles_senseurspassifs.SenseursPassifsMain import demarrer
 
 
@@ -8,7 +7,7 @@ def main():
     Methode d'execution de l'application
     :return:
     """
-    asyncio.run(demarrer())
+    EventLoop.run(demarrer())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,88 @@
+# Controle d'admission des handshakes WebSocket (tempete de reconnexions apres redemarrage du relai)
+import asyncio
+import logging
+import random
+import time
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+LOGGER = logging.getLogger(__name__)
+
+RETRY_MIN = 5   # Secondes
+RETRY_MAX = 60
+
+
+class AdmissionRefused(Exception):
+
+    def __init__(self, retry_after: int):
+        super().__init__('Handshake queue full, retry after %d seconds' % retry_after)
+        self.retry_after = retry_after
+
+
+class HandshakeSlot:
+    """
+    Place de handshake obtenue par une connexion. Liberee une seule fois, au premier de : fin du handshake,
+    timeout ou deconnexion.
+    """
+
+    __slots__ = ('__admission', '__timer', '__released')
+
+    def __init__(self, admission, timeout: float):
+        self.__admission = admission
+        self.__released = False
+        self.__timer = asyncio.get_running_loop().call_later(timeout, self.release)
+
+    def release(self):
+        if self.__released is False:
+            self.__released = True
+            self.__timer.cancel()
+            self.__admission.release()
+
+
+class HandshakeAdmission:
+
+    def __init__(self, metrics: MetricsRegistry, max_handshakes: int, max_queue: int, timeout: float):
+        self.__metrics = metrics
+        self.__max_queue = max_queue
+        self.__timeout = timeout
+        self.__semaphore = asyncio.Semaphore(max_handshakes)  # Waiters are served in FIFO order
+        self.__active = 0
+        self.__queued = 0
+
+        metrics.register_gauge('websocket.handshake.active', lambda: self.__active)
+        metrics.register_gauge('websocket.handshake.queued', lambda: self.__queued)
+
+    async def acquire(self) -> HandshakeSlot:
+        """
+        Waits for a handshake slot.
+        :raises AdmissionRefused: When the waiting queue is full. Contains a jittered retry hint.
+        """
+        if self.__semaphore.locked() and self.__queued >= self.__max_queue:
+            self.__metrics.increment('websocket.handshake.refused')
+            # Etaler les reconnexions selon la longueur de la file
+            retry_max = min(RETRY_MAX, RETRY_MIN + self.__queued // 10)
+            raise AdmissionRefused(random.randint(RETRY_MIN, max(RETRY_MIN, retry_max)))
+
+        debut = time.monotonic()
+        self.__queued += 1
+        try:
+            await self.__semaphore.acquire()
+        finally:
+            self.__queued -= 1
+
+        self.__active += 1
+        self.__metrics.observe('websocket.handshake.wait_ms', (time.monotonic() - debut) * 1000)
+
+        return HandshakeSlot(self, self.__timeout)
+
+    def release(self):
+        self.__active -= 1
+        self.__semaphore.release()
+
+    @property
+    def active(self) -> int:
+        return self.__active
+
+    @property
+    def queued(self) -> int:
+        return self.__queued
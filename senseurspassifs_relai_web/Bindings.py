@@ -0,0 +1,154 @@
+# Bindings MQ par usager pour les evenements lectureConfirmee
+import asyncio
+import logging
+import time
+
+from typing import Optional
+
+from millegrilles_messages.bus.PikaQueue import MilleGrillesPikaQueueConsumer, RoutingKey
+from millegrilles_messages.messages import Constantes
+from senseurspassifs_relai_web.Context import SenseurspassifsRelaiWebContext
+
+ROUTING_KEY_LECTURE_CONFIRMEE = 'evenement.SenseursPassifs.%s.lectureConfirmee'
+ROUTING_KEY_LECTURE_CONFIRMEE_TOUS = ROUTING_KEY_LECTURE_CONFIRMEE % '*'
+
+INTERVALLE_VERIFICATION = 30  # Secondes, verification de l'arret
+
+
+def supports_dynamic_bindings(consumer: MilleGrillesPikaQueueConsumer) -> bool:
+    return callable(getattr(consumer, 'bind_routing_key', None)) and \
+        callable(getattr(consumer, 'unbind_routing_key', None)) and \
+        callable(getattr(consumer, 'start_consuming', None))
+
+
+class LecturesBindings:
+    """
+    Binds evenement.SenseursPassifs.{user_id}.lectureConfirmee while at least one device of the user has a
+    correlation on this relay. The unbind is delayed (debounce) to absorb device reconnections.
+
+    The queue is exclusive: each (re)connection declares it again with the static routing keys only, including
+    the wildcard routing key. The per-user bindings are re-applied after each start_consuming() and the wildcard
+    is unbound only once they are all in place.
+    """
+
+    def __init__(self, context: SenseurspassifsRelaiWebContext, debounce: float):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__context = context
+        self.__debounce = debounce
+
+        self.__consumer: Optional[MilleGrillesPikaQueueConsumer] = None
+        self.__appareils: dict[str, int] = dict()  # user_id: nombre de correlations
+        self.__liberes: dict[str, float] = dict()  # user_id: moment ou le dernier appareil est parti
+        self.__bound: set[str] = set()
+        self.__wildcard = True  # Routing key de tous les usagers presente sur la Q
+        self.__generation = 0  # Incrementee a chaque (re)connexion du consumer
+        self.__connecte = False
+        self.__changed = asyncio.Event()
+
+        context.metrics.register_gauge('mq.bindings.lectures', lambda: len(self.__bound))
+
+    def attach(self, consumer: MilleGrillesPikaQueueConsumer) -> bool:
+        """
+        The consumer must already have the wildcard routing key, it is kept if runtime bindings are not supported.
+        :return: False if the consumer cannot bind at runtime.
+        """
+        if supports_dynamic_bindings(consumer) is False:
+            self.__logger.info("Queue consumer does not support runtime bindings, using %s",
+                               ROUTING_KEY_LECTURE_CONFIRMEE_TOUS)
+            return False
+
+        start_consuming = consumer.start_consuming
+
+        async def start_consuming_bindings(*args, **kwargs):
+            resultat = await start_consuming(*args, **kwargs)
+            self.connected()
+            return resultat
+
+        consumer.start_consuming = start_consuming_bindings
+        self.__consumer = consumer
+        return True
+
+    def connected(self):
+        """
+        The queue was (re)declared with the static routing keys: runtime bindings are gone, wildcard is back.
+        """
+        self.__bound.clear()
+        self.__wildcard = True
+        self.__generation += 1
+        self.__connecte = True
+        self.__changed.set()
+
+    def add(self, user_id: str):
+        self.__appareils[user_id] = self.__appareils.get(user_id, 0) + 1
+        self.__liberes.pop(user_id, None)
+        if user_id not in self.__bound:
+            self.__changed.set()
+
+    def remove(self, user_id: str):
+        try:
+            compte = self.__appareils[user_id] - 1
+        except KeyError:
+            return
+        if compte > 0:
+            self.__appareils[user_id] = compte
+        else:
+            del self.__appareils[user_id]
+            self.__liberes[user_id] = time.monotonic()
+            self.__changed.set()
+
+    async def run(self):
+        while self.__context.stopping is False:
+            try:
+                await asyncio.wait_for(self.__changed.wait(), self.__prochaine_echeance())
+            except asyncio.TimeoutError:
+                pass
+            self.__changed.clear()
+
+            if self.__consumer is None or self.__connecte is False:
+                continue
+
+            try:
+                await self.__synchroniser()
+            except asyncio.CancelledError as e:
+                raise e
+            except Exception:
+                self.__logger.exception("Error updating lectureConfirmee bindings")
+                await self.__context.wait(5)
+                self.__changed.set()  # Retry
+
+    def __prochaine_echeance(self) -> float:
+        if len(self.__liberes) == 0:
+            return INTERVALLE_VERIFICATION
+        plus_ancien = min(self.__liberes.values())
+        return min(INTERVALLE_VERIFICATION, max(0.0, plus_ancien + self.__debounce - time.monotonic()))
+
+    async def __synchroniser(self):
+        # Une reconnexion pendant un await remet les bindings a zero, abandonner (__changed est deja set)
+        generation = self.__generation
+
+        for user_id in [u for u in self.__appareils.keys() if u not in self.__bound]:
+            await self.__consumer.bind_routing_key(
+                RoutingKey(Constantes.SECURITE_PRIVE, ROUTING_KEY_LECTURE_CONFIRMEE % user_id))
+            if generation != self.__generation:
+                return
+            self.__bound.add(user_id)
+            self.__context.metrics.increment('mq.bindings.bind')
+
+        if self.__wildcard:
+            # Tous les usagers presents sont bound, la routing key de tous les usagers n'est plus requise
+            await self.__consumer.unbind_routing_key(
+                RoutingKey(Constantes.SECURITE_PRIVE, ROUTING_KEY_LECTURE_CONFIRMEE_TOUS))
+            if generation != self.__generation:
+                return
+            self.__wildcard = False
+
+        limite = time.monotonic() - self.__debounce
+        for user_id in [u for u, moment in self.__liberes.items() if moment <= limite]:
+            del self.__liberes[user_id]
+            if user_id in self.__bound:
+                await self.__consumer.unbind_routing_key(
+                    RoutingKey(Constantes.SECURITE_PRIVE, ROUTING_KEY_LECTURE_CONFIRMEE % user_id))
+                if generation != self.__generation:
+                    return
+                self.__bound.discard(user_id)
+                self.__context.metrics.increment('mq.bindings.unbind')
@@ -9,6 +9,9 @@ from Crypto.Cipher import ChaCha20_Poly1305
 from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
 from cryptography.hazmat.primitives import serialization
 
+from senseurspassifs_relai_web import Tracing
+from senseurspassifs_relai_web.Framing import encode_message, is_binary
+
 
 def preparer_cle_chiffrage(cle_peer: str) -> (bytes, str):
     cle_peer = binascii.unhexlify(cle_peer.encode('utf-8'))
@@ -24,7 +27,7 @@ def preparer_cle_chiffrage(cle_peer: str) -> (bytes, str):
     return cle_handshake, binascii.hexlify(cle_peer_bytes).decode('utf-8')
 
 
-def chiffrer_message_chacha20poly1305(key: bytes, plaintext: Union[str, bytes]):
+def chiffrer_message_chacha20poly1305(key: bytes, plaintext: Union[str, bytes], raw=False):
 
     if isinstance(plaintext, str):
         plaintext = plaintext.encode('utf-8')
@@ -37,6 +40,10 @@ def chiffrer_message_chacha20poly1305(key: bytes, plaintext: Union[str, bytes]):
     # print('Ciphertext binascii : %s' % binascii.hexlify(ciphertext))
     # print('Nonce binascii : %s' % binascii.hexlify(cipher.nonce))
 
+    if raw is True:
+        # Framing binaire (cbor/msgpack), les bytes sont transmis tel quel
+        return {'ciphertext': ciphertext, 'nonce': cipher.nonce, 'tag': tag}
+
     return {
         'ciphertext': base64.b64encode(ciphertext).decode('utf-8'),
         'nonce': base64.b64encode(cipher.nonce).decode('utf-8'),
@@ -62,7 +69,8 @@ def dechiffrer_message_chacha20poly1305(key: bytes, nonce: Union[str, bytes], ta
     return plaintext
 
 
-def attacher_reponse_chiffree(correlation=None, reponse: Optional[dict] = None, enveloppe=None):
+def attacher_reponse_chiffree(correlation=None, reponse: Optional[dict] = None, enveloppe=None,
+                              framing: Optional[str] = None):
     if correlation is None or reponse is None:
         return
 
@@ -74,10 +82,16 @@ def attacher_reponse_chiffree(correlation=None, reponse: Optional[dict] = None,
         else:
             info_enveloppe = None
 
-        message_chiffre = json.dumps({'contenu': reponse['contenu'], 'enveloppe': info_enveloppe})
+        message_chiffre = {'contenu': reponse['contenu'], 'enveloppe': info_enveloppe}
+        binaire = is_binary(framing)
+        if binaire:
+            message_chiffre = encode_message(message_chiffre, framing)
+        else:
+            message_chiffre = json.dumps(message_chiffre)
 
         # Chiffrer le contenu
-        message_chiffre = chiffrer_message_chacha20poly1305(cle_dechiffrage, message_chiffre)
+        with Tracing.span('encrypt'):
+            message_chiffre = chiffrer_message_chacha20poly1305(cle_dechiffrage, message_chiffre, raw=binaire)
         try:
             attachements = reponse['attachements']
         except KeyError:
@@ -0,0 +1,81 @@
+# Parametres de transport websocket par connexion (buffers, compression permessage-deflate)
+from typing import Any, Optional, Sequence
+
+from websockets import frames
+from websockets.extensions.base import Extension, ExtensionParameter
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+
+from senseurspassifs_relai_web.Configuration import SenseurspassifsRelaiWebConfiguration
+
+COMPRESSION_DEFLATE = 'deflate'
+COMPRESSION_NONE = 'none'
+
+
+class PerMessageDeflateMinSize(PerMessageDeflate):
+    """
+    permessage-deflate that sends small messages uncompressed (rsv1 not set), as allowed by RFC 7692.
+    The deflate header and sync flush cost more than they save on tiny frames.
+    """
+
+    def __init__(self, min_size: int, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+
+    def encode(self, frame: frames.Frame) -> frames.Frame:
+        if frame.opcode in (frames.OP_TEXT, frames.OP_BINARY) and frame.fin and len(frame.data) < self.min_size:
+            return frame
+        return super().encode(frame)
+
+
+class ServerPerMessageDeflateMinSizeFactory(ServerPerMessageDeflateFactory):
+
+    def __init__(self, min_size: int, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.min_size = min_size
+
+    def process_request_params(
+        self,
+        params: Sequence[ExtensionParameter],
+        accepted_extensions: Sequence[Extension],
+    ) -> tuple[list[ExtensionParameter], PerMessageDeflate]:
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, PerMessageDeflateMinSize(
+            self.min_size,
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+        )
+
+
+def parametres_serveur_websocket(configuration: SenseurspassifsRelaiWebConfiguration) -> dict:
+    """
+    :return: Per-connection buffer and compression parameters for websockets serve().
+    """
+    extensions: Optional[list] = None
+    if configuration.websocket_compression == COMPRESSION_DEFLATE:
+        # Fenetre de compression reduite (server_max_window_bits), c'est la taille du buffer inflate cote
+        # microcontrolleur. Les frames binaires (cbor/msgpack) chiffrees se compressent mal, niveau garde bas.
+        # client_max_window_bits reduit aussi le buffer inflate du relai quand l'appareil le supporte.
+        extensions = [ServerPerMessageDeflateMinSizeFactory(
+            configuration.websocket_compression_min_size,
+            server_max_window_bits=11,
+            client_max_window_bits=11,
+            compress_settings={'memLevel': 4, 'level': 3},
+        )]
+
+    parametres = {
+        'compression': None,
+        'extensions': extensions,
+    }
+
+    # Budget memoire optionnel, sinon les defauts de websockets
+    if configuration.websocket_max_size is not None:
+        parametres['max_size'] = configuration.websocket_max_size
+    if configuration.websocket_max_queue is not None:
+        parametres['max_queue'] = configuration.websocket_max_queue
+    if configuration.websocket_write_limit is not None:
+        parametres['write_limit'] = configuration.websocket_write_limit
+
+    return parametres
@@ -6,6 +6,8 @@ import os
 from typing import Optional
 
 from millegrilles_messages.bus.BusConfiguration import MilleGrillesBusConfiguration
+from millegrilles_senseurspassifs.EventLoop import ajouter_argument_event_loop
+from millegrilles_senseurspassifs.LoggingQueue import demarrer_logging_queue
 from senseurspassifs_relai_web import Constantes as RelayConstants
 
 LOGGING_NAMES = [__name__, 'millegrilles_messages', 'senseurspassifs_relai_web']
@@ -18,6 +20,7 @@ def __adjust_logging(args: argparse.Namespace):
         logging_format = f'%(asctime)s - {logging_format}'
 
     logging.basicConfig(format=logging_format)
+    demarrer_logging_queue()  # Ecriture des logs hors de l'event loop
 
     if args.verbose is True:
         asyncio.get_event_loop().set_debug(True)  # Asyncio warnings
@@ -38,6 +41,7 @@ def _parse_command_line():
         '--logtime', action="store_true", required=False,
         help="Add time to logging"
     )
+    ajouter_argument_event_loop(parser)  # Utilise au demarrage par EventLoop.run()
 
     args = parser.parse_args()
     __adjust_logging(args)
@@ -50,6 +54,38 @@ class SenseurspassifsRelaiWebConfiguration(MilleGrillesBusConfiguration):
         super().__init__()
         self.web_port = 443
         self.websocket_port = 444
+        self.data_path = '/var/opt/millegrilles/senseurspassifs'
+        self.key_pem_path: Optional[str] = None
+        self.cert_pem_path: Optional[str] = None
+        self.session_ticket_duree = 86_400  # Secondes
+        self.session_ticket_max = 10_000
+        self.websocket_handshakes_max = 32
+        self.websocket_handshakes_queue = 500
+        self.websocket_handshake_timeout = 10.0  # Secondes
+        self.presence_batch_window = 0.0  # Secondes, 0 pour un evenement presenceAppareil par appareil (defaut)
+        self.configuration_cache_duree = 900  # Secondes, 0 pour desactiver
+
+        # Budget memoire par connexion, None = defaut de la librairie (websockets : 1 MiB, 16 messages, 32 KiB).
+        # Un budget reduit (e.g. 65536, 4, 16384) est optionnel, les appareils qui envoient des chaines de
+        # certificats ou de grosses configurations ont besoin des defauts.
+        self.websocket_max_size: Optional[int] = None  # Taille max d'un message recu
+        self.websocket_max_queue: Optional[int] = None  # Nombre de messages recus en attente
+        self.websocket_write_limit: Optional[int] = None  # Octets en attente d'envoi avant de bloquer
+        self.websocket_compression = 'deflate'  # deflate ou none
+        self.websocket_compression_min_size = 256  # Messages plus petits envoyes sans compression
+        self.http_client_max_size: Optional[int] = None  # Taille max du body d'une requete HTTP (aiohttp : 1 MiB)
+        self.http_read_bufsize: Optional[int] = None  # Buffer de lecture HTTP (defaut aiohttp)
+        self.http_keepalive_timeout = 300  # Secondes, plus long que le long-polling (270 secondes) de /poll
+
+        self.tls_num_tickets = 2  # Tickets de session TLS 1.3 emis par handshake
+        self.tls_ticket_rotation = 43_200  # Secondes, 0 pour desactiver la rotation des cles de tickets
+        self.bindings_debounce = 300  # Secondes avant de retirer le binding lectureConfirmee d'un usager parti
+        self.gateway_max_devices = 0  # Sous-appareils par websocket de passerelle, 0 pour desactiver
+        self.loop_monitor_intervalle = 0.0  # Secondes (e.g. 0.1), 0 pour desactiver le moniteur de l'event loop
+        self.loop_monitor_seuil = 0.25  # Secondes de blocage avant de logger la task courante
+        self.profiler_duree = 30  # Secondes d'un profil (SIGUSR1 cpu, SIGUSR2 memoire)
+        self.profiler_au_demarrage: Optional[str] = None  # cpu ou memory
+        self.tracing_sample_ratio = 0.0  # Ratio des messages d'appareils traces, 0 pour desactiver
 
     def parse_config(self, configuration: Optional[dict] = None):
         """
@@ -67,6 +103,104 @@ class SenseurspassifsRelaiWebConfiguration(MilleGrillesBusConfiguration):
         if websocket_port:
             self.websocket_port = int(websocket_port)
 
+        self.data_path = os.environ.get(RelayConstants.ENV_DATA_PATH) or self.data_path
+        self.key_pem_path = os.environ.get(RelayConstants.PARAM_KEY_PATH) or self.key_pem_path
+        self.cert_pem_path = os.environ.get(RelayConstants.PARAM_CERT_PATH) or self.cert_pem_path
+
+        session_ticket_duree = os.environ.get(RelayConstants.ENV_SESSION_TICKET_DUREE)
+        if session_ticket_duree:
+            self.session_ticket_duree = int(session_ticket_duree)
+
+        session_ticket_max = os.environ.get(RelayConstants.ENV_SESSION_TICKET_MAX)
+        if session_ticket_max:
+            self.session_ticket_max = int(session_ticket_max)
+
+        websocket_handshakes_max = os.environ.get(RelayConstants.ENV_WEBSOCKET_HANDSHAKES_MAX)
+        if websocket_handshakes_max:
+            self.websocket_handshakes_max = int(websocket_handshakes_max)
+
+        websocket_handshakes_queue = os.environ.get(RelayConstants.ENV_WEBSOCKET_HANDSHAKES_QUEUE)
+        if websocket_handshakes_queue:
+            self.websocket_handshakes_queue = int(websocket_handshakes_queue)
+
+        websocket_handshake_timeout = os.environ.get(RelayConstants.ENV_WEBSOCKET_HANDSHAKE_TIMEOUT)
+        if websocket_handshake_timeout:
+            self.websocket_handshake_timeout = float(websocket_handshake_timeout)
+
+        presence_batch_window = os.environ.get(RelayConstants.ENV_PRESENCE_BATCH_WINDOW)
+        if presence_batch_window:
+            self.presence_batch_window = float(presence_batch_window)
+
+        configuration_cache_duree = os.environ.get(RelayConstants.ENV_CONFIGURATION_CACHE_DUREE)
+        if configuration_cache_duree:
+            self.configuration_cache_duree = float(configuration_cache_duree)
+
+        websocket_max_size = os.environ.get(RelayConstants.ENV_WEBSOCKET_MAX_SIZE)
+        if websocket_max_size:
+            self.websocket_max_size = int(websocket_max_size)
+
+        websocket_max_queue = os.environ.get(RelayConstants.ENV_WEBSOCKET_MAX_QUEUE)
+        if websocket_max_queue:
+            self.websocket_max_queue = int(websocket_max_queue)
+
+        websocket_write_limit = os.environ.get(RelayConstants.ENV_WEBSOCKET_WRITE_LIMIT)
+        if websocket_write_limit:
+            self.websocket_write_limit = int(websocket_write_limit)
+
+        websocket_compression = os.environ.get(RelayConstants.ENV_WEBSOCKET_COMPRESSION)
+        if websocket_compression:
+            self.websocket_compression = websocket_compression.lower()
+
+        websocket_compression_min_size = os.environ.get(RelayConstants.ENV_WEBSOCKET_COMPRESSION_MIN_SIZE)
+        if websocket_compression_min_size:
+            self.websocket_compression_min_size = int(websocket_compression_min_size)
+
+        http_client_max_size = os.environ.get(RelayConstants.ENV_HTTP_CLIENT_MAX_SIZE)
+        if http_client_max_size:
+            self.http_client_max_size = int(http_client_max_size)
+
+        http_read_bufsize = os.environ.get(RelayConstants.ENV_HTTP_READ_BUFSIZE)
+        if http_read_bufsize:
+            self.http_read_bufsize = int(http_read_bufsize)
+
+        http_keepalive_timeout = os.environ.get(RelayConstants.ENV_HTTP_KEEPALIVE_TIMEOUT)
+        if http_keepalive_timeout:
+            self.http_keepalive_timeout = float(http_keepalive_timeout)
+
+        tls_num_tickets = os.environ.get(RelayConstants.ENV_TLS_NUM_TICKETS)
+        if tls_num_tickets:
+            self.tls_num_tickets = int(tls_num_tickets)
+
+        tls_ticket_rotation = os.environ.get(RelayConstants.ENV_TLS_TICKET_ROTATION)
+        if tls_ticket_rotation:
+            self.tls_ticket_rotation = float(tls_ticket_rotation)
+
+        bindings_debounce = os.environ.get(RelayConstants.ENV_BINDINGS_DEBOUNCE)
+        if bindings_debounce:
+            self.bindings_debounce = float(bindings_debounce)
+
+        gateway_max_devices = os.environ.get(RelayConstants.ENV_GATEWAY_MAX_DEVICES)
+        if gateway_max_devices:
+            self.gateway_max_devices = int(gateway_max_devices)
+
+        loop_monitor_intervalle = os.environ.get(RelayConstants.ENV_LOOP_MONITOR_INTERVAL_MS)
+        if loop_monitor_intervalle:
+            self.loop_monitor_intervalle = int(loop_monitor_intervalle) / 1000
+
+        loop_monitor_seuil = os.environ.get(RelayConstants.ENV_LOOP_MONITOR_THRESHOLD_MS)
+        if loop_monitor_seuil:
+            self.loop_monitor_seuil = int(loop_monitor_seuil) / 1000
+
+        profiler_duree = os.environ.get(RelayConstants.ENV_PROFILER_DURATION)
+        if profiler_duree:
+            self.profiler_duree = float(profiler_duree)
+
+        self.profiler_au_demarrage = os.environ.get(RelayConstants.ENV_PROFILER_ON_START) or self.profiler_au_demarrage
+
+        tracing_sample_ratio = os.environ.get(RelayConstants.ENV_TRACING_SAMPLE_RATIO)
+        if tracing_sample_ratio:
+            self.tracing_sample_ratio = float(tracing_sample_ratio)
+
     @staticmethod
     def load():
         # Override
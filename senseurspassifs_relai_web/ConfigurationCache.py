@@ -0,0 +1,127 @@
+# Cache des reponses de configuration (displays, programmes) demandees par les appareils
+import asyncio
+import logging
+import time
+
+from typing import Awaitable, Callable, Optional
+
+from millegrilles_messages.messages.MessagesModule import MessageWrapper
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+ACTIONS_CACHE = frozenset(['getAppareilDisplayConfiguration', 'getAppareilProgrammesConfiguration'])
+ACTIONS_INVALIDATION = frozenset(['evenementMajDisplays', 'evenementMajProgrammes', 'majConfigurationAppareil'])
+
+
+class _Entree:
+
+    __slots__ = ('reponse', 'expiration')
+
+    def __init__(self, reponse: MessageWrapper, expiration: float):
+        self.reponse = reponse
+        self.expiration = expiration
+
+
+class ConfigurationCache:
+    """
+    Caches the signed responses to device configuration requests, keyed by (user_id, uuid_appareil, action).
+    Identical requests received while a response is pending share the same MQ request.
+    Entries are invalidated by the configuration update events of the device.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, duree: float):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__metrics = metrics
+        self.__duree = duree
+        self.__entrees: dict[tuple[str, str, str], _Entree] = dict()
+        self.__en_cours: dict[tuple[str, str, str], asyncio.Future] = dict()
+        self.__generations: dict[tuple[str, str], int] = dict()  # Incremente a chaque invalidation
+
+        metrics.register_gauge('configuration_cache.entries', lambda: len(self.__entrees))
+
+    async def get(self, user_id: str, uuid_appareil: str, action: str,
+                  requete: Callable[[], Awaitable[MessageWrapper]]) -> MessageWrapper:
+        """
+        :param requete: Emits the MQ request when there is no cached or pending response.
+        :return: The original response message. Must not be modified by the caller.
+        """
+        if self.__duree <= 0 or action not in ACTIONS_CACHE:
+            return await requete()
+
+        cle = (user_id, uuid_appareil, action)
+
+        try:
+            entree = self.__entrees[cle]
+            if entree.expiration > time.monotonic():
+                self.__metrics.increment('configuration_cache.hit')
+                return entree.reponse
+            del self.__entrees[cle]
+        except KeyError:
+            pass
+
+        try:
+            # Requete identique deja en cours
+            future = self.__en_cours[cle]
+            self.__metrics.increment('configuration_cache.coalesced')
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError as e:
+                if not future.cancelled():
+                    raise e
+                # La requete d'origine a ete annulee (appareil deconnecte), emettre notre propre requete
+        except KeyError:
+            pass
+
+        self.__metrics.increment('configuration_cache.miss')
+        generation = self.__generations.get((user_id, uuid_appareil), 0)
+        future = asyncio.get_running_loop().create_future()
+        self.__en_cours[cle] = future
+        try:
+            reponse = await requete()
+        except asyncio.CancelledError as e:
+            future.cancel()
+            raise e
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Eviter warning si aucune requete en attente
+            raise e
+        finally:
+            if self.__en_cours.get(cle) is future:
+                del self.__en_cours[cle]
+
+        future.set_result(reponse)
+
+        # Ne pas conserver une reponse recue apres une invalidation, ni une reponse d'erreur
+        if generation == self.__generations.get((user_id, uuid_appareil), 0) and reponse.parsed.get('ok') is not False:
+            self.__entrees[cle] = _Entree(reponse, time.monotonic() + self.__duree)
+
+        return reponse
+
+    def invalidate(self, user_id: str, uuid_appareil: Optional[str] = None):
+        """
+        :param uuid_appareil: Device to invalidate. When None, all devices of the user are invalidated.
+        """
+        if uuid_appareil is None:
+            cles = [c for c in self.__entrees.keys() if c[0] == user_id]
+            appareils = set([c[1] for c in self.__en_cours.keys() if c[0] == user_id])
+        else:
+            cles = [c for c in self.__entrees.keys() if c[0] == user_id and c[1] == uuid_appareil]
+            appareils = {uuid_appareil}
+
+        for cle in cles:
+            del self.__entrees[cle]
+
+        for appareil in appareils:
+            cle_generation = (user_id, appareil)
+            self.__generations[cle_generation] = self.__generations.get(cle_generation, 0) + 1
+
+        self.__metrics.increment('configuration_cache.invalidated', len(cles))
+
+    def purge(self):
+        maintenant = time.monotonic()
+        for cle in [c for c, e in self.__entrees.items() if e.expiration <= maintenant]:
+            del self.__entrees[cle]
+
+        # Les generations ne servent qu'aux requetes en cours
+        en_cours = set([(c[0], c[1]) for c in self.__en_cours.keys()])
+        for cle in [c for c in self.__generations.keys() if c not in en_cours]:
+            del self.__generations[cle]
@@ -1,5 +1,30 @@
 ENV_WEB_PORT = 'WEB_PORT'
 ENV_WEBSOCKET_PORT = 'WEBSOCKET_PORT'
+ENV_DATA_PATH = 'DATA_PATH'
+ENV_SESSION_TICKET_DUREE = 'SESSION_TICKET_DUREE'
+ENV_SESSION_TICKET_MAX = 'SESSION_TICKET_MAX'
+ENV_WEBSOCKET_HANDSHAKES_MAX = 'WEBSOCKET_HANDSHAKES_MAX'
+ENV_WEBSOCKET_HANDSHAKES_QUEUE = 'WEBSOCKET_HANDSHAKES_QUEUE'
+ENV_WEBSOCKET_HANDSHAKE_TIMEOUT = 'WEBSOCKET_HANDSHAKE_TIMEOUT'
+ENV_PRESENCE_BATCH_WINDOW = 'PRESENCE_BATCH_WINDOW'
+ENV_CONFIGURATION_CACHE_DUREE = 'CONFIGURATION_CACHE_DUREE'
+ENV_WEBSOCKET_MAX_SIZE = 'WEBSOCKET_MAX_SIZE'
+ENV_WEBSOCKET_MAX_QUEUE = 'WEBSOCKET_MAX_QUEUE'
+ENV_WEBSOCKET_WRITE_LIMIT = 'WEBSOCKET_WRITE_LIMIT'
+ENV_WEBSOCKET_COMPRESSION = 'WEBSOCKET_COMPRESSION'
+ENV_WEBSOCKET_COMPRESSION_MIN_SIZE = 'WEBSOCKET_COMPRESSION_MIN_SIZE'
+ENV_HTTP_CLIENT_MAX_SIZE = 'HTTP_CLIENT_MAX_SIZE'
+ENV_HTTP_READ_BUFSIZE = 'HTTP_READ_BUFSIZE'
+ENV_HTTP_KEEPALIVE_TIMEOUT = 'HTTP_KEEPALIVE_TIMEOUT'
+ENV_TLS_NUM_TICKETS = 'TLS_NUM_TICKETS'
+ENV_TLS_TICKET_ROTATION = 'TLS_TICKET_ROTATION'
+ENV_BINDINGS_DEBOUNCE = 'BINDINGS_DEBOUNCE'
+ENV_GATEWAY_MAX_DEVICES = 'GATEWAY_MAX_DEVICES'
+ENV_LOOP_MONITOR_INTERVAL_MS = 'LOOP_MONITOR_INTERVAL_MS'
+ENV_LOOP_MONITOR_THRESHOLD_MS = 'LOOP_MONITOR_THRESHOLD_MS'
+ENV_PROFILER_DURATION = 'PROFILER_DURATION'
+ENV_PROFILER_ON_START = 'PROFILER_ON_START'
+ENV_TRACING_SAMPLE_RATIO = 'TRACING_SAMPLE_RATIO'
 PARAM_CERT_PATH = 'CERT_PEM'
 PARAM_KEY_PATH = 'KEY_PEM'
 PARAM_CA_PATH = 'CA_PEM'
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import os
 
 from asyncio import TaskGroup
 
@@ -8,7 +9,10 @@ from typing import Optional
 from millegrilles_messages.bus.BusContext import MilleGrillesBusContext, ForceTerminateExecution
 from millegrilles_messages.bus.PikaConnector import MilleGrillesPikaConnector
 from millegrilles_messages.bus.PikaMessageProducer import MilleGrillesPikaMessageProducer
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
 from senseurspassifs_relai_web.Configuration import SenseurspassifsRelaiWebConfiguration
+from senseurspassifs_relai_web.Tls import ServerTlsContext
+from senseurspassifs_relai_web.Tracing import Tracer
 
 LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +32,12 @@ class SenseurspassifsRelaiWebContext(MilleGrillesBusContext):
         self.__fiche_publique: Optional[dict] = None
         self.__shutting_down = asyncio.Event()
         self.__loop = asyncio.get_event_loop()
+        self.__metrics = MetricsRegistry()
+        self.__tls = ServerTlsContext(
+            self.__metrics, configuration.cert_pem_path, configuration.key_pem_path,
+            configuration.tls_num_tickets, configuration.tls_ticket_rotation, lambda: self.ssl_context)
+        self.__tracer = Tracer(self.__metrics, os.path.join(configuration.data_path, 'traces', 'spans.jsonl'),
+                               configuration.tracing_sample_ratio)
 
     def stop(self):
         """
@@ -51,6 +61,20 @@ class SenseurspassifsRelaiWebContext(MilleGrillesBusContext):
     def configuration(self) -> SenseurspassifsRelaiWebConfiguration:
         return super().configuration
 
+    @property
+    def metrics(self) -> MetricsRegistry:
+        return self.__metrics
+
+    @property
+    def tls(self) -> ServerTlsContext:
+        """ Server TLS context for the relay listeners (HTTP and WebSocket). """
+        return self.__tls
+
+    @property
+    def tracer(self) -> Tracer:
+        """ Spans of device messages (sampled with TRACING_SAMPLE_RATIO). """
+        return self.__tracer
+
     @property
     def fiche_publique(self) -> Optional[dict]:
         return self.__fiche_publique
@@ -65,6 +89,8 @@ class SenseurspassifsRelaiWebContext(MilleGrillesBusContext):
             async with TaskGroup() as group:
                 group.create_task(super().run())
                 group.create_task(self.__stop_thread())
+                group.create_task(self.__tls.run(self.__shutting_down))
+                group.create_task(self.__tracer.run(self.__shutting_down))
         except *Exception:  # Stop on any thread exception
             self.__logger.exception("InstanceContext Error")
             if self.stopping is False:
@@ -0,0 +1,75 @@
+# Encodage des frames WebSocket echangees avec les appareils (json ou binaire)
+import json
+import logging
+
+from typing import Optional, Union
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+LOGGER = logging.getLogger(__name__)
+
+FRAMING_JSON = 'json'
+FRAMING_CBOR = 'cbor'
+FRAMING_MSGPACK = 'msgpack'
+
+
+def supported_framings() -> list[str]:
+    """
+    :return: Binary framings available on this relay, in order of preference.
+    """
+    framings = list()
+    if cbor2 is not None:
+        framings.append(FRAMING_CBOR)
+    if msgpack is not None:
+        framings.append(FRAMING_MSGPACK)
+    return framings
+
+
+def negotiate_framing(requested: Optional[list]) -> str:
+    """
+    Picks the first framing requested by the device that is supported locally. Falls back to json.
+    :param requested: List of framings from the device, in order of preference.
+    :return: Selected framing
+    """
+    if not isinstance(requested, list):
+        return FRAMING_JSON
+
+    available = supported_framings()
+    for framing in requested:
+        if framing in available:
+            return framing
+
+    return FRAMING_JSON
+
+
+def is_binary(framing: Optional[str]) -> bool:
+    return framing in (FRAMING_CBOR, FRAMING_MSGPACK)
+
+
+def encode_message(message: dict, framing: Optional[str] = None) -> bytes:
+    if framing == FRAMING_CBOR:
+        return cbor2.dumps(message)
+    elif framing == FRAMING_MSGPACK:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message).encode('utf-8')
+
+
+def decode_message(message: Union[str, bytes], framing: Optional[str] = None) -> dict:
+    """
+    Decodes a frame received from a device. Json frames are always accepted, even when a binary
+    framing was negotiated (e.g. the initial messages sent before the key exchange).
+    """
+    if isinstance(message, bytes) and is_binary(framing) and message[:1] != b'{':
+        if framing == FRAMING_CBOR:
+            return cbor2.loads(message)
+        elif framing == FRAMING_MSGPACK:
+            return msgpack.unpackb(message, raw=False)
+    return json.loads(message)
@@ -10,6 +10,7 @@ from cryptography.exceptions import InvalidSignature
 
 from millegrilles_messages.messages import Constantes
 from millegrilles_messages.messages.MessagesModule import MessageWrapper
+from senseurspassifs_relai_web import Tracing
 from senseurspassifs_relai_web.SenseurspassifsRelaiWebManager import SenseurspassifsRelaiWebManager
 
 logger = logging.getLogger(__name__)
@@ -19,13 +20,20 @@ CONST_DEFAUT_TIMEOUT_HTTP = 60
 
 
 async def handle_post_inscrire(request: Request, manager: SenseurspassifsRelaiWebManager):
+    with manager.context.tracer.trace('http.inscrire'):
+        return await _handle_post_inscrire(request, manager)
+
+
+async def _handle_post_inscrire(request: Request, manager: SenseurspassifsRelaiWebManager):
     try:
         commande = await request.json()
-        logger.debug("handle_post_inscrire commande recue : %s" % json.dumps(commande, indent=2))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("handle_post_inscrire commande recue : %s", json.dumps(commande, indent=2))
 
         # Valider signature
         context = manager.context
-        await context.validateur_message.verifier(commande, verifier_certificat=False)
+        with Tracing.span('verify'):
+            await context.validateur_message.verifier(commande, verifier_certificat=False)
         logger.debug("handle_post_inscrire Resultat validation OK")
 
         # Valider le contenu
@@ -62,7 +70,7 @@ async def handle_post_inscrire(request: Request, manager: SenseurspassifsRelaiWe
 async def handle_post_poll(request: Request, manager: SenseurspassifsRelaiWebManager):
     try:
         commande = await request.json()
-        logger.debug("handle_post_poll Etat recu %s" % commande)
+        logger.debug("handle_post_poll Etat recu %s", commande)
 
         context = manager.context
         enveloppe = await context.validateur_message.verifier(commande)
@@ -127,7 +135,7 @@ async def handle_post_renouveler(request: Request, manager: SenseurspassifsRelai
     """
     try:
         commande = await request.json()
-        logger.debug("handle_post_renouveler Demande recue %s" % commande)
+        logger.debug("handle_post_renouveler Demande recue %s", commande)
 
         context = manager.context
 
@@ -178,7 +186,7 @@ async def handle_post_commande(request: Request, manager: SenseurspassifsRelaiWe
 async def handle_post_requete(request: Request, manager: SenseurspassifsRelaiWebManager):
     try:
         requete = await request.json()
-        logger.debug("handle_post_request Etat recu %s" % requete)
+        logger.debug("handle_post_request Etat recu %s", requete)
 
         context = manager.context
         enveloppe = await context.validateur_message.verifier(requete)
@@ -192,15 +200,8 @@ async def handle_post_requete(request: Request, manager: SenseurspassifsRelaiWeb
         await manager.create_device_correlation(enveloppe)
 
         # Emettre la requete
-        routage = requete['routage']
-        domaine = routage['domaine']
-        action = routage['action']
-        partition = routage.get('partition')
-        exchange = Constantes.SECURITE_PRIVE
-
         try:
-            producer = await context.get_producer()
-            reponse = await producer.request(requete, domaine, action, exchange, partition, noformat=True)
+            reponse = await manager.requete_appareil(enveloppe, requete)
             reponse = reponse.parsed
         except asyncio.TimeoutError:
             reponse = {'ok': False, 'err': 'Timeout'}
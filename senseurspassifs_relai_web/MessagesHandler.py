@@ -3,62 +3,77 @@ import asyncio
 import datetime
 import json
 import logging
+import time
 from asyncio import TaskGroup
+from os import makedirs, path
 from typing import Optional, Union
 
-import pytz
 from millegrilles_messages.messages import Constantes
 from millegrilles_messages.messages.EnveloppeCertificat import EnveloppeCertificat
 from millegrilles_messages.messages.MessagesModule import MessageWrapper
 
+from senseurspassifs_relai_web import Tracing
 from senseurspassifs_relai_web.Chiffrage import preparer_cle_chiffrage
+from senseurspassifs_relai_web.Bindings import LecturesBindings
+from senseurspassifs_relai_web.ConfigurationCache import ConfigurationCache, ACTIONS_INVALIDATION
 from senseurspassifs_relai_web.Context import SenseurspassifsRelaiWebContext
+from senseurspassifs_relai_web.Presence import PresenceAggregator
+from senseurspassifs_relai_web.SessionTickets import SessionTicketCache, SessionTicket
 
 MAX_REQUETES_CERTIFICAT = 10
 EXPIRATION_APPAREIL = datetime.timedelta(minutes=10)
 EXPIRATION_REQUETE_CERTIFICAT = datetime.timedelta(minutes=3)
+EXPIRATION_REQUETE_CERTIFICAT_SECS = EXPIRATION_REQUETE_CERTIFICAT.total_seconds()
 
 
 class CorrelationHook:
-    def __init__(self):
-        self.__logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+    """
+    Etat conserve pour chaque appareil connecte, compact (slots, queue creee au premier message).
+    """
+
+    __slots__ = ('__derniere_activite', '__reponse', '__reponse_consommee')
+
+    _logger = logging.getLogger(__name__ + ".CorrelationHook")
 
-        self.__derniere_activite = datetime.datetime.now(tz=pytz.UTC)
-        self.__reponse = asyncio.Queue(3)
+    def __init__(self):
+        self.__derniere_activite = time.monotonic()
+        self.__reponse: Optional[asyncio.Queue] = None
         self.__reponse_consommee = False
 
     def touch(self):
-        self.__derniere_activite = datetime.datetime.now(tz=pytz.UTC)
+        self.__derniere_activite = time.monotonic()
 
     @property
     def expire(self):
         return (
-            datetime.datetime.now(tz=pytz.UTC) - self.__derniere_activite
-            > EXPIRATION_REQUETE_CERTIFICAT
+            time.monotonic() - self.__derniere_activite
+            > EXPIRATION_REQUETE_CERTIFICAT_SECS
         )
 
     @property
     def is_message_pending(self):
-        return not self.__reponse.empty()
+        return self.__reponse is not None and not self.__reponse.empty()
 
     async def put_message(
         self, message: Optional[Union[dict, MessageWrapper]], nowait=True
     ):
         try:
             if nowait:
-                self.__reponse.put_nowait(message)
+                self.response_queue.put_nowait(message)
             else:
-                await self.__reponse.put(message)
+                await self.response_queue.put(message)
         except asyncio.QueueFull:
-            self.__logger.error("Erreur reception message appareil, Q full")
+            self._logger.error("Erreur reception message appareil, Q full")
 
     async def get_reponse(
         self, timeout: Optional[int] = 60
     ) -> Optional[MessageWrapper]:
         if timeout is None:
+            if self.__reponse is None:
+                raise asyncio.QueueEmpty()
             reponse = self.__reponse.get_nowait()
         else:
-            reponse = await asyncio.wait_for(self.__reponse.get(), timeout)
+            reponse = await asyncio.wait_for(self.response_queue.get(), timeout)
 
         if reponse is not None:
             self.__reponse_consommee = True
@@ -67,6 +82,8 @@ class CorrelationHook:
 
     @property
     def response_queue(self) -> asyncio.Queue[Optional[Union[MessageWrapper, dict]]]:
+        if self.__reponse is None:
+            self.__reponse = asyncio.Queue(3)
         return self.__reponse
 
 
@@ -75,12 +92,16 @@ class CorrelationAppareil(CorrelationHook):
     Queue de reception de messages pour un appareil
     """
 
+    __slots__ = ('__certificat', '__senseurs_externes', '__lectures_pending', '__emettre_lectures',
+                 '__cle_chiffrage', '__relai_messages_actif')
+
+    _logger = logging.getLogger(__name__ + ".CorrelationAppareil")
+
     def __init__(self, certificat: EnveloppeCertificat, emettre_lectures=True):
         super().__init__()
-        self.__logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
         self.__certificat = certificat
         self.__senseurs_externes: Optional[list] = None
-        self.__lectures_pending = dict()
+        self.__lectures_pending: Optional[dict] = None
         self.__emettre_lectures = emettre_lectures
         self.__cle_chiffrage: Optional[bytes] = None
         self.__relai_messages_actif = True
@@ -101,13 +122,20 @@ class CorrelationAppareil(CorrelationHook):
         self.__cle_chiffrage, cle_peer_str = preparer_cle_chiffrage(cle_peer)
         return cle_peer_str
 
+    def restaurer_cle_chiffrage(self, cle: bytes, relai_actif: bool):
+        """
+        Reprise d'une session chiffree a partir d'un ticket (cle deja echangee avec l'appareil).
+        """
+        self.__cle_chiffrage = cle
+        self.__relai_messages_actif = relai_actif
+
     def activer_relai_messages(self):
         self.__relai_messages_actif = True
 
     def take_lectures_pending(self):
-        if len(self.__lectures_pending) > 0:
+        if self.__lectures_pending:
             lectures = self.__lectures_pending
-            self.__lectures_pending = dict()
+            self.__lectures_pending = None
             return lectures
 
     async def recevoir_lecture(self, message: MessageWrapper):
@@ -125,6 +153,8 @@ class CorrelationAppareil(CorrelationHook):
                         continue  # Mauvais nom, pas un senseur externe
 
                     if uuid_appareil == uuid_appareil_externe:
+                        if self.__lectures_pending is None:
+                            self.__lectures_pending = dict()
                         try:
                             lectures = self.__lectures_pending[uuid_appareil]
                         except KeyError:
@@ -132,16 +162,15 @@ class CorrelationAppareil(CorrelationHook):
                             self.__lectures_pending[uuid_appareil] = lectures
                         try:
                             lectures[nom_senseur] = parsed["senseurs"][nom_senseur]
-                            self.__logger.debug(
-                                "Lectures pending appareil %s : %s"
-                                % (self.uuid_appareil, lectures)
+                            self._logger.debug(
+                                "Lectures pending appareil %s : %s", self.uuid_appareil, lectures
                             )
                         except KeyError:
                             pass  # Senseur sans lecture/absent
 
                 if (
                     self.__emettre_lectures is True
-                    and len(self.__lectures_pending) > 0
+                    and self.__lectures_pending
                     and self.is_message_pending is False
                 ):
                     lectures_pending = self.take_lectures_pending()
@@ -154,9 +183,8 @@ class CorrelationAppareil(CorrelationHook):
                     await self.put_message(message)
 
     def set_senseurs_externes(self, senseurs: Optional[list]):
-        self.__logger.debug(
-            "Enregistrement senseurs externes pour appareil %s : %s"
-            % (self.uuid_appareil, senseurs)
+        self._logger.debug(
+            "Enregistrement senseurs externes pour appareil %s : %s", self.uuid_appareil, senseurs
         )
         self.__senseurs_externes = senseurs
 
@@ -164,10 +192,6 @@ class CorrelationAppareil(CorrelationHook):
     def chiffrage_disponible(self):
         return self.__cle_chiffrage is not None
 
-    @property
-    def relai_messages_disponible(self):
-        return self.__relai_messages_actif
-
     @property
     def cle_dechiffrage(self):
         return self.__cle_chiffrage
@@ -178,6 +202,9 @@ class CorrelationAppareil(CorrelationHook):
 
 
 class CorrelationRequeteCertificat(CorrelationHook):
+
+    __slots__ = ('__cle_publique', '__message')
+
     def __init__(self, cle_publique: str, message: dict):
         super().__init__()
         self.__cle_publique = cle_publique
@@ -195,19 +222,56 @@ class AppareilMessageHandler:
         self.__appareils: dict[str, CorrelationAppareil] = dict()
         self.__requetes_certificat: dict[str, CorrelationRequeteCertificat] = dict()
 
+        configuration = context.configuration
+        self.__session_tickets = SessionTicketCache(
+            path.join(configuration.data_path, 'session_tickets.json'), configuration.key_pem_path,
+            configuration.session_ticket_max, configuration.session_ticket_duree)
+        self.__presence = PresenceAggregator(context, configuration.presence_batch_window)
+        self.__configuration_cache = ConfigurationCache(context.metrics, configuration.configuration_cache_duree)
+        self.__lectures_bindings = LecturesBindings(context, configuration.bindings_debounce)
+        self.__stopped = asyncio.Event()
+
     async def run(self):
+        try:
+            makedirs(self.__context.configuration.data_path, exist_ok=True)
+            self.__session_tickets.load()
+        except OSError:
+            self.__logger.exception("Error loading session tickets")
+
         async with TaskGroup() as group:
             group.create_task(self.__maintenance_thread())
+            group.create_task(self.__presence.run())
+            group.create_task(self.__lectures_bindings.run())
+            group.create_task(self.__stop_thread())
 
     async def __stop_thread(self):
-        await self.__context.wait()
+        await self.__context.shutting_down.wait()
 
         # Cleanup before stopping
-        await self.__on_stop()
+        try:
+            await self.__on_stop()
+        finally:
+            self.__stopped.set()
 
     async def __on_stop(self):
         """Attempt emitting a disconnect message for all devices."""
-        pass  # TODO
+        try:
+            self.__session_tickets.save()
+        except OSError:
+            self.__logger.exception("Error saving session tickets")
+
+        try:
+            await self.__presence.publish_snapshot(deconnecte=True, timeout=0.5)
+        except asyncio.TimeoutError:
+            self.__logger.info("Timeout sending device disconnect snapshot")
+        except Exception:
+            self.__logger.exception("Error sending device disconnect snapshot")
+
+    async def wait_stopped(self, timeout: float):
+        try:
+            await asyncio.wait_for(self.__stopped.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
     async def __maintenance_thread(self):
         while self.__context.stopping is False:
@@ -219,15 +283,24 @@ class AppareilMessageHandler:
                 self.__logger.exception("__maintenance_thread Unhandled exception")
             await self.__context.wait(120)
 
+    @property
+    def lectures_bindings(self) -> LecturesBindings:
+        return self.__lectures_bindings
+
     async def set_device_correlation(self, correlation: CorrelationAppareil):
         fingerprint = correlation.fingerprint
+        existing = self.__appareils.get(fingerprint)
         self.__appareils[fingerprint] = correlation
+        if existing is not None:
+            self.__lectures_bindings.remove(existing.user_id)
+        self.__lectures_bindings.add(correlation.user_id)
 
     def remove_device(self, fingerprint: str):
         try:
             existing = self.__appareils[fingerprint]
             del self.__appareils[fingerprint]
             existing.clear_chiffrage()
+            self.__lectures_bindings.remove(existing.user_id)
         except KeyError:
             pass
 
@@ -260,6 +333,7 @@ class AppareilMessageHandler:
             correlation.set_senseurs_externes(senseurs)
 
         self.__appareils[fingerprint] = correlation
+        self.__lectures_bindings.add(correlation.user_id)
 
         return correlation
 
@@ -270,8 +344,9 @@ class AppareilMessageHandler:
                 retirer.append(fingerprint)
 
         for fingerprint in retirer:
-            self.__logger.debug("Retrait appareil expire cle %s" % fingerprint)
-            del self.__appareils[fingerprint]
+            self.__logger.debug("Retrait appareil expire cle %s", fingerprint)
+            appareil = self.__appareils.pop(fingerprint)
+            self.__lectures_bindings.remove(appareil.user_id)
 
         retirer = list()
         for cle_publique, requete in self.__requetes_certificat.items():
@@ -279,9 +354,59 @@ class AppareilMessageHandler:
                 retirer.append(cle_publique)
 
         for cle_publique in retirer:
-            self.__logger.debug("Retrait requete expiree cle %s" % cle_publique)
+            self.__logger.debug("Retrait requete expiree cle %s", cle_publique)
             del self.__requetes_certificat[cle_publique]
 
+        self.__configuration_cache.purge()
+
+        self.__session_tickets.purge()
+        try:
+            self.__session_tickets.save()
+        except OSError:
+            self.__logger.exception("Error saving session tickets")
+
+    def issue_session_ticket(self, correlation: CorrelationAppareil) -> Optional[SessionTicket]:
+        cle = correlation.cle_dechiffrage
+        if cle is None:
+            return None
+        return self.__session_tickets.issue(correlation.fingerprint, cle)
+
+    def confirm_session_ticket(self, fingerprint: str):
+        self.__session_tickets.confirm(fingerprint)
+
+    def revoke_session_ticket(self, fingerprint: str):
+        self.__session_tickets.revoke(fingerprint)
+
+    async def presence_connect(self, user_id: str, uuid_appareil: str, version: Optional[str]):
+        await self.__presence.connect(user_id, uuid_appareil, version)
+
+    async def presence_disconnect(self, user_id: str, uuid_appareil: str):
+        await self.__presence.disconnect(user_id, uuid_appareil)
+
+    def resume_session(self, ticket_id: str, fingerprint: str) -> Optional[SessionTicket]:
+        return self.__session_tickets.resume(ticket_id, fingerprint)
+
+    async def requete_appareil(self, enveloppe: EnveloppeCertificat, requete: dict) -> MessageWrapper:
+        """
+        Forwards a signed device request to MQ. Configuration requests are served from the cache when possible.
+        :return: Response message, shared with other devices when cached. The parsed content must not be modified.
+        """
+        routage = requete['routage']
+        domaine = routage['domaine']
+        action = routage['action']
+        partition = routage.get('partition')
+
+        async def emettre():
+            producer = await self.__context.get_producer()
+            with Tracing.span('mq.request', Tracing.KIND_CLIENT, destination='%s/%s' % (domaine, action)):
+                # Requete signee par l'appareil, le traceparent va dans les attachements (non signes)
+                return await producer.request(Tracing.attacher_traceparent(requete), domaine, action,
+                                              Constantes.SECURITE_PRIVE, partition, noformat=True)
+
+        with Tracing.span('configuration_cache', action=action):
+            return await self.__configuration_cache.get(
+                enveloppe.get_user_id, enveloppe.subject_common_name, action, emettre)
+
     async def recevoir_message_mq(self, message: MessageWrapper):
         # Tenter match par fingerprint certificat (pubkey)
         try:
@@ -360,11 +485,8 @@ class AppareilMessageHandler:
                 pass
 
             return
-        elif action in [
-            "evenementMajDisplays",
-            "evenementMajProgrammes",
-            "majConfigurationAppareil",
-        ]:
+        elif action in ACTIONS_INVALIDATION:
+            self.__configuration_cache.invalidate(user_id, message.parsed.get("uuid_appareil"))
             try:
                 uuid_appareil = message.parsed["uuid_appareil"]
                 for app in self.__appareils.values():
@@ -414,12 +536,16 @@ class AppareilMessageHandler:
             "csr": contenu["csr"],
         }
         try:
-            reponse = await producer.command(
-                commande,
-                "SenseursPassifs",
-                "inscrireAppareil",
-                Constantes.SECURITE_PRIVE,
-            )
+            with Tracing.span('mq.command', Tracing.KIND_CLIENT, destination='SenseursPassifs/inscrireAppareil'):
+                commande = Tracing.signer_avec_traceparent(
+                    self.__context.formatteur, Constantes.KIND_COMMANDE, commande, "SenseursPassifs", "inscrireAppareil")
+                reponse = await producer.command(
+                    commande,
+                    "SenseursPassifs",
+                    "inscrireAppareil",
+                    Constantes.SECURITE_PRIVE,
+                    noformat=True,
+                )
             reponse_parsed = reponse.parsed
             if reponse_parsed.get("certificat") or reponse_parsed.get("challenge"):
                 return reponse
@@ -10,6 +10,7 @@ from millegrilles_messages.bus.PikaQueue import MilleGrillesPikaQueueConsumer, R
 from millegrilles_messages.messages import Constantes
 from millegrilles_messages.bus.BusContext import ForceTerminateExecution, MilleGrillesBusContext
 from millegrilles_messages.messages.MessagesModule import MessageWrapper
+from senseurspassifs_relai_web.Bindings import LecturesBindings, ROUTING_KEY_LECTURE_CONFIRMEE_TOUS
 from senseurspassifs_relai_web.SenseurspassifsRelaiWebManager import SenseurspassifsRelaiWebManager
 
 
@@ -49,7 +50,7 @@ class MgbusHandler:
         channel_command = create_command_q_channel(context, self.on_command_message)
         await self.__manager.context.bus_connector.add_channel(channel_command)
 
-        channel_events = create_event_q_channel(context, self.on_event_message)
+        channel_events = create_event_q_channel(context, self.on_event_message, self.__manager.lectures_bindings)
         await self.__manager.context.bus_connector.add_channel(channel_events)
 
         # Start mgbus connector thread
@@ -107,14 +108,18 @@ def create_command_q_channel(context: MilleGrillesBusContext,
     return q_channel
 
 def create_event_q_channel(context: MilleGrillesBusContext,
-                          on_message: Callable[[MessageWrapper], Coroutine[Any, Any, None]]) -> MilleGrillesPikaChannel:
+                          on_message: Callable[[MessageWrapper], Coroutine[Any, Any, None]],
+                          lectures_bindings: Optional[LecturesBindings] = None) -> MilleGrillesPikaChannel:
     q_channel = MilleGrillesPikaChannel(context, prefetch_count=20)
     q_instance = MilleGrillesPikaQueueConsumer(context, on_message, None, exclusive=True,
                                                 arguments={'x-message-ttl': 30_000})
 
     q_instance.add_routing_key(RoutingKey(Constantes.SECURITE_PRIVE, 'evenement.SenseursPassifs.*.evenementMajDisplays'))
     q_instance.add_routing_key(RoutingKey(Constantes.SECURITE_PRIVE, 'evenement.SenseursPassifs.*.evenementMajProgrammes'))
-    q_instance.add_routing_key(RoutingKey(Constantes.SECURITE_PRIVE, 'evenement.SenseursPassifs.*.lectureConfirmee'))
+    # Lectures de tous les usagers, retire par lectures_bindings une fois les bindings par usager en place
+    q_instance.add_routing_key(RoutingKey(Constantes.SECURITE_PRIVE, ROUTING_KEY_LECTURE_CONFIRMEE_TOUS))
+    if lectures_bindings is not None:
+        lectures_bindings.attach(q_instance)
     q_instance.add_routing_key(RoutingKey(Constantes.SECURITE_PRIVE, 'evenement.SenseursPassifs.*.majConfigurationAppareil'))
     q_instance.add_routing_key(RoutingKey(Constantes.SECURITE_PUBLIC, 'evenement.CoreTopologie.fichePublique'))
 
@@ -0,0 +1,157 @@
+# Agregation des evenements de presence des appareils
+import asyncio
+import logging
+
+from typing import Optional
+
+from millegrilles_messages.messages import Constantes
+from senseurspassifs_relai_web.Context import SenseurspassifsRelaiWebContext
+
+DOMAINE_RELAI = 'senseurspassifs_relai'
+ACTION_PRESENCE_APPAREIL = 'presenceAppareil'
+ACTION_PRESENCE_APPAREILS = 'presenceAppareils'
+
+
+class _Presence:
+
+    __slots__ = ('version', 'connexions')
+
+    def __init__(self, version: Optional[str]):
+        self.version = version
+        self.connexions = 0
+
+
+class PresenceAggregator:
+    """
+    Collects device connects/disconnects over a short window and publishes them as a single presenceAppareils
+    event. Also publishes a full snapshot of connected devices on startup and shutdown.
+    With a window of 0 (default), keeps one presenceAppareil event per device: no startup snapshot, and the
+    shutdown snapshot is sent as one disconnect event per device. presenceAppareils requires a backend that
+    handles it.
+    """
+
+    def __init__(self, context: SenseurspassifsRelaiWebContext, window: float):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__context = context
+        self.__window = window
+
+        self.__connectes: dict[tuple[str, str], _Presence] = dict()  # (user_id, uuid_appareil)
+        self.__pending: dict[tuple[str, str], dict] = dict()
+
+        context.metrics.register_gauge('presence.connected', lambda: len(self.__connectes))
+
+    async def run(self):
+        if self.__window <= 0:
+            return  # Evenements emis individuellement
+
+        # Snapshot initial, permet au domaine de retirer les appareils de la session precedente du relai
+        while self.__context.stopping is False:
+            try:
+                await self.publish_snapshot(timeout=5)
+                break
+            except asyncio.TimeoutError:
+                await self.__context.wait(5)
+
+        while self.__context.stopping is False:
+            await self.__context.wait(self.__window)  # Accumuler les changements
+            if len(self.__pending) == 0:
+                continue
+            try:
+                await self.flush()
+            except asyncio.CancelledError as e:
+                raise e
+            except Exception:
+                self.__logger.exception("Error publishing device presence")
+
+    async def connect(self, user_id: str, uuid_appareil: str, version: Optional[str]):
+        cle = (user_id, uuid_appareil)
+        try:
+            presence = self.__connectes[cle]
+        except KeyError:
+            presence = _Presence(version)
+            self.__connectes[cle] = presence
+        presence.connexions += 1
+        presence.version = version or presence.version
+
+        await self.__ajouter({'uuid_appareil': uuid_appareil, 'user_id': user_id, 'version': presence.version})
+
+    async def disconnect(self, user_id: str, uuid_appareil: str):
+        cle = (user_id, uuid_appareil)
+        try:
+            presence = self.__connectes[cle]
+            presence.connexions -= 1
+            if presence.connexions > 0:
+                return  # Une autre connexion est encore active pour cet appareil
+            del self.__connectes[cle]
+        except KeyError:
+            pass
+
+        await self.__ajouter({'uuid_appareil': uuid_appareil, 'user_id': user_id, 'deconnecte': True})
+
+    async def __ajouter(self, evenement: dict):
+        if self.__window <= 0:
+            await self.__emettre_appareil(evenement)
+            return
+
+        # Le dernier etat de l'appareil dans la fenetre remplace le precedent
+        self.__pending[(evenement['user_id'], evenement['uuid_appareil'])] = evenement
+        self.__context.metrics.increment('presence.changes')
+
+    async def flush(self):
+        if len(self.__pending) == 0:
+            return
+
+        appareils = list(self.__pending.values())
+        self.__pending.clear()
+
+        try:
+            await self.__emettre(appareils, snapshot=False)
+        except asyncio.TimeoutError:
+            # Remettre les changements non transmis (sans ecraser les plus recents)
+            for evenement in appareils:
+                self.__pending.setdefault((evenement['user_id'], evenement['uuid_appareil']), evenement)
+            raise
+
+    async def publish_snapshot(self, deconnecte=False, timeout: Optional[float] = None):
+        """
+        Publishes all devices currently connected to this relay. Devices absent from a snapshot are not
+        connected to this relay, pending changes are replaced by the snapshot.
+        :param deconnecte: If True, all devices are reported as disconnected (relay shutdown).
+        :param timeout: Max wait for the MQ producer
+        """
+        appareils = list()
+        for (user_id, uuid_appareil), presence in self.__connectes.items():
+            if deconnecte:
+                appareils.append({'uuid_appareil': uuid_appareil, 'user_id': user_id, 'deconnecte': True})
+            else:
+                appareils.append({'uuid_appareil': uuid_appareil, 'user_id': user_id, 'version': presence.version})
+
+        self.__pending.clear()
+
+        if self.__window <= 0:
+            # Un evenement presenceAppareil par appareil
+            for evenement in appareils:
+                await self.__emettre_appareil(evenement, timeout)
+            return
+
+        await self.__emettre(appareils, snapshot=True, timeout=timeout)
+
+    async def __emettre_appareil(self, evenement: dict, timeout: Optional[float] = None):
+        if timeout is not None:
+            producer = await asyncio.wait_for(self.__context.get_producer(), timeout)
+        else:
+            producer = await self.__context.get_producer()
+
+        await producer.event(evenement, domain=DOMAINE_RELAI, action=ACTION_PRESENCE_APPAREIL,
+                             exchange=Constantes.SECURITE_PRIVE)
+
+    async def __emettre(self, appareils: list, snapshot: bool, timeout: Optional[float] = None):
+        if timeout is not None:
+            producer = await asyncio.wait_for(self.__context.get_producer(), timeout)
+        else:
+            producer = await self.__context.get_producer()
+
+        evenement = {'snapshot': snapshot, 'appareils': appareils}
+        await producer.event(evenement, domain=DOMAINE_RELAI, action=ACTION_PRESENCE_APPAREILS,
+                             exchange=Constantes.SECURITE_PRIVE)
+        self.__context.metrics.increment('presence.events')
@@ -8,9 +8,11 @@ from millegrilles_messages.messages import Constantes
 from millegrilles_messages.bus.BusContext import ForceTerminateExecution
 from millegrilles_messages.messages.EnveloppeCertificat import EnveloppeCertificat
 from millegrilles_messages.messages.MessagesModule import MessageWrapper
+from senseurspassifs_relai_web.Bindings import LecturesBindings
 from senseurspassifs_relai_web.Context import SenseurspassifsRelaiWebContext
 from senseurspassifs_relai_web.MessagesHandler import AppareilMessageHandler, CorrelationAppareil
 from senseurspassifs_relai_web.ReadingsFormatter import ReadingsSender
+from senseurspassifs_relai_web.SessionTickets import SessionTicket
 
 
 class SenseurspassifsRelaiWebManager:
@@ -40,6 +42,7 @@ class SenseurspassifsRelaiWebManager:
     async def __stop_thread(self):
         try:
             await self.__context.shutting_down.wait()
+            await self.__device_message_handler.wait_stopped(2)  # Snapshot de deconnexion des appareils
             self.__logger.info("Beginning shutdown, sending disconnect relay message")
             producer = await asyncio.wait_for(self.__context.get_producer(), 0.1)
             await producer.command({}, 'SenseursPassifs', 'disconnectRelay', exchange=Constantes.SECURITE_PRIVE, timeout=0.5)
@@ -98,5 +101,30 @@ class SenseurspassifsRelaiWebManager:
                                         emettre_lectures=True) -> CorrelationAppareil:
         return await self.__device_message_handler.create_device_correlation(certificat, senseurs, emettre_lectures)
 
+    @property
+    def lectures_bindings(self) -> LecturesBindings:
+        return self.__device_message_handler.lectures_bindings
+
     def remove_device_correlation(self, fingerprint: str):
         self.__device_message_handler.remove_device(fingerprint)
+
+    def issue_session_ticket(self, correlation: CorrelationAppareil) -> Optional[SessionTicket]:
+        return self.__device_message_handler.issue_session_ticket(correlation)
+
+    def confirm_session_ticket(self, fingerprint: str):
+        self.__device_message_handler.confirm_session_ticket(fingerprint)
+
+    def revoke_session_ticket(self, fingerprint: str):
+        self.__device_message_handler.revoke_session_ticket(fingerprint)
+
+    async def presence_connect(self, user_id: str, uuid_appareil: str, version: Optional[str]):
+        await self.__device_message_handler.presence_connect(user_id, uuid_appareil, version)
+
+    async def presence_disconnect(self, user_id: str, uuid_appareil: str):
+        await self.__device_message_handler.presence_disconnect(user_id, uuid_appareil)
+
+    def resume_session(self, ticket_id: str, fingerprint: str) -> Optional[SessionTicket]:
+        return self.__device_message_handler.resume_session(ticket_id, fingerprint)
+
+    async def requete_appareil(self, enveloppe: EnveloppeCertificat, requete: dict) -> MessageWrapper:
+        return await self.__device_message_handler.requete_appareil(enveloppe, requete)
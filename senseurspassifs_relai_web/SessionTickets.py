@@ -0,0 +1,167 @@
+# Tickets de reprise de session chiffree (evite echangerClesChiffrage/confirmerRelai a la reconnexion)
+import binascii
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+
+from collections import OrderedDict
+from typing import Optional
+
+from senseurspassifs_relai_web.Chiffrage import chiffrer_message_chacha20poly1305, dechiffrer_message_chacha20poly1305
+
+LOGGER = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+class SessionTicket:
+
+    __slots__ = ('ticket_id', 'fingerprint', 'cle', 'relai_confirme', 'expiration')
+
+    def __init__(self, ticket_id: str, fingerprint: str, cle: bytes, relai_confirme: bool, expiration: float):
+        self.ticket_id = ticket_id
+        self.fingerprint = fingerprint
+        self.cle = cle
+        self.relai_confirme = relai_confirme
+        self.expiration = expiration
+
+    @property
+    def expire(self) -> bool:
+        return self.expiration < time.time()
+
+
+class SessionTicketCache:
+    """
+    Bounded cache of (fingerprint, shared key, relay confirmed) for encrypted device sessions.
+    The cache is persisted encrypted with a key derived from the relay private key.
+    """
+
+    def __init__(self, path_fichier: Optional[str], path_cle: Optional[str], max_tickets: int, duree: int):
+        self.__path_fichier = path_fichier
+        self.__path_cle = path_cle
+        self.__max_tickets = max_tickets
+        self.__duree = duree
+        self.__tickets: OrderedDict[str, SessionTicket] = OrderedDict()
+        self.__fingerprints: dict[str, str] = dict()  # fingerprint: ticket_id
+        self.__modifie = False
+
+    def __len__(self):
+        return len(self.__tickets)
+
+    def issue(self, fingerprint: str, cle: bytes, relai_confirme=False) -> SessionTicket:
+        """
+        Issues a new ticket for a device, replacing any previous ticket for the same certificate.
+        """
+        self.revoke(fingerprint)
+
+        ticket_id = secrets.token_urlsafe(18)
+        ticket = SessionTicket(ticket_id, fingerprint, cle, relai_confirme, time.time() + self.__duree)
+        self.__tickets[ticket_id] = ticket
+        self.__fingerprints[fingerprint] = ticket_id
+
+        while len(self.__tickets) > self.__max_tickets:
+            _, plus_vieux = self.__tickets.popitem(last=False)
+            self.__fingerprints.pop(plus_vieux.fingerprint, None)
+
+        self.__modifie = True
+        return ticket
+
+    def confirm(self, fingerprint: str):
+        try:
+            ticket = self.__tickets[self.__fingerprints[fingerprint]]
+        except KeyError:
+            return
+        ticket.relai_confirme = True
+        self.__modifie = True
+
+    def resume(self, ticket_id: str, fingerprint: str) -> Optional[SessionTicket]:
+        """
+        :return: The ticket if it exists, is not expired and belongs to the certificate fingerprint.
+        """
+        try:
+            ticket = self.__tickets[ticket_id]
+        except KeyError:
+            return None
+
+        if ticket.fingerprint != fingerprint:
+            return None
+
+        if ticket.expire:
+            self.revoke(fingerprint)
+            return None
+
+        self.__tickets.move_to_end(ticket_id)
+        return ticket
+
+    def revoke(self, fingerprint: str):
+        try:
+            ticket_id = self.__fingerprints.pop(fingerprint)
+        except KeyError:
+            return
+        self.__tickets.pop(ticket_id, None)
+        self.__modifie = True
+
+    def purge(self):
+        for ticket in [t for t in self.__tickets.values() if t.expire]:
+            self.revoke(ticket.fingerprint)
+
+    def __cle_stockage(self) -> Optional[bytes]:
+        if self.__path_cle is None:
+            return None
+        with open(self.__path_cle, 'rb') as fichier:
+            return hashlib.blake2b(fichier.read(), digest_size=32, person=b'sp_tickets').digest()
+
+    def load(self):
+        if self.__path_fichier is None:
+            return
+
+        try:
+            cle = self.__cle_stockage()
+            if cle is None:
+                return
+            with open(self.__path_fichier, 'r') as fichier:
+                contenu = json.load(fichier)
+            if contenu.get('version') != FORMAT_VERSION:
+                return
+            tickets = json.loads(dechiffrer_message_chacha20poly1305(
+                cle, contenu['nonce'], contenu['tag'], contenu['ciphertext']))
+        except FileNotFoundError:
+            return
+        except Exception:
+            # Fichier corrompu ou cle du relai renouvelee, les appareils refont l'echange de cles
+            LOGGER.warning("Session tickets file %s unreadable, ignoring", self.__path_fichier)
+            return
+
+        maintenant = time.time()
+        for ticket_id, fingerprint, cle_hex, relai_confirme, expiration in tickets:
+            if expiration > maintenant:
+                ticket = SessionTicket(ticket_id, fingerprint, binascii.unhexlify(cle_hex), relai_confirme, expiration)
+                self.__tickets[ticket_id] = ticket
+                self.__fingerprints[fingerprint] = ticket_id
+
+        LOGGER.info("Loaded %d session tickets", len(self.__tickets))
+
+    def save(self, force=False):
+        if self.__path_fichier is None or (self.__modifie is False and force is False):
+            return
+
+        cle = self.__cle_stockage()
+        if cle is None:
+            return
+
+        tickets = [
+            [t.ticket_id, t.fingerprint, binascii.hexlify(t.cle).decode('utf-8'), t.relai_confirme, t.expiration]
+            for t in self.__tickets.values() if t.expire is False
+        ]
+        contenu = chiffrer_message_chacha20poly1305(cle, json.dumps(tickets))
+        contenu['version'] = FORMAT_VERSION
+
+        path_tmp = self.__path_fichier + '.tmp'
+        fd = os.open(path_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as fichier:
+            json.dump(contenu, fichier)
+        os.replace(path_tmp, self.__path_fichier)
+        self.__modifie = False
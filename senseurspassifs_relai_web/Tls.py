@@ -0,0 +1,160 @@
+# Contexte TLS serveur du relai (reprise de session par tickets, rotation des cles de tickets)
+import asyncio
+import logging
+import ssl
+
+from typing import Awaitable, Callable, Optional
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+STATS_HANDSHAKES = 'accept_good'
+STATS_RESUMED = 'hits'
+
+
+class ServerTlsContext:
+    """
+    Server SSLContext shared by the HTTP and WebSocket listeners.
+
+    The initial context is the bus ssl_context (fallback), as used by the listeners before session tickets.
+
+    OpenSSL keeps the session ticket keys for the lifetime of an SSL_CTX and python has no API to set them.
+    Keys are rotated by building a new SSLContext: listeners are handed over to the new context (reuse_port)
+    and devices holding a ticket from the previous context do one full handshake. The new context copies the
+    protocol, verification settings and CA certificates of the bus ssl_context and reloads CERT_PEM/KEY_PEM.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, cert_path: Optional[str], key_path: Optional[str],
+                 num_tickets: int, rotation: float, fallback: Optional[Callable[[], ssl.SSLContext]] = None):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__metrics = metrics
+        self.__cert_path = cert_path
+        self.__key_path = key_path
+        self.__num_tickets = num_tickets
+        self.__rotation = rotation
+        self.__fallback = fallback
+
+        self.__current: Optional[ssl.SSLContext] = None
+        self.__generation = 0
+        self.__rotated = asyncio.Condition()
+        self.__stats_retired = {STATS_HANDSHAKES: 0, STATS_RESUMED: 0}
+
+        metrics.register_gauge('tls.handshakes', lambda: self.__stat(STATS_HANDSHAKES))
+        metrics.register_gauge('tls.resumed', lambda: self.__stat(STATS_RESUMED))
+        metrics.register_gauge('tls.resumption_ratio', self.__resumption_ratio)
+
+    @property
+    def rotation_enabled(self) -> bool:
+        return self.__rotation > 0 and self.__cert_path is not None and self.__key_path is not None
+
+    @property
+    def generation(self) -> int:
+        return self.__generation
+
+    @property
+    def current(self) -> Optional[ssl.SSLContext]:
+        if self.__current is None:
+            if self.__fallback is not None:
+                self.__current = self.__fallback()
+                self.__configurer_tickets(self.__current)
+            elif self.__cert_path is not None and self.__key_path is not None:
+                self.__current = self.__creer()
+        return self.__current
+
+    async def run(self, stop_event: asyncio.Event):
+        if self.rotation_enabled is False:
+            return
+
+        while stop_event.is_set() is False:
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.__rotation)
+                return  # Stopping
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.rotate()
+            except (OSError, ssl.SSLError):
+                self.__logger.exception("Error rotating TLS context, keeping current session ticket keys")
+
+    async def rotate(self):
+        nouveau = self.__creer()  # Recharge aussi le certificat (renouvellement)
+        ancien = self.__current
+        if ancien is not None:
+            stats = ancien.session_stats()
+            for key in self.__stats_retired.keys():
+                self.__stats_retired[key] += stats.get(key, 0)
+
+        async with self.__rotated:
+            self.__current = nouveau
+            self.__generation += 1
+            self.__rotated.notify_all()
+
+        self.__metrics.increment('tls.rotations')
+        self.__logger.info("TLS context rotated (new session ticket keys)")
+
+    async def wait_rotation(self, generation: int):
+        async with self.__rotated:
+            await self.__rotated.wait_for(lambda: self.__generation != generation)
+
+    async def wait_rotation_or_stop(self, generation: int, stop: Awaitable) -> bool:
+        """
+        :return: True when the context was rotated after generation, False when stop completed first.
+        """
+        rotation = asyncio.create_task(self.wait_rotation(generation))
+        arret = asyncio.ensure_future(stop)
+        try:
+            done, _ = await asyncio.wait([rotation, arret], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            rotation.cancel()
+            arret.cancel()
+        return arret not in done
+
+    def __creer(self) -> ssl.SSLContext:
+        modele = self.__fallback() if self.__fallback is not None else None
+        if modele is not None:
+            context = deriver_context(modele)
+        else:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.__cert_path, self.__key_path)
+        self.__configurer_tickets(context)
+        return context
+
+    def __configurer_tickets(self, context: Optional[ssl.SSLContext]):
+        if context is None:
+            return
+        context.options &= ~ssl.OP_NO_TICKET
+        try:
+            context.num_tickets = self.__num_tickets  # TLS 1.3
+        except (AttributeError, ValueError):
+            pass  # Client context ou version OpenSSL sans support
+
+    def __stat(self, name: str) -> int:
+        valeur = self.__stats_retired[name]
+        if self.__current is not None:
+            valeur += self.__current.session_stats().get(name, 0)
+        return valeur
+
+    def __resumption_ratio(self) -> Optional[float]:
+        handshakes = self.__stat(STATS_HANDSHAKES)
+        if handshakes == 0:
+            return None
+        return self.__stat(STATS_RESUMED) / handshakes
+
+
+def deriver_context(modele: ssl.SSLContext) -> ssl.SSLContext:
+    """
+    New SSLContext (new session ticket keys) with the protocol, options, verification settings and CA
+    certificates of modele. The certificate chain is not copied.
+    """
+    context = ssl.SSLContext(modele.protocol)
+    context.check_hostname = False  # Avant verify_mode (CERT_NONE refuse avec check_hostname)
+    context.options = modele.options
+    context.verify_mode = modele.verify_mode
+    context.verify_flags = modele.verify_flags
+    context.check_hostname = modele.check_hostname
+    context.minimum_version = modele.minimum_version
+    context.maximum_version = modele.maximum_version
+    context.set_ciphers(':'.join(c['name'] for c in modele.get_ciphers()))
+    for ca in modele.get_ca_certs(binary_form=True):
+        context.load_verify_locations(cadata=ca)
+    return context
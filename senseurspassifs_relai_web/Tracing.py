@@ -0,0 +1,241 @@
+# Traces des messages d'appareils (spans), export fichier au format OTLP/JSON
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+ATTACHEMENT_TRACEPARENT = 'traceparent'
+
+INTERVALLE_EXPORT = 5  # Secondes
+SPANS_MAX = 10_000  # Spans en attente d'export, les plus vieux sont perdus
+TAILLE_FICHIER_MAX = 16 * 1024 * 1024  # Rotation vers spans.jsonl.1
+
+_span_courant: ContextVar[Optional['Span']] = ContextVar('span_courant', default=None)
+
+
+class Span:
+    """
+    Timed stage of a traced device message. Used as a context manager, becomes the parent of the spans opened
+    inside it (contextvars, follows awaits and child tasks).
+    """
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'debut', 'fin', 'attributs',
+                 'statut', 'token')
+
+    def __init__(self, tracer: 'Tracer', trace_id: str, parent_id: Optional[str], name: str, kind: int,
+                 attributs: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributs = attributs
+        self.debut = 0
+        self.fin = 0
+        self.statut = STATUS_OK
+        self.token = None
+
+    def __enter__(self):
+        self.debut = time.time_ns()
+        self.token = _span_courant.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fin = time.time_ns()
+        _span_courant.reset(self.token)
+        if exc_type is not None:
+            self.statut = STATUS_ERROR
+            self.attributs['exception.type'] = exc_type.__name__
+        self.tracer.terminer(self)
+        return False
+
+    def set_attribute(self, key: str, value):
+        self.attributs[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """ W3C trace context header """
+        return '00-%s-%s-01' % (self.trace_id, self.span_id)
+
+
+class _SpanInactif:
+    """ Message not traced (sampling), spans opened inside are no-ops. """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    @property
+    def traceparent(self) -> Optional[str]:
+        return None
+
+
+SPAN_INACTIF = _SpanInactif()
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributs):
+    """
+    Child span of the current span, no-op when the current message is not traced.
+    """
+    parent = _span_courant.get()
+    if parent is None:
+        return SPAN_INACTIF
+    return Span(parent.tracer, parent.trace_id, parent.span_id, name, kind, attributs)
+
+
+def traceparent() -> Optional[str]:
+    courant = _span_courant.get()
+    if courant is None:
+        return None
+    return courant.traceparent
+
+
+def signer_avec_traceparent(formatteur, kind: int, contenu: dict, domaine: str, action: str) -> dict:
+    """
+    Signs a message built by the relay and adds the traceparent to its attachements, like device messages: the
+    signed content is not changed. Send with noformat=True.
+    """
+    with span('sign'):
+        message, _ = formatteur.signer_message(kind, contenu, domaine=domaine, action=action)
+    return attacher_traceparent(message)
+
+
+def attacher_traceparent(message: dict) -> dict:
+    """
+    Adds the traceparent to the attachements of a message already signed (attachements are not signed).
+    :return: Copy of the message when traced, the message otherwise.
+    """
+    valeur = traceparent()
+    if valeur is None:
+        return message
+    message = dict(message)
+    attachements = dict(message.get('attachements') or dict())
+    attachements[ATTACHEMENT_TRACEPARENT] = valeur
+    message['attachements'] = attachements
+    return message
+
+
+class Tracer:
+    """
+    Samples inbound device messages (ratio) and exports their spans to a jsonl file, one OTLP/JSON
+    ExportTraceServiceRequest per line (same format as the OpenTelemetry collector file exporter).
+    """
+
+    def __init__(self, metrics: MetricsRegistry, path_fichier: str, ratio: float,
+                 service: str = 'senseurspassifs_relai'):
+        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.__metrics = metrics
+        self.__path_fichier = path_fichier
+        self.__ratio = ratio
+        self.__service = service
+        self.__spans: deque[Span] = deque(maxlen=SPANS_MAX)
+
+    @property
+    def enabled(self) -> bool:
+        return self.__ratio > 0
+
+    def trace(self, name: str, kind: int = KIND_SERVER, **attributs):
+        """
+        Span of an inbound message. Starts a new trace when sampled, nested in the current trace otherwise.
+        """
+        parent = _span_courant.get()
+        if parent is not None:
+            return Span(self, parent.trace_id, parent.span_id, name, kind, attributs)
+        if self.__ratio <= 0 or random.random() >= self.__ratio:
+            return SPAN_INACTIF
+        return Span(self, '%032x' % random.getrandbits(128), None, name, kind, attributs)
+
+    def terminer(self, span_termine: Span):
+        if len(self.__spans) == SPANS_MAX:
+            self.__metrics.increment('tracing.spans_dropped')
+        self.__spans.append(span_termine)
+
+    async def run(self, stop_event: asyncio.Event):
+        if self.enabled is False:
+            return
+
+        while stop_event.is_set() is False:
+            try:
+                await asyncio.wait_for(stop_event.wait(), INTERVALLE_EXPORT)
+            except asyncio.TimeoutError:
+                pass
+            await self.exporter()
+
+    async def exporter(self):
+        if len(self.__spans) == 0:
+            return
+        spans = list(self.__spans)
+        self.__spans.clear()
+        try:
+            await asyncio.to_thread(self.__ecrire, spans)
+            self.__metrics.increment('tracing.spans_exported', len(spans))
+        except OSError as e:
+            self.__logger.warning("Error exporting %d spans to %s : %s", len(spans), self.__path_fichier, e)
+
+    def __ecrire(self, spans: list[Span]):
+        requete = {'resourceSpans': [{
+            'resource': {'attributes': [_attribut('service.name', self.__service)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [_exporter_span(s) for s in spans],
+            }],
+        }]}
+        ligne = json.dumps(requete, separators=(',', ':')) + '\n'
+
+        os.makedirs(os.path.dirname(self.__path_fichier), exist_ok=True)
+        try:
+            if os.stat(self.__path_fichier).st_size + len(ligne) > TAILLE_FICHIER_MAX:
+                os.replace(self.__path_fichier, self.__path_fichier + '.1')
+        except FileNotFoundError:
+            pass
+        with open(self.__path_fichier, 'a') as fichier:
+            fichier.write(ligne)
+
+
+def _attribut(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    elif isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    elif isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def _exporter_span(s: Span) -> dict:
+    valeur = {
+        'traceId': s.trace_id,
+        'spanId': s.span_id,
+        'name': s.name,
+        'kind': s.kind,
+        'startTimeUnixNano': str(s.debut),
+        'endTimeUnixNano': str(s.fin),
+        'attributes': [_attribut(k, v) for k, v in s.attributs.items()],
+        'status': {'code': s.statut},
+    }
+    if s.parent_id is not None:
+        valeur['parentSpanId'] = s.parent_id
+    return valeur
@@ -5,9 +5,12 @@ from aiohttp.web import Request
 from asyncio import Event, TaskGroup
 from typing import Optional
 from websockets.asyncio.server import serve, ServerConnection
+from websockets.frames import CloseCode
 
 from millegrilles_messages.bus.BusContext import ForceTerminateExecution
 from . import HttpCommands
+from .Admission import HandshakeAdmission, AdmissionRefused
+from .Compression import parametres_serveur_websocket
 from .SenseurspassifsRelaiWebManager import SenseurspassifsRelaiWebManager
 from .WebSocketCommands import WebSocketClientHandler
 
@@ -22,7 +25,11 @@ class WebServer:
         self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
         self.__manager = manager
 
-        self.__app = web.Application()
+        configuration = manager.context.configuration
+        parametres_app = dict()
+        if configuration.http_client_max_size is not None:
+            parametres_app['client_max_size'] = configuration.http_client_max_size
+        self.__app = web.Application(**parametres_app)
         self.__stop_event: Optional[Event] = None
 
     async def setup(self):
@@ -31,6 +38,7 @@ class WebServer:
     def _preparer_routes(self):
         self.__app.add_routes([
             web.get('/senseurspassifs_relai/test', self.handle_test),
+            web.get('/senseurspassifs_relai/metrics', self.handle_metrics),
             web.post('/senseurspassifs_relai/inscrire', self.handle_post_inscrire),
             web.post('/senseurspassifs_relai/poll', self.handle_post_poll),
             web.post('/senseurspassifs_relai/renouveler', self.handle_post_renouveler),
@@ -45,16 +53,32 @@ class WebServer:
         else:
             self.__stop_event = Event()
 
-        web_port = self.__manager.context.configuration.web_port
+        configuration = self.__manager.context.configuration
+        web_port = configuration.web_port
 
-        runner = web.AppRunner(self.__app)
+        # keepalive_timeout : les appareils en long-polling (/poll) gardent leur connexion TLS entre les requetes
+        parametres_runner = {'keepalive_timeout': configuration.http_keepalive_timeout}
+        if configuration.http_read_bufsize is not None:
+            parametres_runner['read_bufsize'] = configuration.http_read_bufsize
+        runner = web.AppRunner(self.__app, **parametres_runner)
         await runner.setup()
-        ssl_context = self.__manager.context.ssl_context
-        site = web.TCPSite(runner, '0.0.0.0', web_port, ssl_context=ssl_context)
+        tls = self.__manager.context.tls
+        site: Optional[web.TCPSite] = None
         try:
-            await site.start()
-            self.__logger.info("Website started on port %d", web_port)
-            await self.__manager.context.wait()
+            while self.__manager.context.stopping is False:
+                generation = tls.generation
+                # reuse_port permet d'ouvrir le nouveau listener avant de fermer l'ancien (rotation TLS)
+                nouveau_site = web.TCPSite(runner, '0.0.0.0', web_port, ssl_context=tls.current,
+                                           reuse_port=tls.rotation_enabled or None)
+                await nouveau_site.start()
+                if site is None:
+                    self.__logger.info("Website started on port %d", web_port)
+                else:
+                    await site.stop()  # Les connexions existantes restent ouvertes
+                site = nouveau_site
+
+                if await tls.wait_rotation_or_stop(generation, self.__manager.context.wait()) is False:
+                    break
         finally:
             self.__logger.info("Website stopped")
             await runner.cleanup()
@@ -62,6 +86,9 @@ class WebServer:
     async def handle_test(self, _request: Request):
         return web.json_response({'ok': True})
 
+    async def handle_metrics(self, _request: Request):
+        return web.json_response(self.__manager.context.metrics.export())
+
     async def handle_post_inscrire(self, request: Request):
         return await HttpCommands.handle_post_inscrire(request, self.__manager)
 
@@ -108,15 +135,49 @@ class ServeurWebSocket:
         self.__websocket = None
         self.__task_group: Optional[TaskGroup] = None
 
+        configuration = manager.context.configuration
+        self.__admission = HandshakeAdmission(
+            manager.context.metrics, configuration.websocket_handshakes_max,
+            configuration.websocket_handshakes_queue, configuration.websocket_handshake_timeout)
+
     async def __stop_thread(self):
         await self.__manager.context.wait()
 
     async def __serve(self):
-        websocket_port = self.__manager.context.configuration.websocket_port
-        ssl_context = self.__manager.context.ssl_context
-        async with serve(self.handle_client, "0.0.0.0", websocket_port, ssl=ssl_context):
-            self.__logger.info("Websocket started on port %d", websocket_port)
-            await self.__manager.context.wait()  # wait until stopping
+        configuration = self.__manager.context.configuration
+        websocket_port = configuration.websocket_port
+        parametres = parametres_serveur_websocket(configuration)
+        tls = self.__manager.context.tls
+
+        serveurs = list()
+        try:
+            while self.__manager.context.stopping is False:
+                generation = tls.generation
+                # reuse_port permet d'ouvrir le nouveau listener avant de fermer l'ancien (rotation TLS)
+                serveur = await serve(self.handle_client, "0.0.0.0", websocket_port, ssl=tls.current,
+                                      reuse_port=tls.rotation_enabled or None, **parametres)
+                if len(serveurs) == 0:
+                    self.__logger.info("Websocket started on port %d", websocket_port)
+                else:
+                    serveurs[-1].server.close()  # Ferme le listener, les connexions existantes restent ouvertes
+                    # Fermer et retirer les anciens serveurs qui n'ont plus de connexions
+                    actifs = list()
+                    for ancien in serveurs:
+                        if len(ancien.connections) > 0:
+                            actifs.append(ancien)
+                        else:
+                            ancien.close()
+                            await ancien.wait_closed()
+                    serveurs = actifs
+                serveurs.append(serveur)
+
+                if await tls.wait_rotation_or_stop(generation, self.__manager.context.wait()) is False:
+                    break  # Stopping
+        finally:
+            for serveur in serveurs:
+                serveur.close()
+            for serveur in serveurs:
+                await serveur.wait_closed()
 
     async def run(self):
         try:
@@ -134,5 +195,16 @@ class ServeurWebSocket:
             self.__logger.info("Websocket stopped")
 
     async def handle_client(self, websocket: ServerConnection):
-        client_handler = WebSocketClientHandler(websocket, self.__manager)
-        await client_handler.run()
+        # Admission des handshakes couteux (verification certificat, cles X25519, confirmerRelai)
+        try:
+            handshake_slot = await self.__admission.acquire()
+        except AdmissionRefused as e:
+            self.__logger.debug("handle_client Handshake queue full, retry after %d secs", e.retry_after)
+            await websocket.close(CloseCode.TRY_AGAIN_LATER, 'retry_after=%d' % e.retry_after)
+            return
+
+        try:
+            client_handler = WebSocketClientHandler(websocket, self.__manager, handshake_slot)
+            await client_handler.run()
+        finally:
+            handshake_slot.release()
@@ -19,19 +19,48 @@ from millegrilles_messages.bus.BusContext import ForceTerminateExecution
 from millegrilles_messages.messages import Constantes
 from millegrilles_messages.messages.EnveloppeCertificat import EnveloppeCertificat
 from millegrilles_messages.messages.MessagesModule import MessageWrapper
+from senseurspassifs_relai_web.Admission import HandshakeSlot
 from senseurspassifs_relai_web.Chiffrage import dechiffrer_message_chacha20poly1305, attacher_reponse_chiffree
+from senseurspassifs_relai_web.Framing import FRAMING_JSON, negotiate_framing, encode_message, decode_message, is_binary
+from senseurspassifs_relai_web import Tracing
 from senseurspassifs_relai_web.MessagesHandler import CorrelationAppareil
 from senseurspassifs_relai_web.SenseurspassifsRelaiWebManager import SenseurspassifsRelaiWebManager
 
 LOGGER = logging.getLogger(__name__)
 
+# Mode passerelle : fingerprint du certificat du sous-appareil dans les attachements des frames
+ATTACHEMENT_FINGERPRINT = 'fingerprint'
+
+# Actions de l'echange de cles, la place d'admission est liberee a la fin de l'echange
+ACTIONS_HANDSHAKE = ('echangerClesChiffrage', 'confirmerRelai', 'reprendreSession')
 
-class WebSocketClientHandler:
 
-    def __init__(self, websocket: ServerConnection, manager: SenseurspassifsRelaiWebManager):
-        self.__logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+class WebSocketClientHandler:
+    """
+    Session d'un appareil sur un websocket.
+
+    En mode passerelle, le websocket d'un appareil authentifie transporte aussi les sessions de sous-appareils
+    du meme usager. Les frames des sous-appareils ont attachements.fingerprint (certificat du sous-appareil),
+    chaque sous-appareil a son propre WebSocketClientHandler (correlation, chiffrage) qui envoie via la passerelle.
+    Les sous-appareils inactifs (correlation absente ou expiree) sont retires par le watchdog de la passerelle.
+    """
+
+    __slots__ = ('__websocket', '__manager', '__handshake_slot', '__correlation', '__event_correlation',
+                 '__date_connexion', '__presence_emise', '__uuid_appareil', '__user_id', '__version', '__framing',
+                 '__client_stopping', '__passerelle', '__fingerprint', '__sous_appareils', '__task_group')
+
+    __logger = logging.getLogger(__name__ + '.WebSocketClientHandler')
+
+    def __init__(self, websocket: ServerConnection, manager: SenseurspassifsRelaiWebManager,
+                 handshake_slot: Optional[HandshakeSlot] = None,
+                 passerelle: Optional['WebSocketClientHandler'] = None, fingerprint: Optional[str] = None):
+        """
+        :param passerelle: Handler of the gateway socket when this handler is a sub-device session.
+        :param fingerprint: Certificate fingerprint of the sub-device.
+        """
         self.__websocket: ServerConnection = websocket
         self.__manager: SenseurspassifsRelaiWebManager = manager
+        self.__handshake_slot = handshake_slot
         self.__correlation: Optional[CorrelationAppareil] = None
         self.__event_correlation = asyncio.Event()
         self.__date_connexion = datetime.datetime.now(tz=pytz.UTC)
@@ -40,13 +69,23 @@ class WebSocketClientHandler:
         self.__uuid_appareil: Optional[str] = None
         self.__user_id: Optional[str] = None
         self.__version: Optional[str] = None
+        self.__framing = FRAMING_JSON
 
         self.__client_stopping = asyncio.Event()
 
+        self.__passerelle = passerelle
+        self.__fingerprint = fingerprint
+        self.__sous_appareils: Optional[dict[str, WebSocketClientHandler]] = None
+        self.__task_group: Optional[TaskGroup] = None
+
     @property
     def websocket(self) -> ServerConnection:
         return self.__websocket
 
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.__user_id
+
     def set_params_appareil(self, uuid_appareil: str, user_id: str):
         self.__uuid_appareil = uuid_appareil
         self.__user_id = user_id
@@ -54,32 +93,59 @@ class WebSocketClientHandler:
     def set_version(self, version: str):
         self.__version = version
 
-    async def presence_appareil(self, deconnecte=False):
-        evenement = None
-        if self.__uuid_appareil and self.__user_id:
-            if deconnecte is True:
-                evenement = {'uuid_appareil': self.__uuid_appareil, 'user_id': self.__user_id, 'deconnecte': True}
-            elif self.__presence_emise is None:
-                evenement = {'uuid_appareil': self.__uuid_appareil, 'user_id': self.__user_id, 'version': self.__version}
-
-        if evenement:
-            producer = await self.__manager.context.get_producer()
+    def set_framing(self, framing: str):
+        self.__framing = framing
+
+    def __handshake_done(self):
+        """ Libere la place d'admission : appareil authentifie, session chiffree etablie (ou abandonnee). """
+        if self.__handshake_slot is not None:
+            self.__handshake_slot.release()
+            self.__handshake_slot = None
+
+    async def __send(self, reponse: dict, framing: Optional[str] = None):
+        """
+        :param framing: Framing de cette frame (defaut : framing courant de la connexion)
+        """
+        if self.__passerelle is not None:
+            # Sous-appareil, la passerelle route la frame avec le fingerprint (framing de la passerelle)
+            reponse = dict(reponse)
+            attachements = dict(reponse.get('attachements') or dict())
+            attachements[ATTACHEMENT_FINGERPRINT] = self.__fingerprint
+            reponse['attachements'] = attachements
+            return await self.__passerelle.__send(reponse)
+
+        with Tracing.span('send'):
+            await self.__websocket.send(encode_message(reponse, framing or self.__framing))
+
+    async def __send_reset_secret(self):
+        self.__handshake_done()
+        self.__correlation.clear_chiffrage()
+        self.__manager.revoke_session_ticket(self.__correlation.fingerprint)
+        self.set_framing(FRAMING_JSON)  # Le client revient au json avec l'echange de cles
+        reponse, _ = self.__manager.context.formatteur.signer_message(
+            Constantes.KIND_COMMANDE, dict(), action='resetSecret')
+        await self.__send(reponse)
 
-            await producer.event(evenement,
-                                 domain='senseurspassifs_relai',
-                                 action='presenceAppareil',
-                                 exchange=Constantes.SECURITE_PRIVE)
+    async def presence_appareil(self, deconnecte=False):
+        if not (self.__uuid_appareil and self.__user_id):
+            return
 
+        if deconnecte is True:
+            if self.__presence_emise is not None:
+                self.__presence_emise = None
+                await self.__manager.presence_disconnect(self.__user_id, self.__uuid_appareil)
+        elif self.__presence_emise is None:
             self.__presence_emise = datetime.datetime.now()
+            await self.__manager.presence_connect(self.__user_id, self.__uuid_appareil, self.__version)
 
     async def run(self):
-        self.__logger.debug("run Connexion client %s" % self.__correlation)
+        self.__logger.debug("run Connexion client %s", self.__correlation)
         try:
             async with TaskGroup() as group:
+                self.__task_group = group
                 group.create_task(self.__recevoir_messages())
                 group.create_task(self.__relai_messages())
                 group.create_task(self.__relai_lectures())
-                group.create_task(self.__connection_closed_waiter())
                 group.create_task(self.__watchdog())
         except* asyncio.CancelledError as e:
             raise e
@@ -90,29 +156,54 @@ class WebSocketClientHandler:
                 self.__logger.exception("Unhandled error, thread closed - diconnecting device %s/%s", self.__user_id, self.__uuid_appareil)
                 await self.websocket.close(CloseCode.ABNORMAL_CLOSURE, 'Thread closed')
 
+        self.__task_group = None
         self.__logger.debug("End connexion userid: %s, uuid_appareil: %s, fingerprint: %s, connection date: %s",
-                            self.__user_id, self.__uuid_appareil, self.__correlation.fingerprint, self.__date_connexion)
-
-    async def __connection_closed_waiter(self):
-        await self.__websocket.wait_closed()
-        # Release all threads
-        self.__client_stopping.set()
-        await self.__correlation.put_message(None)
+                            self.__user_id, self.__uuid_appareil, self.__correlation and self.__correlation.fingerprint,
+                            self.__date_connexion)
 
     async def __watchdog(self):
-        while self.__manager.context.stopping is False and self.__client_stopping.is_set() is False:
-            if self.__correlation and self.__correlation.expire:
-                self.__logger.info("Client connection expired, disconnecting")
-                await self.websocket.close(CloseCode.TRY_AGAIN_LATER, "Timeout")
-                return
+        """ Verifie l'expiration de la connexion et libere les autres threads a la fermeture du websocket. """
+        try:
+            while self.__manager.context.stopping is False:
+                if self.__correlation and self.__correlation.expire:
+                    self.__logger.info("Client connection expired, disconnecting")
+                    await self.websocket.close(CloseCode.TRY_AGAIN_LATER, "Timeout")
+                    break
+                if self.__sous_appareils:
+                    await self.__expirer_sous_appareils()
+                try:
+                    await asyncio.wait_for(self.__websocket.wait_closed(), 60)
+                    break  # Connection closed
+                except asyncio.TimeoutError:
+                    pass
+
+            if self.__websocket.state.value != State.CLOSED:
+                await self.websocket.close(CloseCode.NORMAL_CLOSURE, "Closing")
+        finally:
+            # Release all threads
+            await self.__arreter()
+            for sous_appareil in (self.__sous_appareils or dict()).values():
+                await sous_appareil.__arreter()
+
+    async def __expirer_sous_appareils(self):
+        for fingerprint, sous_appareil in list(self.__sous_appareils.items()):
+            correlation = sous_appareil.__correlation
+            if correlation is not None and not correlation.expire:
+                continue
+            self.__logger.debug("Gateway %s: removing idle sub-device %s", self.__uuid_appareil, fingerprint)
+            del self.__sous_appareils[fingerprint]
+            await sous_appareil.__arreter()
             try:
-                await asyncio.wait_for(self.__client_stopping.wait(), 60)
-                return  # Stopping
-            except asyncio.TimeoutError:
-                pass
+                await sous_appareil.presence_appareil(deconnecte=True)
+            except Exception:
+                self.__logger.exception("__expirer_sous_appareils Erreur emettre presence sous-appareil")
+            self.__manager.context.metrics.increment('websocket.gateway.expired')
 
-        if self.__websocket.state.value == State.CLOSED:
-            await self.websocket.close(CloseCode.NORMAL_CLOSURE, "Closing")
+    async def __arreter(self):
+        self.__client_stopping.set()
+        self.__event_correlation.set()
+        if self.__correlation is not None:
+            await self.__correlation.put_message(None)
 
     async def __recevoir_messages(self):
         self.__logger.debug("__recevoir_messages Connexion '%s'", self.__date_connexion)
@@ -124,19 +215,21 @@ class WebSocketClientHandler:
                     await self.presence_appareil()
                 except Exception:
                     self.__logger.exception("__recevoir_messages Erreur emettre presence appareil")
-                self.__correlation.touch()
+                if self.__correlation is not None:
+                    self.__correlation.touch()
 
         except ConnectionClosedError:
-            self.__logger.debug("Connexion %s fermee incorrectement" % self.__date_connexion)
+            self.__logger.debug("Connexion %s fermee incorrectement", self.__date_connexion)
         finally:
             self.__event_correlation.set()  # Cleanup
 
-        try:
-            await self.presence_appareil(deconnecte=True)
-        except Exception:
-            self.__logger.exception("__recevoir_messages Erreur emettre presence appareil")
+        for sous_appareil in [self] + list((self.__sous_appareils or dict()).values()):
+            try:
+                await sous_appareil.presence_appareil(deconnecte=True)
+            except Exception:
+                self.__logger.exception("__recevoir_messages Erreur emettre presence appareil")
 
-        self.__logger.debug("__recevoir_messages Fin connexion '%s'" % self.__date_connexion)
+        self.__logger.debug("__recevoir_messages Fin connexion '%s'", self.__date_connexion)
 
     async def __relai_messages(self):
         await self.__event_correlation.wait()
@@ -154,8 +247,9 @@ class WebSocketClientHandler:
                     continue
 
                 if reponse is not None:
-                    attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
-                    await self.__websocket.send(json.dumps(reponse).encode('utf-8'))
+                    framing = self.__framing
+                    attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None, framing=framing)
+                    await self.__send(reponse, framing)
 
             except asyncio.TimeoutError:
                 pass
@@ -176,10 +270,10 @@ class WebSocketClientHandler:
                 )
 
                 # Ajouter element relai_chiffre si possible
-                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
+                framing = self.__framing
+                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None, framing=framing)
 
-                reponse_bytes = json.dumps(reponse).encode('utf-8')
-                await self.__websocket.send(reponse_bytes)
+                await self.__send(reponse, framing)
 
             # Faire une aggregation de 20 secondes de lectures
             try:
@@ -189,19 +283,108 @@ class WebSocketClientHandler:
                 pass  # Loop
 
     async def __transmettre_lecture(self, lecture: dict, correlation_appareil: Optional[CorrelationAppareil] = None):
-        await self.__manager.send_readings_correlation(lecture, correlation_appareil)
+        with Tracing.span('mq.publish', Tracing.KIND_CLIENT, destination='lecture'):
+            await self.__manager.send_readings_correlation(lecture, correlation_appareil)
+
+    async def __handle_message(self, message: Union[str, bytes]):
+        with self.__manager.context.tracer.trace('websocket.message', taille=len(message)) as span_message:
+            try:
+                with Tracing.span('decode', framing=self.__framing):
+                    commande = decode_message(message, self.__framing)
+            except Exception as e:
+                LOGGER.error("handle_message Invalid frame %s" % str(e))
+                return
+
+            try:
+                span_message.set_attribute('action', commande['routage']['action'])
+            except (KeyError, TypeError):
+                pass
+
+            try:
+                fingerprint = commande['attachements'][ATTACHEMENT_FINGERPRINT]
+            except (KeyError, TypeError):
+                fingerprint = None
+
+            if fingerprint is not None and (self.__correlation is None or fingerprint != self.__correlation.fingerprint):
+                span_message.set_attribute('gateway.fingerprint', fingerprint)
+                return await self.__handle_sous_appareil(fingerprint, commande)
 
-    async def __handle_message(self, message: bytes):
+            await self.__traiter_commande(commande)
+
+    async def __handle_sous_appareil(self, fingerprint: str, commande: dict):
+        """ Mode passerelle, route la frame vers la session du sous-appareil. """
+        metrics = self.__manager.context.metrics
+        try:
+            sous_appareil = self.__sous_appareils[fingerprint]
+        except (KeyError, TypeError):
+            sous_appareil = self.__creer_sous_appareil(fingerprint, commande)
+            if sous_appareil is None:
+                metrics.increment('websocket.gateway.refused')
+                return
+
+            # La signature de la premiere frame est verifiee par __traiter_commande (certificat et user_id)
+            await sous_appareil.__traiter_commande(commande)
+            if sous_appareil.__uuid_appareil is None:
+                LOGGER.warning("Gateway %s: sub-device %s refused (invalid first frame)",
+                               self.__uuid_appareil, fingerprint)
+                metrics.increment('websocket.gateway.refused')
+                return
+            self.__ajouter_sous_appareil(fingerprint, sous_appareil)
+        else:
+            await sous_appareil.__traiter_commande(commande)
+
+        try:
+            await sous_appareil.presence_appareil()
+        except Exception:
+            self.__logger.exception("__handle_sous_appareil Erreur emettre presence sous-appareil")
+        if sous_appareil.__correlation is not None:
+            sous_appareil.__correlation.touch()
+
+    def __creer_sous_appareil(self, fingerprint: str, commande: dict) -> Optional['WebSocketClientHandler']:
+        max_appareils = self.__manager.context.configuration.gateway_max_devices
+        nombre = len(self.__sous_appareils or dict())
+
+        # La passerelle doit etre authentifiee, la premiere frame du sous-appareil doit etre signee
+        if self.__correlation is None or self.__user_id is None or self.__task_group is None:
+            LOGGER.warning("Sub-device frame received before the gateway %s is authenticated", self.__uuid_appareil)
+            return None
+        if 'sig' not in commande:
+            LOGGER.warning("First frame of sub-device %s on gateway %s is not signed", fingerprint, self.__uuid_appareil)
+            return None
+        if nombre >= max_appareils:
+            LOGGER.warning("Gateway %s: too many sub-devices (max %d)", self.__uuid_appareil, max_appareils)
+            return None
+
+        return WebSocketClientHandler(self.__websocket, self.__manager, passerelle=self, fingerprint=fingerprint)
+
+    def __ajouter_sous_appareil(self, fingerprint: str, sous_appareil: 'WebSocketClientHandler'):
+        if self.__sous_appareils is None:
+            self.__sous_appareils = dict()
+        self.__sous_appareils[fingerprint] = sous_appareil
+        self.__task_group.create_task(sous_appareil.__relai_messages())
+        self.__task_group.create_task(sous_appareil.__relai_lectures())
+        self.__manager.context.metrics.increment('websocket.gateway.sessions')
+
+    async def __traiter_commande(self, commande: dict):
         # Extraire information de l'enveloppe du message
         try:
-            commande = json.loads(message)
             context = self.__manager.context
             action = commande['routage']['action']
 
             # Check if the sig element is present (means the message is not encrypted)
             if 'sig' in commande:
                 # Message is not encrypted
-                enveloppe = await context.validateur_message.verifier(commande)
+                with Tracing.span('verify'):
+                    enveloppe = await context.validateur_message.verifier(commande)
+
+                if self.__passerelle is not None and (
+                        enveloppe.fingerprint != self.__fingerprint or enveloppe.get_user_id != self.__passerelle.user_id):
+                    LOGGER.warning("Sub-device message signed by another certificate, ignored")
+                    return
+
+                if action not in ACTIONS_HANDSHAKE:
+                    # Appareil authentifie sans echange de cles (e.g. etatAppareil en clair)
+                    self.__handshake_done()
 
                 try:
                     uuid_appareil = enveloppe.subject_common_name
@@ -210,51 +393,54 @@ class WebSocketClientHandler:
                 except AttributeError:
                     LOGGER.exception("Erreur set_params_appareils")
 
-                if action == 'etatAppareil':
-                    return await self.__handle_status(commande)
-                elif action == 'getTimezoneInfo':
-                    return await self.__handle_get_timezone_info(commande)
-                elif action in ['getAppareilDisplayConfiguration', 'getAppareilProgrammesConfiguration']:
-                    return await self.__handle_requete(commande, enveloppe)
-                elif action == 'signerAppareil':
-                    return await self.__handle_renouvellement(commande, enveloppe)
-                elif action == 'getFichePublique':
-                    return await self.__handle_get_fiche(commande, enveloppe)
-                elif action == 'getRelaisWeb':
-                    return await self.__handle_get_relais_web()
-                elif action == 'echangerClesChiffrage':
-                    return await self.__handle_echanger_cles_chiffrage(commande, enveloppe)
-                elif action == 'confirmerRelai':
-                    return await self.__handle_confirmer_relai(commande, enveloppe)
-                else:
-                    LOGGER.error(f"handle_message Unknown action {action} on device {self.__uuid_appareil}")
+                with Tracing.span('handler', action=action):
+                    if action == 'etatAppareil':
+                        return await self.__handle_status(commande)
+                    elif action == 'getTimezoneInfo':
+                        return await self.__handle_get_timezone_info(commande)
+                    elif action in ['getAppareilDisplayConfiguration', 'getAppareilProgrammesConfiguration']:
+                        return await self.__handle_requete(commande, enveloppe)
+                    elif action == 'signerAppareil':
+                        return await self.__handle_renouvellement(commande, enveloppe)
+                    elif action == 'getFichePublique':
+                        return await self.__handle_get_fiche(commande, enveloppe)
+                    elif action == 'getRelaisWeb':
+                        return await self.__handle_get_relais_web()
+                    elif action == 'echangerClesChiffrage':
+                        return await self.__handle_echanger_cles_chiffrage(commande, enveloppe)
+                    elif action == 'confirmerRelai':
+                        return await self.__handle_confirmer_relai(commande, enveloppe)
+                    elif action == 'reprendreSession':
+                        return await self.__handle_reprendre_session(commande, enveloppe)
+                    else:
+                        LOGGER.error(f"handle_message Unknown action {action} on device {self.__uuid_appareil}")
             else:
                 # Encrypted message
+                self.__handshake_done()
                 ciphertext = commande['ciphertext']
                 tag = commande['tag']
                 nonce = commande['nonce']
 
                 try:
-                    cle_dechiffrage = self.__correlation.cle_dechiffrage
-                    commande = dechiffrer_message_chacha20poly1305(cle_dechiffrage, nonce, tag, ciphertext)
-                    commande = json.loads(commande)
-
-                    if action == 'etatAppareilRelai':
-                        return await self.__handle_relai_status(commande)
-                    elif action == 'getRelaisWeb':
-                        return await self.__handle_get_relais_web()
-                    elif action == 'getTimezoneInfo':
-                        return await self.__handle_get_timezone_info(commande)
-                    else:
-                        self.__logger.warning(f"Received unknown encrypted command {action} from {self.__uuid_appareil}")
+                    with Tracing.span('decrypt'):
+                        cle_dechiffrage = self.__correlation.cle_dechiffrage
+                        commande = dechiffrer_message_chacha20poly1305(cle_dechiffrage, nonce, tag, ciphertext)
+                        commande = decode_message(commande, self.__framing)
+
+                    with Tracing.span('handler', action=action):
+                        if action == 'etatAppareilRelai':
+                            return await self.__handle_relai_status(commande)
+                        elif action == 'getRelaisWeb':
+                            return await self.__handle_get_relais_web()
+                        elif action == 'getTimezoneInfo':
+                            return await self.__handle_get_timezone_info(commande)
+                        else:
+                            self.__logger.warning(f"Received unknown encrypted command {action} from {self.__uuid_appareil}")
                 except asyncio.CancelledError as e:
                     raise e
                 except Exception:
                     LOGGER.exception(f"Decryption error on {self.__uuid_appareil}, deactivating encryption with resetSecret")
-                    self.__correlation.clear_chiffrage()
-                    reponse, _ = self.__manager.context.formatteur.signer_message(
-                        Constantes.KIND_COMMANDE, dict(), action='resetSecret')
-                    await self.__websocket.send(json.dumps(reponse).encode('utf-8'))
+                    await self.__send_reset_secret()
 
         except asyncio.CancelledError as e:
             raise e
@@ -264,14 +450,14 @@ class WebSocketClientHandler:
 
     async def __handle_status(self, commande: dict):
         try:
-            LOGGER.debug("handle_status Etat recu %s" % commande)
+            LOGGER.debug("handle_status Etat recu %s", commande)
 
             enveloppe = await self.__manager.context.validateur_message.verifier(commande)
             user_id = enveloppe.get_user_id
 
             # S'assurer d'avoir un appareil de role senseurspassifs
             if user_id is None or 'senseurspassifs' not in enveloppe.get_roles:
-                LOGGER.info("Mauvais role certificat (%s) pour etat appareil" % enveloppe.get_roles)
+                LOGGER.info("Mauvais role certificat (%s) pour etat appareil", enveloppe.get_roles)
                 return
 
             contenu = json.loads(commande['contenu'])
@@ -295,7 +481,7 @@ class WebSocketClientHandler:
 
     async def __handle_relai_status(self, commande: dict):
         try:
-            LOGGER.debug("handle_relai_status uuid_appareil: %s, etat recu %s" % (self.__correlation.uuid_appareil, commande))
+            LOGGER.debug("handle_relai_status uuid_appareil: %s, etat recu %s", self.__correlation.uuid_appareil, commande)
 
             # Emettre l'etat de l'appareil (une lecture)
             await self.__transmettre_lecture(commande, self.__correlation)
@@ -323,9 +509,13 @@ class WebSocketClientHandler:
         geoposition = None
 
         try:
-            requete_appareil = {'user_id': user_id, 'uuid_appareil': uuid_appareil}
-            reponse_appareil = await producer.request(
-                requete_appareil, 'SenseursPassifs', 'getTimezoneAppareil', exchange=Constantes.SECURITE_PRIVE, timeout=3)
+            with Tracing.span('mq.request', Tracing.KIND_CLIENT, destination='SenseursPassifs/getTimezoneAppareil'):
+                requete_appareil = Tracing.signer_avec_traceparent(
+                    self.__manager.context.formatteur, Constantes.KIND_REQUETE,
+                    {'user_id': user_id, 'uuid_appareil': uuid_appareil}, 'SenseursPassifs', 'getTimezoneAppareil')
+                reponse_appareil = await producer.request(
+                    requete_appareil, 'SenseursPassifs', 'getTimezoneAppareil', exchange=Constantes.SECURITE_PRIVE,
+                    timeout=3, noformat=True)
             timezone_str = reponse_appareil.parsed.get('timezone')
             geoposition = reponse_appareil.parsed.get('geoposition') or dict()
         except asyncio.TimeoutError:
@@ -367,11 +557,12 @@ class WebSocketClientHandler:
             reponse['solaire_utc'] = calculer_horaire_solaire(latitude, longitude)
             reponse['ok'] = True
 
-        reponse, _ = self.__manager.context.formatteur.signer_message(Constantes.KIND_COMMANDE, reponse, action='timezoneInfo')
+        with Tracing.span('sign'):
+            reponse, _ = self.__manager.context.formatteur.signer_message(Constantes.KIND_COMMANDE, reponse, action='timezoneInfo')
 
-        attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
+        attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None, framing=self.__framing)
 
-        await self.__websocket.send(json.dumps(reponse).encode('utf-8'))
+        await self.__send(reponse)
 
     async def __handle_get_relais_web(self):
         fiche = self.__manager.context.fiche_publique
@@ -379,15 +570,16 @@ class WebSocketClientHandler:
             try:
                 url_relais = parse_fiche_relais(fiche)
                 reponse = {'relais': url_relais}
-                reponse, _ = self.__manager.context.formatteur.signer_message(Constantes.KIND_COMMANDE, reponse, action='relaisWeb')
-                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
-                await self.__websocket.send(json.dumps(reponse).encode('utf-8'))
+                with Tracing.span('sign'):
+                    reponse, _ = self.__manager.context.formatteur.signer_message(Constantes.KIND_COMMANDE, reponse, action='relaisWeb')
+                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None, framing=self.__framing)
+                await self.__send(reponse)
             except KeyError:
                 pass  # OK, pas de timezone
 
     async def __handle_requete(self, requete: dict, enveloppe):
         try:
-            LOGGER.debug("handle_post_request Etat recu %s" % requete)
+            LOGGER.debug("handle_post_request Etat recu %s", requete)
 
             user_id = enveloppe.get_user_id
             routage_requete = requete['routage']
@@ -402,22 +594,17 @@ class WebSocketClientHandler:
             # await server.message_handler.create_device_correlation(enveloppe, emettre_lectures=False)
 
             # Emettre la requete
-            domaine_requete = routage_requete['domaine']
-            partition_requete = routage_requete.get('partition')
-            exchange = Constantes.SECURITE_PRIVE
-
             try:
-                producer = await self.__manager.context.get_producer()
-                reponse = await producer.request(
-                    requete, domaine_requete, action_requete, exchange, partition_requete, noformat=True)
-                reponse = reponse.parsed['__original']
+                reponse = await self.__manager.requete_appareil(enveloppe, requete)
+                # Copie, la reponse originale peut etre conservee dans le cache de configuration
+                reponse = dict(reponse.parsed['__original'])
 
                 # Injecter _action (en-tete de reponse ne contient pas d'action)
                 reponse['attachements'] = {'action': action_requete}
 
-                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
+                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None, framing=self.__framing)
 
-                await self.__websocket.send(json.dumps(reponse).encode('utf-8'))
+                await self.__send(reponse)
             except asyncio.TimeoutError:
                 pass
 
@@ -426,14 +613,14 @@ class WebSocketClientHandler:
 
     async def __handle_renouvellement(self, commande: dict, enveloppe):
         try:
-            LOGGER.debug("handle_renouvellement Demande recue %s" % commande)
+            LOGGER.debug("handle_renouvellement Demande recue %s", commande)
 
             # Verifier - s'assure que la signature est valide et certificat est encore actif
             user_id = enveloppe.get_user_id
 
             # S'assurer d'avoir un appareil de role senseurspassifs
             if user_id is None or 'senseurspassifs' not in enveloppe.get_roles:
-                LOGGER.info("handle_renouvellement Role certificat renouvellement invalide : %s" % enveloppe.get_roles)
+                LOGGER.info("handle_renouvellement Role certificat renouvellement invalide : %s", enveloppe.get_roles)
                 return  # Skip
 
             routage = commande['routage']
@@ -455,11 +642,9 @@ class WebSocketClientHandler:
                 # Injecter _action (en-tete de reponse ne contient pas d'action)
                 reponse['attachements'] = {'action': 'signerAppareil'}
 
-                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
+                attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None, framing=self.__framing)
 
-                reponse_bytes = json.dumps(reponse).encode('utf-8')
-
-                await self.__websocket.send(reponse_bytes)
+                await self.__send(reponse)
             except asyncio.TimeoutError:
                 LOGGER.info("handle_renouvellement Erreur commande signerAppareil (timeout)")
 
@@ -469,15 +654,14 @@ class WebSocketClientHandler:
     async def __handle_get_fiche(self, commande: dict, enveloppe):
         fiche = self.__manager.context.fiche_publique
         if fiche is not None:
-            reponse_bytes = json.dumps(fiche).encode('utf-8')
-            await self.__websocket.send(reponse_bytes)
+            await self.__send(fiche)
 
     async def __handle_echanger_cles_chiffrage(self, commande: dict, enveloppe: EnveloppeCertificat):
         user_id = enveloppe.get_user_id
 
         # S'assurer d'avoir un appareil de role senseurspassifs
         if user_id is None or 'senseurspassifs' not in enveloppe.get_roles:
-            LOGGER.info("Mauvais role certificat (%s) pour etat appareil" % enveloppe.get_roles)
+            LOGGER.info("Mauvais role certificat (%s) pour etat appareil", enveloppe.get_roles)
             return
 
         # correlation = await self.__manager.enregistrer_appareil(enveloppe, emettre_lectures=False)
@@ -494,16 +678,32 @@ class WebSocketClientHandler:
             LOGGER.debug("Version non disponible")
 
         # Valider enveloppe, doit correspondre a l'appareil authentifie
-        LOGGER.debug("handle_echanger_cles_chiffrage commande : %s" % commande)
+        LOGGER.debug("handle_echanger_cles_chiffrage commande : %s", commande)
         cle_peer = contenu['peer']
         cle_publique_locale = await self.echanger_cle_chiffrage(cle_peer)
 
+        # Framing binaire optionnel (cbor/msgpack) demande par l'appareil, e.g. framing: ['cbor', 'json']
+        framing = negotiate_framing(contenu.get('framing'))
+
         reponse = {'peer': cle_publique_locale}
+
+        # Ticket pour reprendre la session chiffree a la reconnexion (action reprendreSession)
+        ticket = self.__manager.issue_session_ticket(self.__correlation)
+        if ticket is not None:
+            reponse['ticket'] = ticket.ticket_id
+            reponse['ticket_expiration'] = int(ticket.expiration)
+
+        if is_binary(framing):
+            reponse['framing'] = framing
+            LOGGER.debug("Framing %s active pour appareil %s (version %s)", framing, self.__uuid_appareil, self.__version)
+
         reponse, _ = self.__manager.context.formatteur.signer_message(
             Constantes.KIND_COMMANDE, reponse, action='echangerSecret')
 
-        reponse_bytes = json.dumps(reponse).encode('utf-8')
-        await self.__websocket.send(reponse_bytes)
+        # La reponse d'echange est toujours en json, le framing negocie s'applique aux messages suivants.
+        # La frame est mise en file avant tout autre envoi (pas d'await avant websocket.send).
+        self.set_framing(framing)
+        await self.__send(reponse, FRAMING_JSON)
 
 
     async def __handle_confirmer_relai(self, commande: dict, enveloppe: EnveloppeCertificat):
@@ -525,19 +725,68 @@ class WebSocketClientHandler:
             if result.parsed.get('ok') is True:
                 # Tout est pret, le relai peut maintenant signer le contenu du client
                 self.activer_relai_messages()
+                self.__manager.confirm_session_ticket(fingerprint)
             else:
                 self.__logger.error("Error activating encrypted message relay: %s", result)
+            self.__handshake_done()
 
         except asyncio.CancelledError as e:
             raise e
         except Exception:
             LOGGER.exception("Erreur confirmation relai avec domaine, desactiver chiffrage avec microcontrolleur")
-            self.__correlation.clear_chiffrage()
             # Desactiver le chiffrage avec le client
+            await self.__send_reset_secret()
+
+    async def __handle_reprendre_session(self, commande: dict, enveloppe: EnveloppeCertificat):
+        """
+        Reprise d'une session chiffree avec un ticket recu lors d'un echangerClesChiffrage precedent.
+        Evite l'echange X25519 et la confirmation confirmerRelai avec SenseursPassifs.
+        """
+        user_id = enveloppe.get_user_id
+
+        # S'assurer d'avoir un appareil de role senseurspassifs
+        if user_id is None or 'senseurspassifs' not in enveloppe.get_roles:
+            LOGGER.info("Mauvais role certificat (%s) pour reprise de session", enveloppe.get_roles)
+            return
+
+        if self.__correlation is None:
+            await self.__create_device_correlation(enveloppe, emettre_lectures=False)
+
+        contenu = json.loads(commande['contenu'])
+
+        try:
+            self.set_version(contenu['version'])
+        except (AttributeError, KeyError):
+            pass
+
+        ticket = None
+        try:
+            ticket = self.__manager.resume_session(contenu['ticket'], enveloppe.fingerprint)
+        except (TypeError, KeyError):
+            pass
+
+        if ticket is None:
+            # Ticket inconnu ou expire, l'appareil doit faire echangerClesChiffrage
             reponse, _ = self.__manager.context.formatteur.signer_message(
-                Constantes.KIND_COMMANDE, dict(), action='resetSecret')
-            reponse_bytes = json.dumps(reponse).encode('utf-8')
-            await self.__websocket.send(reponse_bytes)
+                Constantes.KIND_COMMANDE, {'ok': False}, action='sessionReprise')
+            await self.__send(reponse)
+            return
+
+        self.__correlation.restaurer_cle_chiffrage(ticket.cle, ticket.relai_confirme)
+        framing = negotiate_framing(contenu.get('framing'))
+
+        reponse = {'ok': True, 'relai': ticket.relai_confirme, 'ticket_expiration': int(ticket.expiration)}
+        if is_binary(framing):
+            reponse['framing'] = framing
+        reponse, _ = self.__manager.context.formatteur.signer_message(
+            Constantes.KIND_COMMANDE, reponse, action='sessionReprise')
+
+        # Le contenu chiffre prouve a l'appareil que le relai detient toujours la cle de session
+        attacher_reponse_chiffree(self.__correlation, reponse, enveloppe=None)
+
+        self.set_framing(framing)
+        await self.__send(reponse, FRAMING_JSON)
+        self.__handshake_done()
 
     async def echanger_cle_chiffrage(self, cle_peer: str):
         return self.__correlation.preparer_cle_chiffrage(cle_peer)
@@ -596,11 +845,11 @@ def parse_fiche_relais(fiche: dict):
     for instance_id, app_params in fiche['applicationsV2']['senseurspassifs_relai']['instances'].items():
         try:
             app_instance_pathname[instance_id] = app_params['pathname']
-            LOGGER.debug("instance_id %s pathname %s" % (instance_id, app_params['pathname']))
+            LOGGER.debug("instance_id %s pathname %s", instance_id, app_params['pathname'])
         except KeyError:
             pass
 
-    LOGGER.debug("relais %d instances" % len(app_instance_pathname))
+    LOGGER.debug("relais %d instances", len(app_instance_pathname))
 
     url_relais = list()
     for instance_id, instance_params in fiche['instances'].items():
@@ -9,6 +9,10 @@ from typing import Awaitable
 from millegrilles_messages.bus.BusContext import ForceTerminateExecution, StopListener
 from millegrilles_messages.bus.BusExceptions import ConfigurationFileError
 from millegrilles_messages.bus.PikaConnector import MilleGrillesPikaConnector
+from millegrilles_senseurspassifs import EventLoop
+from millegrilles_senseurspassifs.LoggingQueue import demarrer_logging_queue
+from millegrilles_senseurspassifs.LoopMonitor import LoopLagMonitor
+from millegrilles_senseurspassifs.Profiler import ProfilerSurDemande
 from senseurspassifs_relai_web.Configuration import SenseurspassifsRelaiWebConfiguration
 from senseurspassifs_relai_web.Context import SenseurspassifsRelaiWebContext
 from senseurspassifs_relai_web.MessagesHandler import AppareilMessageHandler
@@ -36,6 +40,10 @@ async def main():
     LOGGER.setLevel(logging.INFO)
     LOGGER.info("Starting")
 
+    handler_logs = demarrer_logging_queue()
+    if handler_logs is not None:
+        context.metrics.register_gauge('logging.dropped', lambda: handler_logs.dropped)
+
     # Wire classes together, gets awaitables to run
     try:
         coros = await wiring(context)
@@ -84,6 +92,10 @@ async def wiring(context: SenseurspassifsRelaiWebContext) -> list[Awaitable]:
     bus_handler = MgbusHandler(manager)
     web_server = WebServer(manager)
     websocket_server = ServeurWebSocket(manager)
+    loop_monitor = LoopLagMonitor(context.metrics, context.configuration.loop_monitor_intervalle,
+                                  context.configuration.loop_monitor_seuil)
+    profiler = ProfilerSurDemande(context.configuration.data_path, context.configuration.profiler_duree,
+                                  context.configuration.profiler_au_demarrage)
 
     # Setup / injecting dependencies
     await web_server.setup()
@@ -92,14 +104,17 @@ async def wiring(context: SenseurspassifsRelaiWebContext) -> list[Awaitable]:
     coros = [
         context.run(),
         manager.run(),
+        device_message_handler.run(),  # Entretien (appareils et requetes expires, tickets), presence, bindings
         bus_handler.run(),
         web_server.run(),
         websocket_server.run(),
+        loop_monitor.run(context.shutting_down),
+        profiler.run(context.shutting_down),
     ]
 
     return coros
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    EventLoop.run(main())
     LOGGER.info("Stopped")
@@ -22,7 +22,7 @@ class ThermometreAdafruitGPIO:
         # Effectuer lecture avec threadpool
         humidite, temperature = await asyncio.to_thread(Adafruit_DHT.read_retry, self._sensor, self._pin)
 
-        self.__logger.debug("Lecture senseur : temperature = %s, humidite = %s" % (temperature, humidite))
+        self.__logger.debug("Lecture senseur : temperature = %s, humidite = %s", temperature, humidite)
 
         try:
             temperature_round = round(temperature, 1)
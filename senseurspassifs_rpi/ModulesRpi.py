@@ -182,7 +182,8 @@ class SenseurRF24(SenseurModuleProducerAbstract):
     async def traiter_messages(self):
         while True:
             lecture = await self.__queue_messages.get()
-            self.__logger.debug("Lecture RF24 recue:\n%s" % json.dumps(lecture, indent=2))
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("Lecture RF24 recue:\n%s", json.dumps(lecture, indent=2))
             try:
                 no_senseur = lecture['uuid_senseur']
                 senseurs = lecture['senseurs']
@@ -111,7 +111,7 @@ class Paquet0(Paquet):
         :return: True si le message requiert plusieurs paquets, False si le message est complet.
         """
         classe_message = self.type_message >> 8
-        self.__logger.debug("Classe de message recu : %d = classe %d" % (self.type_message, classe_message))
+        self.__logger.debug("Classe de message recu : %d = classe %d", self.type_message, classe_message)
         return classe_message not in [0x02]
         
     def assembler(self):
@@ -509,7 +509,7 @@ class AssembleurPaquets:
         """
         paquet = self.map(data)
         if paquet is not None:
-            self.__logger.debug("Paquet: %s" % str(paquet))
+            self.__logger.debug("Paquet: %s", paquet)
             self.__paquets[paquet.no_paquet] = paquet
 
             if isinstance(paquet, PaquetIv):
@@ -583,7 +583,7 @@ class AssembleurPaquets:
                 self.__iv_confirme = True
 
             for lecture in paquets_assembles:
-                self.__logger.debug("Lecture RF24 : %s" % lecture)
+                self.__logger.debug("Lecture RF24 : %s", lecture)
                 try:
                     if lecture.get('cle_publique_debut'):
                         cle_publique.append(lecture['cle_publique_debut'])
@@ -612,7 +612,7 @@ class AssembleurPaquets:
 
         if len(cle_publique) == 2:
             cle_combinee = bytes(cle_publique[0] + cle_publique[1])
-            self.__logger.debug("Cle publique senseur : %s" % cle_combinee)
+            self.__logger.debug("Cle publique senseur : %s", cle_combinee)
             
             # # Valider la cle avec le CRC32
             # calcul_crc32 = crc32(cle_combinee) & 0xffffffff
@@ -678,7 +678,7 @@ class AssembleurPaquets:
 
     def map(self, data: bytes):
         no_paquet, type_message = unpack('HH', data[2:6])
-        self.__logger.debug("Mapping node_id %d noPaquet : %d, type paquet : %d" % (self.node_id, no_paquet, type_message))
+        self.__logger.debug("Mapping node_id %d noPaquet : %d, type paquet : %d", self.node_id, no_paquet, type_message)
         
         paquet = None
         if no_paquet == TypesMessages.TYPE_PAQUET_FIN:
@@ -688,11 +688,12 @@ class AssembleurPaquets:
             # S'assurer de decrypter en ordre et une seule fois
             if self.__cipher is not None:
                 if self.__paquets.get(no_paquet-1) is not None and self.__paquets.get(no_paquet) is None:
-                    self.__logger.debug("Contenu crypte recu : %s" % binascii.hexlify(data[6:]))
+                    if self.__logger.isEnabledFor(logging.DEBUG):
+                        self.__logger.debug("Contenu crypte recu : %s", binascii.hexlify(data[6:]))
                     # Les 4 premiers bytes ne sont pas cryptes
                     data = data[0:4] + self.__cipher.decrypt(data[4:])
                     type_message = unpack('H', data[4:6])[0]
-                    self.__logger.debug("Decrypte noPaquet : %d, type paquet : %d" % (no_paquet, type_message))
+                    self.__logger.debug("Decrypte noPaquet : %d, type paquet : %d", no_paquet, type_message)
             else:
                 self.__logger.info("Cipher non disponible pour donnees cryptees")
                 raise ExceptionCipherNonDisponible("UUID: %s, paquet %d" % (self.uuid_appareil, no_paquet))
@@ -740,7 +741,8 @@ class MessageIv(Paquet):
         
         self.iv = self.data[6:22]
         self.compute_tag = self.data[22:32]
-        self.__logger.debug("Compute tag (len: %d) = %s" % (len(self.compute_tag), binascii.hexlify(self.compute_tag)))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Compute tag (len: %d) = %s", len(self.compute_tag), binascii.hexlify(self.compute_tag))
         
         # Creer cipher pour dechiffrer
         cipher = Acorn128()
@@ -783,9 +785,9 @@ class MessageChiffre(Paquet):
         data_chiffre = self.data[position_data_chiffree:position_tag]
         self.compute_tag = self.data[position_tag:fin_tag]
         
-        self.__logger.debug("Compute tag. Debut tag : %d, fin tag : %d. Recu taille %d : %s" % 
-            (position_tag, fin_tag, len(self.compute_tag), binascii.hexlify(self.compute_tag))
-        )
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Compute tag. Debut tag : %d, fin tag : %d. Recu taille %d : %s",
+                                position_tag, fin_tag, len(self.compute_tag), binascii.hexlify(self.compute_tag))
 
         # Creer cipher pour dechiffrer
         iv_list = [self.info_appareil['iv']]
@@ -796,7 +798,8 @@ class MessageChiffre(Paquet):
         
         data_dechiffre = None
         for iv in iv_list:
-            self.__logger.debug("Tenter de dechiffrer avec iv %s" % binascii.hexlify(iv))
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("Tenter de dechiffrer avec iv %s", binascii.hexlify(iv))
             try:
                 data_dechiffre = MessageChiffre.dechiffrer(cle_partagee[0:16], iv, self.data[0:6], data_chiffre, self.compute_tag)
                 break
@@ -812,7 +815,8 @@ class MessageChiffre(Paquet):
             self.info_appareil['iv'] = iv
             try:
                 del self.info_appareil['iv_candidat']
-                self.__logger.debug("Conserver iv %s, iv_candidat supprime : %s" % (binascii.hexlify(iv), str(self.info_appareil)))
+                if self.__logger.isEnabledFor(logging.DEBUG):
+                    self.__logger.debug("Conserver iv %s, iv_candidat supprime : %s", binascii.hexlify(iv), self.info_appareil)
             except KeyError:
                 pass  # Candidat n'existe pas
 
@@ -870,9 +874,8 @@ class MessageTemperatureHumiditeAntennePower(MessageChiffre):
         temperature, humidite, batterie, pct_signal, force_emetteur, canal  = \
             unpack('hHHBBB', self.data_dechiffre)
             
-        self.__logger.debug("Data dechiffree : temperature %s, humidite %s, pct_signal %s, force_emetteur %s, canal %s, batterie %s" % 
-            (temperature, humidite, pct_signal, force_emetteur, canal, batterie)
-        )
+        self.__logger.debug("Data dechiffree : temperature %s, humidite %s, pct_signal %s, force_emetteur %s, canal %s, batterie %s",
+                            temperature, humidite, pct_signal, force_emetteur, canal, batterie)
 
         if temperature == -32768:
             self.temperature = None
@@ -960,9 +963,8 @@ class MessageTemperaturePressionAntennePower(MessageChiffre):
         temperature, pression, batterie, pct_signal, force_emetteur, canal  = \
             unpack('hHHBBB', self.data_dechiffre)
             
-        self.__logger.debug("Data dechiffree : temperature %s, pression %s, pct_signal %s, force_emetteur %s, canal %s, batterie %s" % 
-            (temperature, pression, pct_signal, force_emetteur, canal, batterie)
-        )
+        self.__logger.debug("Data dechiffree : temperature %s, pression %s, pct_signal %s, force_emetteur %s, canal %s, batterie %s",
+                            temperature, pression, pct_signal, force_emetteur, canal, batterie)
 
         if temperature == -32768:
             self.temperature = None
@@ -85,7 +85,7 @@ class RadioThread:
         self.__thread = None
 
         self.__radio_PA_level = int(environ.get('RF24_PA') or RF24.RF24_PA_MIN)
-        self.__logger.info("Radio PA level : %d" % self.__radio_PA_level)
+        self.__logger.info("Radio PA level : %d", self.__radio_PA_level)
 
         self.__radio_pin = int(environ.get('RF24_RADIO_PIN') or Constantes.RPI_V2_GPIO_P1_22)
         self.__radio_irq = int(environ.get('RF24_RADIO_IRQ') or 24)
@@ -172,8 +172,9 @@ class RadioThread:
                 #     break
 
                 message = paquet.encoder()
-                self.__logger.debug("Transmission paquet nodeId:%d, adresse:%s\n%s" % (
-                    paquet.node_id, adresse_str, binascii.hexlify(message).decode('utf8')))
+                if self.__logger.isEnabledFor(logging.DEBUG):
+                    self.__logger.debug("Transmission paquet nodeId:%d, adresse:%s\n%s",
+                                        paquet.node_id, adresse_str, binascii.hexlify(message).decode('utf8'))
 
                 # for essai in range(0, Constantes.TRANSMISSION_NB_ESSAIS):
                 with self.__lock_radio:
@@ -182,13 +183,13 @@ class RadioThread:
                     reponse = self.__radio.write(message)
                     if reponse:
                         # Transmission reussie
-                        self.__logger.debug("Transmission paquet OK (node_id: %s, adresse: %s)" % (node_id, adresse_str))
+                        self.__logger.debug("Transmission paquet OK (node_id: %s, adresse: %s)", node_id, adresse_str)
                         # break
                     self.__radio.startListening()
                 # self.__stop_event.wait(0.002)  # Wait 2ms between attemps
 
                 if not reponse:
-                    self.__logger.debug("Transmission paquet ECHEC (node_id: %s, adresse: %s)" % (node_id, adresse_str))
+                    self.__logger.debug("Transmission paquet ECHEC (node_id: %s, adresse: %s)", node_id, adresse_str)
 
             except Exception:
                 self.__logger.exception("Erreur tranmission message vers %s" % adresse_str)
@@ -197,7 +198,7 @@ class RadioThread:
                 self.__radio.startListening()
 
     def open_radio(self):
-        self.__logger.info("Ouverture radio sur canal %s" % hex(self.__channel))
+        self.__logger.info("Ouverture radio sur canal %s", hex(self.__channel))
         self.__radio = RF24.RF24(self.__radio_pin, Constantes.BCM2835_SPI_CS0, Constantes.BCM2835_SPI_SPEED_8MHZ)
 
         if not self.__radio.begin():
@@ -213,7 +214,7 @@ class RadioThread:
         addresse_serveur = bytes(b'\x00\x00') + self.__adresse_serveur
         addresse_serveur = self.__formatAdresse(addresse_serveur)
         self.__radio.openReadingPipe(1, addresse_serveur)
-        self.__logger.info("Address reading pipe 1: %s" % hex(addresse_serveur))
+        self.__logger.info("Address reading pipe 1: %s", hex(addresse_serveur))
 
         # print("Radio details")
         # print( self.__radio.printDetails() )
@@ -241,7 +242,7 @@ class RadioThread:
 
     def __process_network_messages(self, channel):
         if channel is not None and self.__logger.isEnabledFor(logging.DEBUG):
-            self.__logger.debug("Message sur channel %d" % channel)
+            self.__logger.debug("Message sur channel %d", channel)
 
         with self.__lock_radio:
             while self.__radio.available():
@@ -257,13 +258,13 @@ class RadioThread:
         return adresse_no
 
     def set_adresse_serveur(self, adresse_serveur):
-        self.__logger.info("Adresse serveur : %s" % binascii.hexlify(adresse_serveur).decode('utf-8'))
+        self.__logger.info("Adresse serveur : %s", binascii.hexlify(adresse_serveur).decode('utf-8'))
         self.__adresse_serveur = adresse_serveur
         # Preparer le paque beacon (il change uniquement si l'adresse du serveur change)
         self.__message_beacon = PaquetBeaconDHCP(self.__adresse_serveur).encoder()
 
     def set_adresse_reseau(self, adresse_reseau):
-        self.__logger.info("Adresse reseau : %s" % binascii.hexlify(adresse_reseau).decode('utf-8'))
+        self.__logger.info("Adresse reseau : %s", binascii.hexlify(adresse_reseau).decode('utf-8'))
         self.__adresse_reseau = adresse_reseau
 
     @property
@@ -358,7 +359,7 @@ class NRF24Server:
         try:
             with open(path.join(self.__path_configuration_reseau), 'r') as fichier:
                 self.__configuration = json.load(fichier)
-            self.__logger.info("Charge configuration:\n%s" % json.dumps(self.__configuration, indent=4))
+            self.__logger.info("Charge configuration:\n%s", json.dumps(self.__configuration, indent=4))
 
             adresses = self.__configuration['adresses']
 
@@ -382,7 +383,7 @@ class NRF24Server:
                 },
                 'cle_privee': binascii.hexlify(self.__cle_privee.private).decode('utf-8'),
             }
-            self.__logger.debug("Configuration: %s" % str(configuration))
+            self.__logger.debug("Configuration: %s", configuration)
             with open(self.__path_configuration_reseau, 'w') as fichier:
                 json.dump(configuration, fichier)
             self.__configuration = configuration
@@ -399,7 +400,8 @@ class NRF24Server:
 
     def __process_paquets(self):
         for payload in self.__traitement_radio:
-            self.__logger.debug("Payload %s bytes\n%s" % (len(payload), binascii.hexlify(payload).decode('utf-8')))
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("Payload %s bytes\n%s", len(payload), binascii.hexlify(payload).decode('utf-8'))
             self.process_paquet_payload(payload)
 
     def __executer_cycle(self):
@@ -426,7 +428,7 @@ class NRF24Server:
 
         # On utilise le node id actuel (pour repondre) comme suggestion
         node_id_reserve = self.__reserve_dhcp.reserver(paquet.uuid)
-        self.__logger.debug("Transmission DHCP reponse nodeId: %d (reponse vers %s)" % (node_id_reserve, str(paquet.uuid)))
+        self.__logger.debug("Transmission DHCP reponse nodeId: %d (reponse vers %s)", node_id_reserve, paquet.uuid)
 
         # On transmet la reponse
         self.transmettre_response_dhcp(node_id_reserve, paquet.uuid)
@@ -434,7 +436,7 @@ class NRF24Server:
     def process_paquet0(self, node_id, payload):
         self.__logger.debug("Paquet 0 recu")
         paquet0 = Paquet0(payload)
-        self.__logger.debug("Paquet 0 info : %s, %s" % (paquet0.from_node, paquet0.is_multi_paquets()))
+        self.__logger.debug("Paquet 0 info : %s, %s", paquet0.from_node, paquet0.is_multi_paquets())
 
         if paquet0.is_multi_paquets():
             self.__logger.debug("Paquet 0 - multi paquets")
@@ -461,7 +463,7 @@ class NRF24Server:
         version, from_node_id, no_paquet, type_paquet = struct.unpack('BBHH', payload[0:6])
 
         if version == VERSION_PROTOCOLE:
-            self.__logger.debug("Node Id: %d Type paquet: %d, no: %d" % (from_node_id, type_paquet, no_paquet))
+            self.__logger.debug("Node Id: %d Type paquet: %d, no: %d", from_node_id, type_paquet, no_paquet)
 
             if no_paquet == 0:
                 if type_paquet == TypesMessages.TYPE_REQUETE_DHCP:
@@ -484,7 +486,7 @@ class NRF24Server:
                     except ProtocoleVersion9.ExceptionCipherNonDisponible as e:
                         self.__logger.warning("Cipher non disponible %s:" % str(e))
                 else:
-                    self.__logger.info("Message dropped, paquet 0 inconnu pour nodeId:%d" % from_node_id)
+                    self.__logger.info("Message dropped, paquet 0 inconnu pour nodeId:%d", from_node_id)
         else:
             self.__logger.warning("Message version non supportee : %d" % version)
 
@@ -508,15 +510,17 @@ class NRF24Server:
             self.transmettre_ack(paquet_ack)
             self._callback_soumettre(message)
         elif assembleur.type_transmission == TypesMessages.MSG_TYPE_NOUVELLE_CLE:
-            self.__logger.debug("Nouvelle cle : %s" % message)
+            self.__logger.debug("Nouvelle cle : %s", message)
             self.__ajouter_cle_appareil(assembleur.node_id, message)
         elif assembleur.type_transmission == TypesMessages.MSG_TYPE_ECHANGE_IV:
             info_appareil = self.__information_appareils_par_uuid[assembleur.uuid_appareil]
-            self.__logger.debug("Nouveau IV recu : %s" % binascii.hexlify(info_appareil['iv_candidat']))
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("Nouveau IV recu : %s", binascii.hexlify(info_appareil['iv_candidat']))
             # Rien a faire, le IV est sauvegarde automatiquement sur chaque paquet IV confirme
         elif assembleur.type_transmission == TypesMessages.MSG_TYPE_IV:
             # self.__ajouter_iv_appareil(assembleur.uuid_appareil, message['iv'])
-            self.__logger.debug("Nouveau IV recu : %s" % binascii.hexlify(info_appareil['iv_candidat']))
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("Nouveau IV recu : %s", binascii.hexlify(info_appareil['iv_candidat']))
         else:
             if message is not None:
                 self._callback_soumettre(message)
@@ -524,7 +528,7 @@ class NRF24Server:
                 self.transmettre_ack(paquet_ack)
 
     def transmettre_ack(self, paquet_ack):
-        self.__logger.debug("Transmettre ACK vers Id: %s" % str(paquet_ack.node_id))
+        self.__logger.debug("Transmettre ACK vers Id: %s", paquet_ack.node_id)
         self.transmettre_paquets([paquet_ack], paquet_ack.node_id)
 
     def transmettre_response_dhcp(self, node_id_assigne, node_uuid):
@@ -532,7 +536,8 @@ class NRF24Server:
         Repond a une demande DHCP d'un appareil.
         """
         paquet = PaquetReponseDHCP(self.__traitement_radio.adresse_reseau, node_id_assigne, node_uuid)
-        self.__logger.debug("Transmettre reponse DHCP vers: %s" % binascii.hexlify(node_uuid).decode('utf-8'))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Transmettre reponse DHCP vers: %s", binascii.hexlify(node_uuid).decode('utf-8'))
         self.transmettre_paquets([paquet])
 
     def transmettre_paquets(self, paquets: list, node_id = None):
@@ -554,18 +559,20 @@ class NRF24Server:
 
     def __ajouter_iv_appareil(self, info_appareil, iv):
         # info_appareil = self.__information_appareils_par_uuid.get(uuid_senseur)
-        self.__logger.debug("Nouveau IV pour appareil %s : %s" % (info_appareil['uuid'], binascii.hexlify(iv)))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Nouveau IV pour appareil %s : %s", info_appareil['uuid'], binascii.hexlify(iv))
         if info_appareil is not None:
             info_appareil['iv'] = info_appareil.get('iv') or iv  # Ne pas remplacer IV existant
             info_appareil['iv_candidat'] = iv
 
     def __ajouter_cle_appareil(self, node_id, message):
-        self.__logger.debug("Messages : %s" % str(message))
+        self.__logger.debug("Messages : %s", message)
         uuid_senseur = message['uuid_senseur']
         uuid_senseur_bytes = binascii.unhexlify(uuid_senseur.encode('utf-8'))
         cle = message['cle_publique']
         crc32_recu = message['crc32']
-        self.__logger.debug("Recu cle publique appareil : %s" % binascii.hexlify(cle))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Recu cle publique appareil : %s", binascii.hexlify(cle))
 
         # Valider la cle avec le CRC32
         calcul_crc32 = crc32(uuid_senseur_bytes + cle) & 0xffffffff
@@ -590,14 +597,15 @@ class NRF24Server:
         
         # Transmettre serveur side public
         serveur_side_public = bytes(self.__cle_privee.get_public().public)
-        self.__logger.debug("Cle publique serveur : %s" % binascii.hexlify(serveur_side_public))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("Cle publique serveur : %s", binascii.hexlify(serveur_side_public))
         # self.__logger.debug("Cle privee serveur : %s" % binascii.hexlify(bytes(serveur_side)))
         
         paquets = [
             ProtocoleVersion9.PaquetReponseCleServeur1(node_id, serveur_side_public),
             ProtocoleVersion9.PaquetReponseCleServeur2(node_id, serveur_side_public),
         ]
-        self.__logger.debug("Transmission paquet cle publique vers reponse nodeId:%d" % node_id)
+        self.__logger.debug("Transmission paquet cle publique vers reponse nodeId:%d", node_id)
         self.transmettre_paquets(paquets, node_id)
         
         info_appareil = self.__information_appareils_par_uuid.get(uuid_senseur)
@@ -610,7 +618,7 @@ class NRF24Server:
     def get_infoappareil_par_nodeid(self, node_id: int):
         for uuid_appareil, info_app in self.__information_appareils_par_uuid.items():
             if info_app['node_id'] == node_id:
-                self.__logger.debug("get_infoappareil_par_nodeid: Info app : %s" % str(info_app))
+                self.__logger.debug("get_infoappareil_par_nodeid: Info app : %s", info_app)
                 # info_complete['uuid'] = uuid_appareil
                 return info_app
         
@@ -618,7 +626,7 @@ class NRF24Server:
         # connue dans le DHCP
         info_appareil = self.__reserve_dhcp.get_info_par_nodeid(node_id)
         if info_appareil is not None:
-            self.__logger.debug("Recharger appareil connu : %s" % str(info_appareil))
+            self.__logger.debug("Recharger appareil connu : %s", info_appareil)
             # On a trouve, charger la base de l'information
             info_mappee = {
                 'uuid': info_appareil['uuid'],
@@ -689,7 +697,8 @@ class ReserveDHCP:
 
         config_appareil['cle_publique'] = binascii.hexlify(cle_publique).decode('utf8')
 
-        self.__logger.debug("UUID %s, cle publique = %s" % (binascii.hexlify(uuid), config_appareil['cle_publique']))
+        if self.__logger.isEnabledFor(logging.DEBUG):
+            self.__logger.debug("UUID %s, cle publique = %s", binascii.hexlify(uuid), config_appareil['cle_publique'])
         self.sauvegarder_fichier_dhcp()
 
     def get_node_id(self, uuid: bytes):
@@ -722,7 +731,8 @@ class ReserveDHCP:
             node_id = self.__identifier_nouvelle_adresse()
             info_node['node_id'] = node_id
 
-            self.__logger.debug("UUID %s, reservation node id = %s" % (binascii.hexlify(uuid), node_id))
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("UUID %s, reservation node id = %s", binascii.hexlify(uuid), node_id)
             self.sauvegarder_fichier_dhcp()
 
         return node_id
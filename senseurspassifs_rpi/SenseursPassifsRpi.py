@@ -1,12 +1,14 @@
-import asyncio
 import logging
 import signal
 
+from millegrilles_senseurspassifs import EventLoop
+from millegrilles_senseurspassifs.LoggingQueue import demarrer_logging_queue
 from senseurspassifs_rpi.ApplicationRpi import ApplicationRpi
 
 
 async def initialiser_application():
     logging.basicConfig()
+    demarrer_logging_queue()  # Ecriture des logs hors de l'event loop
 
     app = ApplicationRpi()
 
@@ -52,7 +54,7 @@ def main():
     Methode d'execution de l'application
     :return:
     """
-    asyncio.run(demarrer())
+    EventLoop.run(demarrer())
 
 
 if __name__ == '__main__':
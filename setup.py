@@ -8,6 +8,9 @@ setup(
     name='millegrilles_senseurspassifs_relay',
     version=__VERSION__,
     packages=find_packages(),
+    extras_require={
+        'framing': ['cbor2', 'msgpack'],  # Framing binaire des websockets (optionnel, json sinon)
+    },
     url='https://github.com/dugrema/millegrilles.web.python',
     license='AFFERO',
     author='Mathieu Dugre',
@@ -0,0 +1,123 @@
+"""
+Conversion des logs de lectures du hub en transactions (SenseursLogHandler.generer_fichiers_transaction).
+
+Usage :
+    python3 test/BenchConversionLogs.py [--taille 100] [--appareils 50] [--workers 1,2,4]
+
+Genere un log synthetique senseurs.DATE.jsonl de --taille Mo (appareils avec 4 senseurs chacun), puis le converti
+dans un process separe pour chaque nombre de workers (threads de signature et compression). Affiche la duree,
+le debit (Mo/s), le nombre de transactions et la memoire maximale (RSS) du process de conversion.
+La signature utilise une cle Ed25519 generee pour le test (meme cout qu'une signature de message).
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from millegrilles_senseurspassifs.SenseursLogHandler import SenseursLogHandler
+
+NOM_LOG = 'senseurs.20240101000000.jsonl'
+TYPES_SENSEURS = ['temperature', 'humidite', 'pression', 'batterie']
+
+
+class ConfigurationBench:
+
+    def __init__(self, lecture_log_directory: str):
+        self.lecture_log_directory = lecture_log_directory
+
+
+class FormatteurBench:
+
+    def __init__(self):
+        self.__cle = Ed25519PrivateKey.generate()
+
+    def signer_message(self, kind: int, message: dict, domaine: str = None, action: str = None):
+        contenu = json.dumps(message, sort_keys=True, separators=(',', ':'))
+        hachage = hashlib.blake2s(contenu.encode('utf-8')).hexdigest()
+        transaction = dict(message)
+        transaction['id'] = hachage
+        transaction['sig'] = self.__cle.sign(hachage.encode('utf-8')).hex()
+        return transaction, hachage
+
+
+class EtatBench:
+
+    def __init__(self, lecture_log_directory: str):
+        self.configuration = ConfigurationBench(lecture_log_directory)
+        self.instance_id = 'instance_bench'
+        self.formatteur_message = FormatteurBench()
+
+
+def generer_log(path_fichier: str, taille: int, appareils: int):
+    uuid_appareils = ['%08x-0000-0000-0000-%012x' % (i, i) for i in range(appareils)]
+    timestamp = 1700000000
+    ecrit = 0
+    with open(path_fichier, 'w') as fichier:
+        while ecrit < taille:
+            timestamp += 1
+            uuid_appareil = random.choice(uuid_appareils)
+            senseurs = dict()
+            for type_senseur in TYPES_SENSEURS:
+                senseurs['%s/%s' % (uuid_appareil[:8], type_senseur)] = {
+                    'valeur': round(random.uniform(-40, 100), 1), 'timestamp': timestamp, 'type': type_senseur}
+            ligne = json.dumps({'instance_id': 'instance_bench', 'uuid_senseur': uuid_appareil, 'senseurs': senseurs})
+            fichier.write(ligne)
+            fichier.write('\n')
+            ecrit += len(ligne) + 1
+
+
+def convertir(repertoire: str, workers: int):
+    taille = os.stat(os.path.join(repertoire, NOM_LOG)).st_size
+    handler = SenseursLogHandler(EtatBench(repertoire), None)
+
+    debut = time.perf_counter()
+    handler.generer_fichiers_transaction(workers)
+    duree = time.perf_counter() - debut
+
+    transactions = len(os.listdir(handler.path_pending))
+    rss_max = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print("%2d workers : %6.1f s, %6.2f Mo/s, %6d transactions, RSS max %6.1f Mo" % (
+        workers, duree, taille / duree / 1024 / 1024, transactions, rss_max / 1024 / 1024))
+
+
+def parse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Conversion des logs de lectures en transactions")
+    parser.add_argument('--taille', type=int, default=100, help="Taille du log synthetique (Mo)")
+    parser.add_argument('--appareils', type=int, default=50, help="Appareils (4 senseurs chacun)")
+    parser.add_argument('--workers', default='1,%d' % (os.cpu_count() or 1), help="Liste de nombres de workers")
+    parser.add_argument('--repertoire', help=argparse.SUPPRESS)  # Process de conversion
+    return parser.parse_args()
+
+
+def main():
+    args = parse()
+
+    if args.repertoire is not None:
+        convertir(args.repertoire, int(args.workers))
+        return
+
+    with tempfile.TemporaryDirectory(prefix='bench_conversion.') as path_tmp:
+        path_log = os.path.join(path_tmp, NOM_LOG)
+        print("Generation log %d Mo, %d appareils" % (args.taille, args.appareils))
+        generer_log(path_log, args.taille * 1024 * 1024, args.appareils)
+
+        for workers in sorted(set(int(w) for w in args.workers.split(','))):
+            repertoire = os.path.join(path_tmp, 'workers_%d' % workers)
+            os.makedirs(repertoire)
+            os.link(path_log, os.path.join(repertoire, NOM_LOG))  # La conversion supprime le log
+            subprocess.run([sys.executable, __file__, '--repertoire', repertoire, '--workers', str(workers)],
+                           check=True)
+            shutil.rmtree(repertoire)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Comparaison des event loops asyncio et uvloop sur le transport websocket du relai.
+
+Usage :
+    python3 test/BenchEventLoop.py [--clients 200] [--messages 200] [--framing json]
+
+Chaque event loop roule dans un process separe avec le meme profil de charge : un serveur websocket avec les
+parametres du relai (parametres_serveur_websocket) qui decode chaque etat d'appareil et repond avec une frame
+de confirmation, et N clients qui envoient chacun M etats en attendant la reponse (aller-retour, comme un
+appareil). Mesure le debit total (messages/s) et la latence aller-retour (p50, p99).
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from millegrilles_senseurspassifs import EventLoop
+from senseurspassifs_relai_web.Compression import parametres_serveur_websocket
+from senseurspassifs_relai_web.Configuration import SenseurspassifsRelaiWebConfiguration
+from senseurspassifs_relai_web.Framing import decode_message, encode_message
+
+HOST = '127.0.0.1'
+PORT = 8498
+
+ETAT_APPAREIL = {
+    'routage': {'action': 'etatAppareil'},
+    'pubkey': 'a' * 64,
+    'estampille': 1700000000,
+    'contenu': json.dumps({'uuid_appareil': 'abcd1234-0000', 'lectures_senseurs': {
+        'dht/p4/temperature': {'valeur': 21.3, 'timestamp': 1700000000, 'type': 'temperature'},
+        'dht/p4/humidite': {'valeur': 44.1, 'timestamp': 1700000000, 'type': 'humidite'},
+    }}),
+    'sig': 'b' * 128,
+}
+
+
+def percentile(valeurs: list[float], pct: float) -> float:
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * pct))]
+
+
+async def bench(clients: int, messages: int, framing: str):
+    parametres = parametres_serveur_websocket(SenseurspassifsRelaiWebConfiguration())
+
+    async def handler(websocket):
+        async for message in websocket:
+            commande = decode_message(message, framing)
+            await websocket.send(encode_message({'ok': True, 'action': commande['routage']['action']}, framing))
+
+    latences = list()
+
+    async def client():
+        async with connect('ws://%s:%d' % (HOST, PORT), ping_interval=None, max_size=None) as websocket:
+            frame = encode_message(ETAT_APPAREIL, framing)
+            for _ in range(messages):
+                debut = time.perf_counter()
+                await websocket.send(frame)
+                decode_message(await websocket.recv(), framing)
+                latences.append(time.perf_counter() - debut)
+
+    async with serve(handler, HOST, PORT, backlog=1024, **parametres):
+        debut = time.perf_counter()
+        async with asyncio.TaskGroup() as group:
+            for _ in range(clients):
+                group.create_task(client())
+        duree = time.perf_counter() - debut
+
+    latences.sort()
+    print("%-8s %8.0f messages/s, latence p50 %6.2f ms, p99 %6.2f ms" % (
+        EventLoop.event_loop_demandee(), len(latences) / duree,
+        percentile(latences, 0.5) * 1000, percentile(latences, 0.99) * 1000))
+
+
+def parse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Comparaison asyncio / uvloop")
+    parser.add_argument('--clients', type=int, default=200, help="Connexions simultanees")
+    parser.add_argument('--messages', type=int, default=200, help="Messages par connexion")
+    parser.add_argument('--framing', default='json', help="json, cbor ou msgpack")
+    EventLoop.ajouter_argument_event_loop(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse()
+
+    if args.event_loop is not None:
+        EventLoop.run(bench(args.clients, args.messages, args.framing), args.event_loop)
+        return
+
+    for nom in EventLoop.EVENT_LOOPS:
+        if nom == EventLoop.EVENT_LOOP_UVLOOP and EventLoop.uvloop is None:
+            print("%-8s non installe (pip install uvloop)" % nom)
+            continue
+        subprocess.run([sys.executable, __file__, '--event-loop', nom, '--clients', str(args.clients),
+                        '--messages', str(args.messages), '--framing', args.framing], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Cout par message du logging dans les chemins chauds (relai et hub).
+
+Usage :
+    python3 test/BenchLogging.py [--messages 100000]
+
+Compare, dans la thread appelante :
+ - log DEBUG desactive : formatage eager (% dans l'appel) vs args lazy vs garde isEnabledFor (json.dumps)
+ - log actif : handler synchrone vs QueueHandlerNonBloquant (millegrilles_senseurspassifs.LoggingQueue), avec un
+   fichier et avec une sortie lente (stderr vers un pipe plein, journald occupe) simulee par un delai de 200 us.
+"""
+import argparse
+import binascii
+import json
+import logging
+import os
+import tempfile
+import time
+
+from millegrilles_senseurspassifs.LoggingQueue import demarrer_logging_queue
+
+COMMANDE = {
+    'routage': {'action': 'etatAppareil'},
+    'contenu': json.dumps({'uuid_appareil': 'abcd1234', 'lectures_senseurs': {
+        'dht/p4/temperature': {'valeur': 21.3, 'timestamp': 1700000000, 'type': 'temperature'},
+        'dht/p4/humidite': {'valeur': 44.1, 'timestamp': 1700000000, 'type': 'humidite'},
+    }}),
+    'sig': 'a' * 128,
+}
+PAYLOAD = os.urandom(32)
+DELAI_SORTIE_LENTE = 0.0002
+
+
+class HandlerLent(logging.Handler):
+
+    def emit(self, record: logging.LogRecord):
+        self.format(record)
+        time.sleep(DELAI_SORTIE_LENTE)
+
+
+def mesurer(titre: str, nombre: int, fonction):
+    debut = time.perf_counter()
+    for _ in range(nombre):
+        fonction()
+    duree = time.perf_counter() - debut
+    print("%-44s %8.2f us/message" % (titre, duree / nombre * 1_000_000))
+
+
+def bench_desactive(nombre: int):
+    logger = logging.getLogger('bench.desactive')
+    logger.setLevel(logging.INFO)
+
+    mesurer('DEBUG off, eager %', nombre, lambda: logger.debug("handle_status Etat recu %s" % COMMANDE))
+    mesurer('DEBUG off, lazy args', nombre, lambda: logger.debug("handle_status Etat recu %s", COMMANDE))
+    mesurer('DEBUG off, eager json.dumps', nombre,
+            lambda: logger.debug("Lecture RF24 recue:\n%s" % json.dumps(COMMANDE, indent=2)))
+
+    def garde():
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Lecture RF24 recue:\n%s", json.dumps(COMMANDE, indent=2))
+    mesurer('DEBUG off, isEnabledFor json.dumps', nombre, garde)
+
+    mesurer('DEBUG off, eager hexlify', nombre,
+            lambda: logger.debug("Payload %s bytes\n%s" % (len(PAYLOAD), binascii.hexlify(PAYLOAD).decode('utf-8'))))
+
+
+def bench_actif(titre: str, nombre: int, handler: logging.Handler):
+    root = logging.getLogger()
+    logger = logging.getLogger('bench.actif')
+    logger.setLevel(logging.DEBUG)
+
+    root.addHandler(handler)
+    mesurer('DEBUG on, %s synchrone' % titre, nombre, lambda: logger.debug("handle_status Etat recu %s", COMMANDE))
+
+    handler_queue = demarrer_logging_queue()
+    mesurer('DEBUG on, %s QueueHandler' % titre, nombre, lambda: logger.debug("handle_status Etat recu %s", COMMANDE))
+    print("%-44s %8d" % ('  messages perdus (queue pleine)', handler_queue.dropped))
+
+    # Vider la queue et retirer les handlers pour la prochaine mesure
+    for handler_root in list(root.handlers):
+        root.removeHandler(handler_root)
+
+
+def parse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cout par message du logging")
+    parser.add_argument('--messages', type=int, default=100_000, help="Nombre de messages par mesure")
+    return parser.parse_args()
+
+
+def main():
+    args = parse()
+    bench_desactive(args.messages)
+    with tempfile.TemporaryDirectory() as repertoire:
+        bench_actif('fichier', args.messages, logging.FileHandler(os.path.join(repertoire, 'bench.log')))
+    bench_actif('sortie lente', min(args.messages, 5_000), HandlerLent())
+
+
+if __name__ == '__main__':
+    main()
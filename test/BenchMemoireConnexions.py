@@ -0,0 +1,154 @@
+"""
+Mesure de la memoire par connexion appareil inactive sur le relai web.
+
+Usage :
+    python3 test/BenchMemoireConnexions.py [--nombres 1000,10000,50000] [--objets]
+
+Le serveur websocket (WebSocketClientHandler) roule dans ce process, les clients sont ouverts dans un process
+separe pour ne pas etre comptes. Chaque nombre est mesure avec les parametres par defaut de websockets et avec
+le budget par defaut du relai (variables WEBSOCKET_* de doc/env.dev.md). Avec --objets, mesure seulement
+CorrelationAppareil + WebSocketClientHandler (sans transport). Le nombre de connexions est limite par RLIMIT_NOFILE.
+"""
+import argparse
+import asyncio
+import gc
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from senseurspassifs_relai_web.Compression import parametres_serveur_websocket
+from senseurspassifs_relai_web.Configuration import SenseurspassifsRelaiWebConfiguration
+from senseurspassifs_relai_web.MessagesHandler import CorrelationAppareil
+from senseurspassifs_relai_web.WebSocketCommands import WebSocketClientHandler
+
+HOST = '127.0.0.1'
+PORT = 8499
+
+
+class ContextBench:
+    stopping = False
+
+
+class ManagerBench:
+    context = ContextBench()
+
+
+class CertificatBench:
+
+    def __init__(self, index: int):
+        self.fingerprint = 'z%046d' % index
+        self.subject_common_name = 'appareil_%d' % index
+        self.get_user_id = 'z2i3XjxUsager'
+
+
+def rss() -> int:
+    with open('/proc/self/statm') as fichier:
+        return int(fichier.read().split()[1]) * resource.getpagesize()
+
+
+def afficher(titre: str, nombre: int, tracemalloc_octets: int, rss_octets: int):
+    print("%-12s %7d connexions : %8.0f octets/connexion (python), %8.0f octets/connexion (RSS)" % (
+        titre, nombre, tracemalloc_octets / nombre, rss_octets / nombre))
+
+
+async def bench_objets(nombre: int):
+    gc.collect()
+    tracemalloc.start()
+    debut_rss = rss()
+    debut, _ = tracemalloc.get_traced_memory()
+
+    manager = ManagerBench()
+    conserver = list()
+    for i in range(nombre):
+        correlation = CorrelationAppareil(CertificatBench(i))
+        conserver.append((correlation, WebSocketClientHandler(None, manager)))
+
+    gc.collect()
+    fin, _ = tracemalloc.get_traced_memory()
+    afficher('objets', nombre, fin - debut, rss() - debut_rss)
+    tracemalloc.stop()
+
+
+async def bench_connexions(nombre: int, titre: str, parametres: dict):
+    manager = ManagerBench()
+    connectes = 0
+    tous_connectes = asyncio.Event()
+
+    async def handler(websocket):
+        nonlocal connectes
+        connectes += 1
+        if connectes == nombre:
+            tous_connectes.set()
+        await WebSocketClientHandler(websocket, manager).run()
+
+    gc.collect()
+    tracemalloc.start()
+    debut_rss = rss()
+    debut, _ = tracemalloc.get_traced_memory()
+
+    async with serve(handler, HOST, PORT, backlog=4096, **parametres):
+        clients = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, '--clients', str(nombre), stdin=subprocess.PIPE)
+        try:
+            await asyncio.wait_for(tous_connectes.wait(), 600)
+            await asyncio.sleep(2)  # Laisser les buffers se stabiliser
+            gc.collect()
+            fin, _ = tracemalloc.get_traced_memory()
+            afficher(titre, nombre, fin - debut, rss() - debut_rss)
+        finally:
+            clients.stdin.close()
+            await clients.wait()
+
+    tracemalloc.stop()
+
+
+async def clients(nombre: int):
+    connexions = list()
+    for _ in range(nombre):
+        connexions.append(await connect('ws://%s:%d' % (HOST, PORT), open_timeout=60, ping_interval=None))
+
+    # Attendre la fin du benchmark (stdin ferme par le serveur)
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+
+    for connexion in connexions:
+        await connexion.close()
+
+
+def parse() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Memoire par connexion appareil inactive")
+    parser.add_argument('--nombres', default='1000,10000,50000', help="Nombres de connexions, separes par virgule")
+    parser.add_argument('--objets', action='store_true', help="Mesurer seulement les objets (sans websocket)")
+    parser.add_argument('--clients', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse()
+
+    if args.clients:
+        asyncio.run(clients(args.clients))
+        return
+
+    configuration = SenseurspassifsRelaiWebConfiguration()  # Budget par defaut du relai
+    parametres = {
+        'defaut': dict(),
+        'relai': parametres_serveur_websocket(configuration),
+    }
+
+    limite, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    for nombre in [int(n) for n in args.nombres.split(',')]:
+        if args.objets:
+            asyncio.run(bench_objets(nombre))
+        elif nombre + 100 > limite:
+            print("websocket    %7d connexions : ignore, RLIMIT_NOFILE=%d (ulimit -n)" % (nombre, limite))
+        else:
+            for titre, params in parametres.items():
+                asyncio.run(bench_connexions(nombre, titre, params))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+from millegrilles_senseurspassifs.Aggregation import AggregateurLectures, TamponCirculaire
+
+
+def message(uuid_senseur: str, timestamp: int, **valeurs) -> dict:
+    return {
+        'instance_id': 'hub',
+        'uuid_senseur': uuid_senseur,
+        'senseurs': {senseur: {'valeur': valeur, 'timestamp': timestamp, 'type': 'temperature'}
+                     for senseur, valeur in valeurs.items()},
+    }
+
+
+def test_fenetre():
+    aggregateur = AggregateurLectures()
+    aggregateur.ajouter(message('a', 1, temp=20.0, hum=40))
+    aggregateur.ajouter(message('a', 2, temp=22.0, hum=50))
+    aggregateur.ajouter(message('a', 3, temp=21.0))
+    aggregateur.ajouter(message('b', 3, temp=-5.0))
+
+    messages = {m['uuid_senseur']: m for m in aggregateur.vider()}
+    assert messages.keys() == {'a', 'b'}
+    assert messages['a']['instance_id'] == 'hub'
+
+    temp = messages['a']['senseurs']['temp']
+    assert temp['valeur'] == 21.0  # Derniere lecture
+    assert temp['timestamp'] == 3
+    assert temp['type'] == 'temperature'
+    assert (temp['valeur_min'], temp['valeur_max'], temp['valeur_avg'], temp['nombre']) == (20.0, 22.0, 21.0, 3)
+
+    hum = messages['a']['senseurs']['hum']
+    assert (hum['valeur'], hum['timestamp'], hum['valeur_avg'], hum['nombre']) == (50, 2, 45.0, 2)
+
+    # Nouvelle fenetre
+    assert aggregateur.vider() == []
+    aggregateur.ajouter(message('b', 4, temp=-6.0))
+    messages = aggregateur.vider()
+    assert len(messages) == 1
+    assert messages[0]['senseurs']['temp']['nombre'] == 1
+
+
+def test_valeurs_non_numeriques():
+    aggregateur = AggregateurLectures()
+    aggregateur.ajouter(message('a', 1, etat='ON', nan=float('nan')))
+    aggregateur.ajouter(message('a', 2, etat=True, nan=1.5))
+
+    senseurs = aggregateur.vider()[0]['senseurs']
+    assert senseurs['etat'] == {'valeur': True, 'timestamp': 2, 'type': 'temperature'}  # Pas de min/max/avg
+    assert senseurs['nan']['nombre'] == 1  # nan n'est pas agrege
+    assert senseurs['nan']['valeur_avg'] == 1.5
+
+
+def test_capacite():
+    tampon = TamponCirculaire(3)
+    for i in range(5):
+        tampon.ajouter({'valeur': float(i), 'timestamp': i, 'type': 'temperature'})
+
+    lecture = tampon.vider()
+    # Les plus vieilles valeurs de la fenetre sont remplacees
+    assert (lecture['valeur_min'], lecture['valeur_max'], lecture['nombre']) == (2.0, 4.0, 3)
+    assert lecture['valeur_avg'] == 3.0
+    assert tampon.vider() is None
+
+
+def main():
+    test_fenetre()
+    test_valeurs_non_numeriques()
+    test_capacite()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import asyncio
+
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+from senseurspassifs_relai_web.Bindings import LecturesBindings, ROUTING_KEY_LECTURE_CONFIRMEE, \
+    ROUTING_KEY_LECTURE_CONFIRMEE_TOUS
+
+
+class ContextFactice:
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+        self.stopping = False
+
+    async def wait(self, timeout=None):
+        await asyncio.sleep(timeout)
+
+
+class ConsumerFactice:
+    """ Q exclusive : chaque start_consuming() redeclare la Q avec les routing keys statiques seulement """
+
+    def __init__(self):
+        self.statiques = {ROUTING_KEY_LECTURE_CONFIRMEE_TOUS}
+        self.bound: set[str] = set()
+        self.declarations = 0
+
+    async def start_consuming(self):
+        self.declarations += 1
+        self.bound = set(self.statiques)
+
+    async def bind_routing_key(self, routing_key):
+        self.bound.add(routing_key.routing_key)
+
+    async def unbind_routing_key(self, routing_key):
+        self.bound.discard(routing_key.routing_key)
+
+
+def routing_key_usager(user_id: str) -> str:
+    return ROUTING_KEY_LECTURE_CONFIRMEE % user_id
+
+
+async def executer(bindings: LecturesBindings, test):
+    tache = asyncio.create_task(bindings.run())
+    try:
+        await test()
+    finally:
+        tache.cancel()
+        try:
+            await tache
+        except asyncio.CancelledError:
+            pass
+
+
+async def attendre():
+    await asyncio.sleep(0.01)
+
+
+def test_sans_support_bindings():
+    bindings = LecturesBindings(ContextFactice(), 0)
+    assert bindings.attach(object()) is False
+
+
+def test_bind_unbind():
+    bindings = LecturesBindings(ContextFactice(), 0)
+    consumer = ConsumerFactice()
+    assert bindings.attach(consumer) is True
+
+    async def test():
+        bindings.add('usager1')
+        await attendre()
+        assert consumer.bound == set()  # Q pas encore declaree
+
+        await consumer.start_consuming()
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager1')}  # Wildcard retire apres les bindings
+
+        bindings.add('usager2')
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager1'), routing_key_usager('usager2')}
+
+        bindings.remove('usager1')
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager2')}
+
+    asyncio.run(executer(bindings, test))
+
+
+def test_debounce():
+    bindings = LecturesBindings(ContextFactice(), 300)
+    consumer = ConsumerFactice()
+    bindings.attach(consumer)
+
+    async def test():
+        await consumer.start_consuming()
+        bindings.add('usager1')
+        await attendre()
+        bindings.remove('usager1')
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager1')}  # Conserve pendant le debounce
+
+        bindings.add('usager1')  # Reconnexion de l'appareil
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager1')}
+
+    asyncio.run(executer(bindings, test))
+
+
+def test_reconnexion():
+    bindings = LecturesBindings(ContextFactice(), 0)
+    consumer = ConsumerFactice()
+    bindings.attach(consumer)
+
+    async def test():
+        await consumer.start_consuming()
+        bindings.add('usager1')
+        bindings.add('usager2')
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager1'), routing_key_usager('usager2')}
+
+        # Perte de connexion, la Q est redeclaree avec les routing keys statiques
+        await consumer.start_consuming()
+        assert consumer.declarations == 2
+        await attendre()
+        assert consumer.bound == {routing_key_usager('usager1'), routing_key_usager('usager2')}
+
+    asyncio.run(executer(bindings, test))
+
+
+def main():
+    test_sans_support_bindings()
+    test_bind_unbind()
+    test_debounce()
+    test_reconnexion()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+
+from millegrilles_senseurspassifs.EtatLectures import EtatLectures
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+
+def lecture(valeur, timestamp) -> dict:
+    return {'valeur': valeur, 'timestamp': timestamp, 'type': 'temperature'}
+
+
+def test_maj():
+    etat = EtatLectures(MetricsRegistry())
+    etat.abonner('affichage', ['a'])
+
+    assert etat.maj('a', {'temp': lecture(20.0, 10), 'sans_valeur': {'timestamp': 10}}) == ['temp']
+    assert etat.maj('a', {'temp': lecture(19.0, 5)}) == []  # Plus vieille que l'etat courant
+    assert etat.get('a', 'temp').valeur == 20.0
+    assert etat.maj('a', {'temp': lecture(21.0, 11)}) == ['temp']
+    assert etat.maj('a', {'temp': {'valeur': 22.0}}) == ['temp']  # Sans timestamp, remplace toujours
+    assert etat.get('a', 'temp').valeur == 22.0
+    assert etat.get('a', 'sans_valeur') is None
+
+
+def test_abonnes():
+    etat = EtatLectures(MetricsRegistry())
+    assert etat.maj('a', {'temp': lecture(20.0, 10)}) == []  # Aucun abonne
+    assert len(etat) == 0
+
+    etat.abonner('affichage1', ['a', 'b'])
+    etat.abonner('affichage2', ['b', 'c'])
+    for uuid_senseur in ('a', 'b', 'c', 'd'):
+        etat.maj(uuid_senseur, {'temp': lecture(20.0, 10)})
+    assert len(etat) == 3
+    assert etat.get('d', 'temp') is None
+
+    # Nouvelle configuration de affichage1, les lectures de a ne sont plus conservees
+    etat.abonner('affichage1', [])
+    assert etat.get('a', 'temp') is None
+    assert etat.get('b', 'temp') is not None
+    assert len(etat) == 2
+
+
+def test_notifications():
+    etat = EtatLectures(MetricsRegistry())
+    notifications = list()
+    etat.abonner('affichage1', ['a'], lambda uuid_senseur, senseurs: notifications.append((uuid_senseur, senseurs)))
+    etat.abonner('affichage2', ['b'])  # Sans callback
+
+    etat.maj('a', {'temp': lecture(20.0, 10), 'hum': lecture(40, 10)})
+    etat.maj('a', {'temp': lecture(19.0, 5)})  # Plus vieille, aucun changement
+    etat.maj('b', {'temp': lecture(20.0, 10)})  # Appareil non declare par affichage1
+    assert notifications == [('a', ['temp', 'hum'])]
+
+    # Nouvelle declaration sans callback, plus de notifications
+    etat.abonner('affichage1', ['a'])
+    etat.maj('a', {'temp': lecture(21.0, 11)})
+    assert len(notifications) == 1
+
+
+def test_sauvegarde():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_fichier = os.path.join(repertoire, 'etat_lectures.json')
+        etat = EtatLectures(MetricsRegistry())
+        etat.abonner('affichage', ['a', 'b'])
+        etat.maj('a', {'temp': lecture(20.0, 10), 'hum': {'valeur': 45, 'timestamp': 10, 'type': 'humidite'}})
+        etat.maj('b', {'etat': {'valeur': 'ON', 'timestamp': 12, 'type': 'switch'}})
+
+        assert etat.sauvegarder(path_fichier) is True
+        assert etat.sauvegarder(path_fichier) is False  # Aucune modification
+        assert os.path.exists(path_fichier + '.tmp') is False
+
+        # Au demarrage les abonnes ne sont pas configures, toutes les lectures sauvegardees sont chargees
+        recharge = EtatLectures(MetricsRegistry())
+        recharge.charger(path_fichier)
+        assert len(recharge) == 3
+        lecture_hum = recharge.get('a', 'hum')
+        assert (lecture_hum.valeur, lecture_hum.timestamp, lecture_hum.type) == (45, 10, 'humidite')
+        assert recharge.get('b', 'etat').valeur == 'ON'
+        assert recharge.sauvegarder(path_fichier) is False  # Chargement n'est pas une modification
+
+        # Une lecture plus recente recue avant le chargement est conservee
+        recharge = EtatLectures(MetricsRegistry())
+        recharge.abonner('affichage', ['a'])
+        recharge.maj('a', {'temp': lecture(25.0, 20)})
+        recharge.charger(path_fichier)
+        assert recharge.get('a', 'temp').valeur == 25.0
+
+        # Appareils non utilises retires au prochain abonner()
+        recharge.abonner('affichage', ['a'])
+        assert recharge.get('b', 'etat') is None
+
+
+def test_sauvegarde_invalide():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_fichier = os.path.join(repertoire, 'etat_lectures.json')
+        etat = EtatLectures(MetricsRegistry())
+
+        etat.charger(path_fichier)  # Fichier absent
+        assert len(etat) == 0
+
+        with open(path_fichier, 'w') as fichier:
+            fichier.write('{"version": 1, "lectures": [[')  # Fichier tronque
+        etat.charger(path_fichier)
+        assert len(etat) == 0
+
+        with open(path_fichier, 'w') as fichier:
+            json.dump({'version': 99, 'lectures': [['a', 'temp', 1, 1, 'temperature']]}, fichier)
+        etat.charger(path_fichier)
+        assert len(etat) == 0
+
+
+def main():
+    test_maj()
+    test_abonnes()
+    test_notifications()
+    test_sauvegarde()
+    test_sauvegarde_invalide()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+from millegrilles_senseurspassifs.FiltreLectures import FiltreLectures, parse_deadbands
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+
+def lectures(**valeurs) -> dict:
+    types = {'temp': 'temperature', 'hum': 'humidite', 'pression': 'pression', 'etat': 'switch'}
+    return {senseur: {'valeur': valeur, 'timestamp': 1700000000, 'type': types[senseur]}
+            for senseur, valeur in valeurs.items()}
+
+
+def test_parse_deadbands():
+    deadbands = parse_deadbands('temperature:0.2, pression:0.1%,*:0,')
+    assert deadbands['temperature'].absolu == 0.2
+    assert deadbands['temperature'].relatif == 0.0
+    assert deadbands['pression'].relatif == 0.001
+    assert deadbands['*'].absolu == 0.0
+
+
+def test_deadband_absolu():
+    metrics = MetricsRegistry()
+    filtre = FiltreLectures(metrics, parse_deadbands('temperature:0.2'), 3600)
+
+    assert filtre.filtrer('a', lectures(temp=20.0)).keys() == {'temp'}  # Premiere lecture
+    assert filtre.filtrer('a', lectures(temp=20.1)) == {}
+    assert filtre.filtrer('a', lectures(temp=20.2)) == {}  # Ecart avec la derniere transmise (20.0)
+    assert filtre.filtrer('a', lectures(temp=20.3)).keys() == {'temp'}
+    assert filtre.filtrer('a', lectures(temp=20.4)) == {}
+    assert filtre.filtrer('b', lectures(temp=20.4)).keys() == {'temp'}  # Autre appareil
+
+    compteurs = metrics.export()['counters']
+    assert compteurs['filter.suppressed'] == 3
+    assert compteurs['filter.suppressed.temperature'] == 3
+
+
+def test_deadband_relatif_et_types():
+    filtre = FiltreLectures(MetricsRegistry(), parse_deadbands('pression:1%'), 3600)
+
+    assert filtre.filtrer('a', lectures(pression=100.0, hum=50)).keys() == {'pression', 'hum'}
+    resultat = filtre.filtrer('a', lectures(pression=100.5, hum=50))
+    assert resultat.keys() == {'hum'}  # Type sans deadband (et sans *) : toujours transmis
+    assert filtre.filtrer('a', lectures(pression=101.5)).keys() == {'pression'}
+
+
+def test_valeurs_non_numeriques():
+    filtre = FiltreLectures(MetricsRegistry(), parse_deadbands('*:0.5'), 3600)
+
+    assert filtre.filtrer('a', lectures(etat='ON')).keys() == {'etat'}
+    assert filtre.filtrer('a', lectures(etat='ON')) == {}
+    assert filtre.filtrer('a', lectures(etat='OFF')).keys() == {'etat'}
+    assert filtre.filtrer('a', lectures(etat=True)).keys() == {'etat'}
+
+
+def test_heartbeat():
+    filtre = FiltreLectures(MetricsRegistry(), parse_deadbands('temperature:10'), 0)
+
+    assert filtre.filtrer('a', lectures(temp=20.0)).keys() == {'temp'}
+    assert filtre.filtrer('a', lectures(temp=20.0)).keys() == {'temp'}  # Heartbeat expire
+
+
+def main():
+    test_parse_deadbands()
+    test_deadband_absolu()
+    test_deadband_relatif_et_types()
+    test_valeurs_non_numeriques()
+    test_heartbeat()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import tempfile
+
+from millegrilles_senseurspassifs.JournalLectures import JournalLectures
+from millegrilles_senseurspassifs.Metrics import MetricsRegistry
+
+
+def lecture(numero: int) -> dict:
+    return {'instance_id': 'hub', 'uuid_senseur': 'appareil', 'senseurs': {'temp': {'valeur': numero}}}
+
+
+def lire_tout(journal: JournalLectures) -> list[tuple[int, dict]]:
+    return asyncio.run(journal.lire_lot(1000))
+
+
+def segments(repertoire: str) -> list[str]:
+    return sorted(f for f in os.listdir(repertoire) if f.endswith('.jsonl'))
+
+
+def test_ordre_rejeu():
+    with tempfile.TemporaryDirectory() as repertoire:
+        journal = JournalLectures(MetricsRegistry(), repertoire)
+        journal.ouvrir()
+        for i in range(10):
+            journal.ajouter(lecture(i))
+        assert journal.backlog == 10
+        assert journal.disponible.is_set()
+
+        lot = asyncio.run(journal.lire_lot(4))
+        assert [s for s, _ in lot] == [0, 1, 2, 3]
+        assert [m['senseurs']['temp']['valeur'] for _, m in lot] == [0, 1, 2, 3]
+
+        journal.confirmer(1)
+        lot = asyncio.run(journal.lire_lot(4))
+        assert [s for s, _ in lot] == [2, 3, 4, 5]
+
+        # Redemarrage, le rejeu reprend apres la derniere confirmation
+        journal.fermer()
+        journal = JournalLectures(MetricsRegistry(), repertoire)
+        journal.ouvrir()
+        assert journal.backlog == 8
+        assert [s for s, _ in lire_tout(journal)] == list(range(2, 10))
+
+        journal.confirmer(9)
+        assert journal.backlog == 0
+        assert journal.disponible.is_set() is False
+        journal.fermer()
+
+
+def test_segments():
+    with tempfile.TemporaryDirectory() as repertoire:
+        metrics = MetricsRegistry()
+        journal = JournalLectures(metrics, repertoire, taille_segment=200)
+        journal.ouvrir()
+        for i in range(20):
+            journal.ajouter(lecture(i))
+        assert len(segments(repertoire)) > 2
+
+        # Les lectures sont lues en ordre a travers les segments
+        assert [s for s, _ in lire_tout(journal)] == list(range(20))
+
+        # Les segments confirmes au complet sont retires, le segment courant est conserve
+        journal.confirmer(19)
+        assert len(segments(repertoire)) == 1
+        assert metrics.export()['counters']['journal.replayed'] == 20
+
+        journal.ajouter(lecture(20))
+        assert [s for s, _ in lire_tout(journal)] == [20]
+        journal.fermer()
+
+
+def test_taille_max():
+    with tempfile.TemporaryDirectory() as repertoire:
+        metrics = MetricsRegistry()
+        journal = JournalLectures(metrics, repertoire, taille_max=1000, taille_segment=200)
+        journal.ouvrir()
+        for i in range(50):
+            journal.ajouter(lecture(i))
+
+        taille = sum(os.stat(os.path.join(repertoire, f)).st_size for f in segments(repertoire))
+        assert taille <= 1000
+
+        # Les plus vieilles lectures sont retirees, les plus recentes sont conservees en ordre
+        sequences = [s for s, _ in lire_tout(journal)]
+        perdues = metrics.export()['counters']['journal.dropped']
+        assert perdues > 0
+        assert sequences == list(range(perdues, 50))
+        assert journal.backlog == 50 - perdues
+        journal.fermer()
+
+
+def test_reparation_record_partiel():
+    with tempfile.TemporaryDirectory() as repertoire:
+        journal = JournalLectures(MetricsRegistry(), repertoire)
+        journal.ouvrir()
+        for i in range(3):
+            journal.ajouter(lecture(i))
+        journal.fermer()
+
+        # Crash pendant l'ecriture d'une lecture
+        path_segment = os.path.join(repertoire, segments(repertoire)[-1])
+        with open(path_segment, 'ab') as fichier:
+            fichier.write(b'{"instance_id":"hub","senseu')
+
+        journal = JournalLectures(MetricsRegistry(), repertoire)
+        journal.ouvrir()
+        assert journal.backlog == 3
+        with open(path_segment, 'rb') as fichier:
+            assert fichier.read().endswith(b'\n')
+
+        journal.ajouter(lecture(3))
+        assert [m['senseurs']['temp']['valeur'] for _, m in lire_tout(journal)] == [0, 1, 2, 3]
+        journal.fermer()
+
+
+def main():
+    test_ordre_rejeu()
+    test_segments()
+    test_taille_max()
+    test_reparation_record_partiel()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+
+from millegrilles_senseurspassifs import LogBinaire
+from millegrilles_senseurspassifs.LogBinaire import EcrivainLogBinaire, LecteurLogBinaire
+
+
+def messages_test(nombre: int) -> list[tuple[str, dict]]:
+    messages = list()
+    for i in range(nombre):
+        messages.append(('appareil%d' % (i % 3), {
+            'temp': {'valeur': 20.5 + i, 'timestamp': 1700000000 + i, 'type': 'temperature'},
+            'etat': {'valeur': 'texte %d ' % i * 5, 'timestamp': 1700000000 + i, 'type': 'texte'},
+            'compte': {'valeur': i, 'timestamp': 1700000000 + i, 'type': 'compteur'},
+        }))
+    return messages
+
+
+def attendu(messages: list[tuple[str, dict]]) -> list[tuple[str, str, dict]]:
+    return [(uuid_senseur, senseur_id, lecture)
+            for uuid_senseur, senseurs in messages for senseur_id, lecture in senseurs.items()]
+
+
+def lire(path_fichier: str) -> list[tuple[str, str, dict]]:
+    with LecteurLogBinaire(path_fichier) as lecteur:
+        return list(lecteur)
+
+
+def test_aller_retour():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_fichier = os.path.join(repertoire, 'senseurs.bin')
+        messages = messages_test(10)
+        messages.append(('appareil0', {
+            'extra': {'valeur': 1.0, 'timestamp': 1700000100, 'type': 'temperature', 'unite': 'C'},
+            'vide': {'valeur': None, 'timestamp': 1700000100, 'type': 'switch'},
+            'bool': {'valeur': True, 'timestamp': 1700000100, 'type': 'switch'},
+        }))
+
+        ecrivain = EcrivainLogBinaire(path_fichier)
+        for uuid_senseur, senseurs in messages:
+            ecrivain.ajouter(uuid_senseur, senseurs)
+        ecrivain.fermer()
+
+        with LecteurLogBinaire(path_fichier) as lecteur:
+            assert lecteur.ferme is True
+            assert list(lecteur) == attendu(messages)
+            assert lecteur.periode == (1700000000, 1700000100)
+            entrees = {(e.uuid_senseur, e.senseur): e.nombre for e in lecteur.index}
+            assert entrees[('appareil0', 'temp')] == 4
+
+
+def test_fichier_tronque():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_fichier = os.path.join(repertoire, 'senseurs.bin')
+        path_crash = os.path.join(repertoire, 'senseurs.crash.bin')
+        messages = messages_test(5)
+
+        ecrivain = EcrivainLogBinaire(path_fichier)
+        for uuid_senseur, senseurs in messages:
+            ecrivain.ajouter(uuid_senseur, senseurs)
+        taille_complete = os.stat(path_fichier).st_size
+        ecrivain.ajouter('appareil9', {'etat': {'valeur': 'x' * 100, 'timestamp': 1, 'type': 'texte'}})
+
+        # Crash pendant l'ecriture du dernier message (payload texte incomplet)
+        shutil.copyfile(path_fichier, path_crash)
+        ecrivain.fermer()
+        with open(path_crash, 'r+b') as fichier:
+            fichier.truncate(os.stat(path_crash).st_size - 30)
+
+        with LecteurLogBinaire(path_crash) as lecteur:
+            assert lecteur.ferme is False
+            assert lecteur.fin_records >= taille_complete
+            assert list(lecteur)[:len(attendu(messages))] == attendu(messages)
+            assert all(uuid_senseur != 'appareil9' or senseur != 'etat' for uuid_senseur, senseur, _ in lecteur)
+
+        # Reprise de l'ecriture sur le fichier tronque
+        ecrivain = EcrivainLogBinaire(path_crash)
+        suite = messages_test(2)
+        for uuid_senseur, senseurs in suite:
+            ecrivain.ajouter(uuid_senseur, senseurs)
+        ecrivain.fermer()
+
+        lectures = lire(path_crash)
+        assert lectures[:len(attendu(messages))] == attendu(messages)
+        assert lectures[-len(attendu(suite)):] == attendu(suite)
+
+
+def test_table_chaines_pleine():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_fichier = os.path.join(repertoire, 'senseurs.bin')
+        lecture = {'valeur': 1, 'timestamp': 1700000000, 'type': 'compteur'}
+
+        ecrivain = EcrivainLogBinaire(path_fichier)
+        messages = list()
+        for i in range(7):
+            senseurs = {'s%d.%d' % (i, j): lecture for j in range(10000)}
+            messages.append(('appareil%d' % i, senseurs))
+            ecrivain.ajouter('appareil%d' % i, senseurs)
+        ecrivain.fermer()
+
+        # La table ne peut pas contenir le 7e message, le fichier precedent est renomme senseurs.DATE.bin
+        rotations = [f for f in os.listdir(repertoire) if f.startswith('senseurs.') and f != 'senseurs.bin']
+        assert len(rotations) == 1
+        assert rotations[0].split('.')[2] == 'bin'
+
+        lectures = lire(os.path.join(repertoire, rotations[0]))
+        assert lectures == attendu(messages[:6])
+        assert lire(path_fichier) == attendu(messages[6:])
+
+
+def test_payload_entre_blocs():
+    records_par_bloc = LogBinaire.RECORDS_PAR_BLOC
+    LogBinaire.RECORDS_PAR_BLOC = 3  # Les chaines et textes (plusieurs slots) debordent sur les blocs suivants
+    try:
+        with tempfile.TemporaryDirectory() as repertoire:
+            path_fichier = os.path.join(repertoire, 'senseurs.bin')
+            messages = messages_test(20)
+
+            ecrivain = EcrivainLogBinaire(path_fichier)
+            for uuid_senseur, senseurs in messages:
+                ecrivain.ajouter(uuid_senseur, senseurs)
+            assert lire(path_fichier) == attendu(messages)  # Fichier non ferme, chaines lues dans le flux
+
+            ecrivain.fermer()
+            assert lire(path_fichier) == attendu(messages)
+    finally:
+        LogBinaire.RECORDS_PAR_BLOC = records_par_bloc
+
+
+def main():
+    test_aller_retour()
+    test_fichier_tronque()
+    test_table_chaines_pleine()
+    test_payload_entre_blocs()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+from millegrilles_senseurspassifs.RoutageTopics import TableRoutage
+
+
+def test_mots_exacts():
+    table = TableRoutage()
+    table.ajouter('evenement.SenseursPassifs.lectureConfirmee', 'a')
+    table.ajouter(('2.prive', 'evenement.SenseursPassifs.majNoeud'), 'b')  # Format de routing_keys()
+
+    assert table.trouver('evenement.SenseursPassifs.lectureConfirmee') == ['a']
+    assert table.trouver('evenement.SenseursPassifs.majNoeud') == ['b']
+    assert table.trouver('evenement.SenseursPassifs') == []
+    assert table.trouver('evenement.SenseursPassifs.lectureConfirmee.extra') == []
+
+
+def test_etoile():
+    table = TableRoutage()
+    table.ajouter('evenement.SenseursPassifs.*.majNoeud', 'a')
+
+    assert table.trouver('evenement.SenseursPassifs.instance1.majNoeud') == ['a']
+    assert table.trouver('evenement.SenseursPassifs.majNoeud') == []  # * remplace exactement un mot
+    assert table.trouver('evenement.SenseursPassifs.x.y.majNoeud') == []
+
+
+def test_diese():
+    table = TableRoutage()
+    table.ajouter('evenement.#', 'a')
+    table.ajouter('#.lectureConfirmee', 'b')
+    table.ajouter('evenement.SenseursPassifs.#.lectureConfirmee', 'c')
+
+    assert table.trouver('evenement') == ['a']  # # remplace zero mot
+    assert sorted(table.trouver('evenement.SenseursPassifs.lectureConfirmee')) == ['a', 'b', 'c']
+    assert sorted(table.trouver('evenement.SenseursPassifs.x.y.lectureConfirmee')) == ['a', 'b', 'c']
+    assert table.trouver('commande.lectureConfirmee') == ['b']
+    assert table.trouver('commande.autre') == []
+
+
+def test_sans_doublons():
+    table = TableRoutage()
+    table.ajouter('evenement.#', 'a')
+    table.ajouter('evenement.*.lectureConfirmee', 'a')
+    table.ajouter('evenement.*.lectureConfirmee', 'a')
+    table.ajouter('#', 'b')
+
+    assert sorted(table.trouver('evenement.SenseursPassifs.lectureConfirmee')) == ['a', 'b']
+
+
+def main():
+    test_mots_exacts()
+    test_etoile()
+    test_diese()
+    test_sans_doublons()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
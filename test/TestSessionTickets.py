@@ -0,0 +1,125 @@
+import os
+import tempfile
+import time
+
+from senseurspassifs_relai_web.SessionTickets import SessionTicketCache
+
+CLE_1 = b"01234567890123456789012345678901"
+CLE_2 = b"abcdefghijabcdefghijabcdefghijab"
+
+
+def preparer_cle_relai(repertoire: str, contenu: bytes) -> str:
+    path_cle = os.path.join(repertoire, 'relai.key.pem')
+    with open(path_cle, 'wb') as fichier:
+        fichier.write(contenu)
+    return path_cle
+
+
+def test_resume():
+    cache = SessionTicketCache(None, None, 10, 3600)
+    ticket = cache.issue('fp1', CLE_1)
+
+    assert cache.resume(ticket.ticket_id, 'fp1') is ticket
+    assert cache.resume(ticket.ticket_id, 'fp2') is None  # Autre certificat
+    assert cache.resume('inconnu', 'fp1') is None
+
+    cache.confirm('fp1')
+    assert ticket.relai_confirme is True
+
+    cache.revoke('fp1')
+    assert cache.resume(ticket.ticket_id, 'fp1') is None
+    assert len(cache) == 0
+
+
+def test_reemission_remplace_ticket():
+    cache = SessionTicketCache(None, None, 10, 3600)
+    ancien = cache.issue('fp1', CLE_1)
+    nouveau = cache.issue('fp1', CLE_2)
+
+    assert len(cache) == 1
+    assert cache.resume(ancien.ticket_id, 'fp1') is None
+    assert cache.resume(nouveau.ticket_id, 'fp1').cle == CLE_2
+
+
+def test_borne_lru():
+    cache = SessionTicketCache(None, None, 3, 3600)
+    tickets = [cache.issue('fp%d' % i, CLE_1) for i in range(3)]
+
+    # fp0 est utilise, fp1 devient le plus ancien
+    assert cache.resume(tickets[0].ticket_id, 'fp0') is not None
+    cache.issue('fp3', CLE_1)
+
+    assert len(cache) == 3
+    assert cache.resume(tickets[1].ticket_id, 'fp1') is None
+    assert cache.resume(tickets[0].ticket_id, 'fp0') is not None
+    assert cache.resume(tickets[2].ticket_id, 'fp2') is not None
+
+
+def test_expiration():
+    cache = SessionTicketCache(None, None, 10, 3600)
+    expire = cache.issue('fp1', CLE_1)
+    actif = cache.issue('fp2', CLE_1)
+    expire.expiration = time.time() - 1
+
+    assert cache.resume(expire.ticket_id, 'fp1') is None
+    assert len(cache) == 1
+
+    cache.issue('fp3', CLE_1).expiration = time.time() - 1
+    cache.purge()
+    assert len(cache) == 1
+    assert cache.resume(actif.ticket_id, 'fp2') is actif
+
+
+def test_sauvegarde_chiffree():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_cle = preparer_cle_relai(repertoire, b'cle privee du relai')
+        path_fichier = os.path.join(repertoire, 'session_tickets.json')
+
+        cache = SessionTicketCache(path_fichier, path_cle, 10, 3600)
+        ticket = cache.issue('fp1', CLE_1)
+        cache.confirm('fp1')
+        cache.issue('fp2', CLE_2).expiration = time.time() - 1  # Pas sauvegarde
+        cache.save()
+
+        with open(path_fichier, 'rb') as fichier:
+            contenu = fichier.read()
+        assert CLE_1.hex().encode('utf-8') not in contenu
+        assert b'fp1' not in contenu
+        assert os.stat(path_fichier).st_mode & 0o077 == 0
+
+        recharge = SessionTicketCache(path_fichier, path_cle, 10, 3600)
+        recharge.load()
+        assert len(recharge) == 1
+        ticket_recharge = recharge.resume(ticket.ticket_id, 'fp1')
+        assert ticket_recharge.cle == CLE_1
+        assert ticket_recharge.relai_confirme is True
+
+
+def test_sauvegarde_cle_relai_renouvelee():
+    with tempfile.TemporaryDirectory() as repertoire:
+        path_cle = preparer_cle_relai(repertoire, b'cle privee du relai')
+        path_fichier = os.path.join(repertoire, 'session_tickets.json')
+
+        cache = SessionTicketCache(path_fichier, path_cle, 10, 3600)
+        cache.issue('fp1', CLE_1)
+        cache.save()
+
+        # Nouvelle cle du relai, le fichier ne peut plus etre dechiffre
+        preparer_cle_relai(repertoire, b'nouvelle cle privee')
+        recharge = SessionTicketCache(path_fichier, path_cle, 10, 3600)
+        recharge.load()
+        assert len(recharge) == 0
+
+
+def main():
+    test_resume()
+    test_reemission_remplace_ticket()
+    test_borne_lru()
+    test_expiration()
+    test_sauvegarde_chiffree()
+    test_sauvegarde_cle_relai_renouvelee()
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()